@@ -36,6 +36,11 @@ def rebuild_api_image():
     subprocess.run('docker image prune --force --filter "dangling=true"', shell=True)
 
 
+@app.command(name="benchmark-sessions")
+def benchmark_sessions(requests: int = 200):
+    subprocess.run(f"docker compose exec api python -m server.database.benchmarks {requests}", shell=True)
+
+
 @app.command(name="run-tests")
 def run_tests():
     subprocess.run("coverage run -m pytest", shell=True)
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+from typing import List
+
+from helpers.cache import get_redis_client
+from helpers.models import AuditRequestSchema
+
+
+def get_stale_archive_key(bucket: str) -> str:
+    return f"archive:stale:{bucket}"
+
+
+def mark_stale_archive_days(bucket: str, data: List[AuditRequestSchema]) -> None:
+    # closed days may already be archived, the archival loop rewrites them from InfluxDB
+    today = datetime.now(timezone.utc).date()
+    days = set()
+    for event_data in data:
+        timestamp = event_data.timestamp
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        day = timestamp.astimezone(timezone.utc).date()
+        if day < today:
+            days.add(f"{day:%Y-%m-%d}")
+
+    if days:
+        get_redis_client().sadd(get_stale_archive_key(bucket), *days)
@@ -0,0 +1,9 @@
+from functools import lru_cache
+
+from helpers.config import settings
+from redis import Redis
+
+
+@lru_cache()
+def get_redis_client() -> Redis:
+    return Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
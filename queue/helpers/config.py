@@ -10,6 +10,27 @@ class BaseConfig(BaseSettings):
     BROKER_HOST: str
     BROKER_PORT: int
 
+    # Cache Servers Configurations
+    REDIS_HOST: str
+    REDIS_PORT: int
+
+    # Database Configurations
+    POSTGRES_HOST: str
+    POSTGRES_PORT: str
+    POSTGRES_USER: str
+    POSTGRES_PASSWORD: str
+    POSTGRES_DB: str
+
+    # Quantile Sketch Configurations
+    SKETCH_RELATIVE_ACCURACY: float = 0.01
+    SKETCH_RETENTION_DAYS: int = 400
+
+    # Entity Index Configurations
+    POSTINGS_RETENTION_DAYS: int = 400
+
+    # Distinct Counter Configurations
+    DISTINCT_RETENTION_DAYS: int = 400
+
     class Config:
         env_file = "configurations/.env"
 
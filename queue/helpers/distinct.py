@@ -0,0 +1,53 @@
+from typing import List
+
+from helpers.cache import get_redis_client
+from helpers.config import settings
+from helpers.models import AuditRequestSchema
+from helpers.sketches import SKETCH_RESOLUTIONS, get_epoch
+
+
+def get_distinct_key(
+    bucket: str,
+    measurement: str,
+    application: str,
+    dimension: str,
+    resolution: str,
+    window_start: int,
+) -> str:
+    return f"hll:{bucket}:{measurement}:{application}:{dimension}:{resolution}:{window_start}"
+
+
+def update_distinct_counters(bucket: str, data: List[AuditRequestSchema]) -> None:
+    client = get_redis_client()
+    pipeline = client.pipeline(transaction=False)
+    ttl = settings.DISTINCT_RETENTION_DAYS * 86400
+
+    members = {}
+    for event_data in data:
+        epoch = get_epoch(event_data.timestamp)
+        dimensions = {
+            "actor_origin": event_data.actor.origin,
+            "resource_id": event_data.resource.id,
+            "resource_type": event_data.resource.type,
+        }
+
+        for dimension, value in dimensions.items():
+            if value is None:
+                continue
+
+            for resolution, seconds in SKETCH_RESOLUTIONS.items():
+                key = get_distinct_key(
+                    bucket=bucket,
+                    measurement=event_data.category,
+                    application=event_data.source_information.application,
+                    dimension=dimension,
+                    resolution=resolution,
+                    window_start=epoch - epoch % seconds,
+                )
+                members.setdefault(key, set()).add(value)
+
+    for key, values in members.items():
+        pipeline.pfadd(key, *values)
+        pipeline.expire(key, ttl)
+
+    pipeline.execute()
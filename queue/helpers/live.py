@@ -0,0 +1,58 @@
+import json
+from datetime import timezone
+from typing import Any, Dict, List
+
+from helpers.cache import get_redis_client
+from helpers.models import AuditRequestSchema
+
+
+def get_live_channel(bucket: str) -> str:
+    return f"events:{bucket}"
+
+
+def shape_live_event(event_data: AuditRequestSchema, event_id: str, stage: int) -> Dict[str, Any]:
+    timestamp = event_data.timestamp
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+    return {
+        "category": event_data.category,
+        "tags": {
+            "application": event_data.source_information.application,
+            "environment": event_data.source_information.environment,
+        },
+        "method": event_data.method,
+        "status": event_data.status,
+        "level": event_data.level,
+        "event": {
+            "id": event_id,
+            "name": event_data.event.name,
+            "type": event_data.event.type,
+            "stage": stage,
+            "totalDuration": event_data.event.total_duration,
+            "affectedResources": event_data.event.affected_resources,
+            "latency": event_data.event.latency,
+            "cpuUsage": event_data.event.cpu_usage,
+            "memoryUsage": event_data.event.memory_usage,
+            "detail": event_data.event.detail,
+            "description": event_data.event.description,
+        },
+        "actor": {
+            "origin": event_data.actor.origin,
+            "detail": event_data.actor.detail,
+        },
+        "resource": {
+            "id": event_data.resource.id,
+            "name": event_data.resource.name,
+            "type": event_data.resource.type,
+            "detail": event_data.resource.detail,
+        },
+        "metadata": {item.name: item.value for item in event_data.metadata},
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+def publish_live_events(bucket: str, event_id: str, data: List[AuditRequestSchema]) -> None:
+    events = [shape_live_event(event_data, event_id, index + 1) for index, event_data in enumerate(data)]
+    client = get_redis_client()
+    client.publish(get_live_channel(bucket), json.dumps(events, default=str))
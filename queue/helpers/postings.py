@@ -0,0 +1,48 @@
+from time import time
+from typing import List
+
+from helpers.cache import get_redis_client
+from helpers.config import settings
+from helpers.models import AuditRequestSchema
+from helpers.sketches import get_epoch
+
+POSTINGS_RESOLUTION = 3600
+
+# scored by the time from which the postings of each bucket are complete
+POSTINGS_COVERAGE = "postings:coverage"
+
+
+def get_postings_key(bucket: str, dimension: str, value: str) -> str:
+    return f"postings:{bucket}:{dimension}:{value}"
+
+
+def update_entity_postings(bucket: str, data: List[AuditRequestSchema]) -> None:
+    client = get_redis_client()
+    pipeline = client.pipeline(transaction=False)
+    now = time()
+    expired = now - settings.POSTINGS_RETENTION_DAYS * 86400
+    pipeline.zadd(POSTINGS_COVERAGE, {bucket: now}, nx=True)
+    pipeline.zadd(POSTINGS_COVERAGE, {bucket: expired}, gt=True)
+
+    keys = set()
+    for event_data in data:
+        epoch = get_epoch(event_data.timestamp)
+        hour = epoch - epoch % POSTINGS_RESOLUTION
+        dimensions = {
+            "resource_id": event_data.resource.id,
+            "resource_type": event_data.resource.type,
+            "actor_origin": event_data.actor.origin,
+        }
+
+        for dimension, value in dimensions.items():
+            if value is None:
+                continue
+
+            key = get_postings_key(bucket, dimension, value)
+            pipeline.zadd(key, {f"{event_data.category}:{hour}": hour})
+            keys.add(key)
+
+    for key in keys:
+        pipeline.zremrangebyscore(key, "-inf", expired)
+
+    pipeline.execute()
@@ -7,9 +7,8 @@ from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.write_api import SYNCHRONOUS
 
 
-def create_influxdb_point(data: List[AuditRequestSchema]) -> List[Point]:
+def create_influxdb_point(data: List[AuditRequestSchema], event_id: str) -> List[Point]:
     points = []
-    event_id = str(uuid4())
 
     for index, event_data in enumerate(data):
         point = (
@@ -64,8 +63,10 @@ def add_new_point_to_bucket(
     client: InfluxDBClient,
     bucket: str,
     data: List[AuditRequestSchema],
-) -> None:
-    point: Point = create_influxdb_point(data)
+) -> str:
+    event_id = str(uuid4())
+    point: Point = create_influxdb_point(data, event_id)
     with client:
         write_api = client.write_api(write_options=SYNCHRONOUS)
         write_api.write(bucket=bucket, record=point)
+    return event_id
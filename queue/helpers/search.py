@@ -0,0 +1,79 @@
+from datetime import timezone
+from functools import lru_cache
+from typing import Any, Iterator, List
+
+import psycopg2
+from helpers.config import settings
+from helpers.models import AuditRequestSchema
+from psycopg2.extensions import connection as Connection
+from psycopg2.extras import execute_values
+
+
+@lru_cache()
+def get_database_connection() -> Connection:
+    return psycopg2.connect(
+        host=settings.POSTGRES_HOST,
+        port=settings.POSTGRES_PORT,
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        dbname=settings.POSTGRES_DB,
+    )
+
+
+def flatten_values(data: Any) -> Iterator[str]:
+    if isinstance(data, dict):
+        for value in data.values():
+            yield from flatten_values(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from flatten_values(value)
+    elif data is not None:
+        yield str(data)
+
+
+def build_search_document(event_data: AuditRequestSchema) -> str:
+    values = [event_data.event.description or ""]
+    values.extend(flatten_values(event_data.event.detail))
+    values.extend(flatten_values(event_data.actor.detail))
+    return " ".join(values)
+
+
+def index_events(bucket: str, event_id: str, data: List[AuditRequestSchema]) -> None:
+    rows = []
+    for event_data in data:
+        timestamp = event_data.timestamp
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+        document = build_search_document(event_data)
+        if document.strip():
+            rows.append(
+                (
+                    bucket,
+                    timestamp.date(),
+                    event_data.category,
+                    event_data.source_information.application,
+                    timestamp,
+                    event_id,
+                    document,
+                )
+            )
+
+    if not rows:
+        return
+
+    connection = get_database_connection()
+    if connection.closed:
+        get_database_connection.cache_clear()
+        connection = get_database_connection()
+
+    with connection, connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            (
+                "INSERT INTO event_search (bucket, day, measurement, application, event_time, event_id, document)"
+                " VALUES %s"
+            ),
+            rows,
+            template="(%s, %s, %s, %s, %s, %s, to_tsvector('simple', %s))",
+        )
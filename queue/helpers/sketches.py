@@ -0,0 +1,65 @@
+import math
+from datetime import datetime, timezone
+from typing import List, Union
+
+from helpers.cache import get_redis_client
+from helpers.config import settings
+from helpers.models import AuditRequestSchema
+
+SKETCH_RESOLUTIONS = {"1h": 3600, "1d": 86400}
+
+
+def get_sketch_index(value: float) -> str:
+    if value <= 0:
+        return "zero"
+
+    accuracy = settings.SKETCH_RELATIVE_ACCURACY
+    gamma = (1 + accuracy) / (1 - accuracy)
+    return str(math.ceil(math.log(value, gamma)))
+
+
+def get_sketch_key(
+    bucket: str,
+    measurement: str,
+    application: str,
+    field: str,
+    resolution: str,
+    window_start: int,
+) -> str:
+    return f"sketch:{bucket}:{measurement}:{application}:{field}:{resolution}:{window_start}"
+
+
+def get_epoch(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp())
+
+
+def update_quantile_sketches(bucket: str, data: List[AuditRequestSchema]) -> None:
+    # sketches map logarithmic bucket indexes to counts, so adjacent windows merge by adding them
+    client = get_redis_client()
+    pipeline = client.pipeline(transaction=False)
+    ttl = settings.SKETCH_RETENTION_DAYS * 86400
+
+    for event_data in data:
+        epoch = get_epoch(event_data.timestamp)
+        values = {"latency": event_data.event.latency, "event_duration": event_data.event.total_duration}
+
+        for field, value in values.items():
+            value: Union[float, None]
+            if value is None:
+                continue
+
+            for resolution, seconds in SKETCH_RESOLUTIONS.items():
+                key = get_sketch_key(
+                    bucket=bucket,
+                    measurement=event_data.category,
+                    application=event_data.source_information.application,
+                    field=field,
+                    resolution=resolution,
+                    window_start=epoch - epoch % seconds,
+                )
+                pipeline.hincrby(key, get_sketch_index(value), 1)
+                pipeline.expire(key, ttl)
+
+    pipeline.execute()
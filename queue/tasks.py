@@ -1,12 +1,21 @@
-from typing import Any, Dict, List
+import logging
+from typing import Any, Callable, Dict, List
 
 from celery import Celery
+from helpers.archive import mark_stale_archive_days
 from helpers.config import settings
+from helpers.distinct import update_distinct_counters
+from helpers.live import publish_live_events
 from helpers.models import AuditRequestSchema
+from helpers.postings import update_entity_postings
 from helpers.push import add_new_point_to_bucket
+from helpers.search import index_events
+from helpers.sketches import update_quantile_sketches
 from influxdb_client import InfluxDBClient
 from pydantic import parse_obj_as
 
+logger = logging.getLogger(__name__)
+
 app = Celery("tasks", broker=settings.BROKER_URI, backend=settings.BROKER_URI)
 app.conf.acks_on_failure_or_timeout = True
 app.conf.reject_on_worker_lost = True
@@ -23,4 +32,19 @@ def log_event(
 ):
     client: InfluxDBClient = InfluxDBClient(url=url, token=token, org=org)
     data = parse_obj_as(List[AuditRequestSchema], data)
-    add_new_point_to_bucket(client=client, bucket=bucket, data=data)
+    event_id = add_new_point_to_bucket(client=client, bucket=bucket, data=data)
+
+    run_side_step(publish_live_events, bucket=bucket, event_id=event_id, data=data)
+    run_side_step(update_quantile_sketches, bucket=bucket, data=data)
+    run_side_step(update_entity_postings, bucket=bucket, data=data)
+    run_side_step(update_distinct_counters, bucket=bucket, data=data)
+    run_side_step(index_events, bucket=bucket, event_id=event_id, data=data)
+    run_side_step(mark_stale_archive_days, bucket=bucket, data=data)
+
+
+def run_side_step(step: Callable[..., None], bucket: str, **kwargs) -> None:
+    # the events are already written, so a failing index must not keep the next ones from being updated
+    try:
+        step(bucket=bucket, **kwargs)
+    except Exception:
+        logger.exception("Failed to run %s for %s", step.__name__, bucket)
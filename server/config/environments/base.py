@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic import BaseSettings, Extra
 
 
@@ -17,10 +19,19 @@ class BaseConfig(RootConfig):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: int = 30
+    POSTGRES_POOL_RECYCLE: int = 1800
+    POSTGRES_POOL_PRE_PING: bool = True
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 500
 
     # Cache Servers Configurations
     REDIS_HOST: str
     REDIS_PORT: int
+    REDIS_POOL_SIZE: int = 50
+    REDIS_POOL_TIMEOUT: float = 1.0
+    REDIS_SOCKET_TIMEOUT: float = 0.5
 
     # JWT Configurations
     JWT_SECRET_KEY: str
@@ -30,12 +41,70 @@ class BaseConfig(RootConfig):
     JWT_HOUR: int
     JWT_DAY: int
 
+    # Password Hashing Configurations
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_DEPTH: int = 32
+    PASSWORD_HASH_CONCURRENCY: int = 8
+    PASSWORD_HASH_SLOT_TIMEOUT: int = 30
+
+    # Authentication Rate Limit Configurations
+    AUTH_RATE_LIMIT_WINDOW: int = 60
+    AUTH_RATE_LIMIT_PER_IP: int = 30
+    AUTH_RATE_LIMIT_PER_USERNAME: int = 10
+
     # InfluxDB Configurations
     INFLUXDB_HOST: str
     INFLUXDB_PORT: int
     INFLUXDB_USER: str
     INFLUXDB_PASSWORD: str
     INFLUXDB_ORG: str
+    INFLUXDB_QUERY_WORKERS: int = 8
+    INFLUXDB_QUERY_TIMEOUT: int = 30
+    INFLUXDB_POOL_SIZE: int = 8
+    INFLUXDB_KEEP_ALIVE: bool = True
+    INFLUXDB_QUERY_FANOUT: int = 4
+
+    # Query Guardrail Configurations
+    QUERY_MAX_POINTS: int = 10000
+    QUERY_MAX_SCANNED_ROWS: int = 50000000
+    QUERY_STATS_TTL: int = 300
+    QUERY_SHARD_SPAN: str = "1d"
+    QUERY_SHARD_PARALLELISM: int = 4
+
+    # Search Configurations
+    SEARCH_BATCH_SIZE: int = 50
+    SEARCH_BATCH_SPAN: int = 3600
+
+    # Live Tail Configurations
+    LIVE_QUEUE_SIZE: int = 1000
+    LIVE_HEARTBEAT: int = 15
+
+    # Export Configurations
+    EXPORT_DIRECTORY: str = "exports"
+    EXPORT_CHUNK: str = "1h"
+    EXPORT_CONCURRENCY: int = 2
+    EXPORT_ROW_GROUP: int = 10000
+
+    # Retention Configurations
+    RETENTION_PLANS: Dict[str, str] = {"free": "30d", "standard": "90d", "enterprise": "365d"}
+    DEFAULT_RETENTION_PLAN: str = "standard"
+    ARCHIVE_DIRECTORY: str = "archive"
+    ARCHIVE_INTERVAL: int = 3600
+
+    # Cache Configurations
+    ADMIN_CACHE_TTL: int = 300
+    ACCESS_CACHE_SIZE: int = 10000
+    ACCESS_CACHE_TTL: int = 30
+    ACCESS_KEY_TTL: int = 86400
+    ACCESS_NEGATIVE_TTL: int = 60
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Response Configurations
+    RESPONSE_GZIP_MINIMUM_SIZE: int = 1000
+
+    # Quantile Sketch Configurations
+    SKETCH_RELATIVE_ACCURACY: float = 0.01
 
     # Message Broker Configurations
     BROKER_HOST: str
@@ -0,0 +1,424 @@
+import asyncio
+import csv
+import gzip
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from time import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+from fastapi import Request
+from influxdb_client import BucketRetentionRules, BucketsApi, InfluxDBClient
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from server.config.factory import settings
+from server.database.audit.executor import get_query_executor, run_query
+from server.database.audit.export import NUMERIC_COLUMNS, pyarrow, write_export_file
+from server.database.audit.points import get_invariant_fields, process_point, read_event_trail, read_points_from_shards
+from server.database.audit.search import prune_search_index
+from server.database.managers import get_async_redis_client, get_async_session_factory, get_redis_client
+from server.events.influxdb import influxdb_event
+from server.models.users import UserAccount
+from server.schemas.inc.audit import AuditRequestSchema, AuditRetrievalRequestSchema
+from server.utils.formatters import format_flux_time, parse_flux_duration, resolve_flux_time
+from server.utils.messages import raise_400_bad_request
+from server.utils.tasks import publish_task
+
+logger = logging.getLogger(__name__)
+
+INTEGER_COLUMNS = {"event_stage", "affected_resources"}
+ARCHIVE_LOCK = "archive:lock"
+DAY = timedelta(days=1)
+
+archive_state: Dict[str, Union[asyncio.Task, None]] = {"task": None}
+
+
+def get_retention_seconds(plan: str) -> int:
+    if plan not in settings.RETENTION_PLANS:
+        raise raise_400_bad_request(message=f"Plan must be one of {', '.join(settings.RETENTION_PLANS)}.")
+    return int(parse_flux_duration(settings.RETENTION_PLANS[plan]))
+
+
+def build_retention_rules(plan: str) -> BucketRetentionRules:
+    return BucketRetentionRules(type="expire", every_seconds=get_retention_seconds(plan))
+
+
+def get_archive_format() -> str:
+    return "parquet" if pyarrow else "csv"
+
+
+def get_archive_path(bucket: str, day: datetime, archive_format: str) -> str:
+    extension = "csv.gz" if archive_format == "csv" else "parquet"
+    return os.path.join(settings.ARCHIVE_DIRECTORY, bucket, f"{day:%Y-%m-%d}.{extension}")
+
+
+def find_archive_file(bucket: str, day: datetime) -> Union[str, None]:
+    for archive_format in ("parquet", "csv"):
+        path = get_archive_path(bucket, day, archive_format)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def get_day(ts: datetime) -> datetime:
+    return ts.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_cold_boundary(retention: int, now: datetime) -> datetime:
+    # days before the first day that started in the hot window may be partially expired from InfluxDB
+    return get_day(now - timedelta(seconds=retention)) + DAY
+
+
+def plan_archive_days(
+    bucket: str, retention: int, now: datetime, stale_days: Iterable[datetime] = ()
+) -> List[datetime]:
+    days = []
+    day = get_cold_boundary(retention, now)
+    while day + DAY <= now:
+        if day in stale_days or not find_archive_file(bucket, day):
+            days.append(day)
+        day += DAY
+    return days
+
+
+def get_stale_archive_key(bucket: str) -> str:
+    return f"archive:stale:{bucket}"
+
+
+async def take_stale_archive_days(redis_client: AsyncRedis, bucket: str) -> List[datetime]:
+    # days are removed before being archived again, so events written meanwhile mark them anew
+    key = get_stale_archive_key(bucket)
+    members = await redis_client.smembers(key)
+    if members:
+        await redis_client.srem(key, *members)
+    return [datetime.strptime(member.decode(), "%Y-%m-%d").replace(tzinfo=timezone.utc) for member in members]
+
+
+def read_bucket_retention(client: InfluxDBClient, bucket: str) -> Union[int, None]:
+    key = f"retention:{bucket}"
+    redis_client: Redis = get_redis_client()
+    cached = redis_client.get(key)
+    if cached is not None:
+        return int(cached) or None
+
+    found = BucketsApi(client).find_bucket_by_name(bucket)
+    rules = found.retention_rules if found else []
+    retention = max((rule.every_seconds or 0 for rule in rules), default=0)
+    redis_client.set(key, retention, ex=settings.QUERY_STATS_TTL)
+    return retention or None
+
+
+def list_expiring_buckets(client: InfluxDBClient) -> List[Tuple[str, int]]:
+    # system buckets start with an underscore and rollups never expire
+    bucket_api = BucketsApi(client)
+    buckets = []
+    offset = 0
+    while True:
+        page = bucket_api.find_buckets(org=settings.INFLUXDB_ORG, offset=offset, limit=100).buckets or []
+        for bucket in page:
+            retention = max((rule.every_seconds or 0 for rule in bucket.retention_rules or []), default=0)
+            if retention and not bucket.name.startswith("_"):
+                buckets.append((bucket.name, retention))
+        if len(page) < 100:
+            return buckets
+        offset += 100
+
+
+def archive_bucket_day(client: InfluxDBClient, organization: str, bucket: str, day: datetime) -> int:
+    query = (
+        f'from(bucket: "{bucket}")'
+        f" |> range(start: {format_flux_time(day)}, stop: {format_flux_time(day + DAY)})"
+        ' |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'
+        ' |> group() |> sort(columns: ["_time"])'
+    )
+    query_api = client.query_api()
+    records = query_api.query_stream(query=query, org=organization)
+
+    archive_format = get_archive_format()
+    path = get_archive_path(bucket, day, archive_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return write_export_file(records=records, path=path, export_format=archive_format)
+
+
+def archive_buckets(
+    client: InfluxDBClient,
+    organization: str,
+    buckets: List[Tuple[str, int]],
+    stale_days: Union[Dict[str, List[datetime]], None] = None,
+) -> List[AuditRequestSchema]:
+    events = []
+    now = datetime.now(timezone.utc)
+    stale_days = stale_days or {}
+
+    for bucket, retention in buckets:
+        for day in plan_archive_days(bucket, retention, now, stale_days.get(bucket, [])):
+            start_time = time()
+            rows = archive_bucket_day(client, organization, bucket, day)
+            events.append(
+                influxdb_event(
+                    execution_time=(time() - start_time) * 1000,
+                    event_method="GET",
+                    event_name="bucket-archive",
+                    event_type="read",
+                    event_description=f"Archive the events of {bucket} from {day:%Y-%m-%d} into the cold tier",
+                    data={"bucket_name": bucket, "day": f"{day:%Y-%m-%d}", "rows": rows},
+                )
+            )
+
+    return events
+
+
+async def run_archival_loop(client: InfluxDBClient, organization: str, admin: UserAccount) -> None:
+    # the lock expires with the interval, so a single process archives per interval
+    redis_client: AsyncRedis = get_async_redis_client()
+    loop = asyncio.get_running_loop()
+
+    while True:
+        if await redis_client.set(ARCHIVE_LOCK, 1, nx=True, ex=settings.ARCHIVE_INTERVAL):
+            try:
+                buckets = await loop.run_in_executor(get_query_executor(), list_expiring_buckets, client)
+                stale_days = {bucket: await take_stale_archive_days(redis_client, bucket) for bucket, _ in buckets}
+                events = await loop.run_in_executor(
+                    get_query_executor(), archive_buckets, client, organization, buckets, stale_days
+                )
+                if events:
+                    publish_task(admin=admin, bucket=admin.username, event_data=events)
+
+                async with get_async_session_factory()() as session:
+                    await prune_search_index(session, buckets)
+            except Exception:
+                logger.exception("Archival failed")
+        await asyncio.sleep(settings.ARCHIVE_INTERVAL)
+
+
+def start_archival(client: InfluxDBClient, organization: str, admin: UserAccount) -> None:
+    archive_state["task"] = asyncio.get_running_loop().create_task(run_archival_loop(client, organization, admin))
+
+
+async def stop_archival() -> None:
+    task = archive_state["task"]
+    archive_state["task"] = None
+    if task:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def read_archive_batches(
+    path: str, parameters: AuditRetrievalRequestSchema, start: datetime, stop: datetime
+) -> Iterator[Iterable[Dict[str, Any]]]:
+    # formatted timestamps sort like the times they hold
+    start_time, stop_time = format_flux_time(start), format_flux_time(stop)
+
+    if path.endswith(".parquet"):
+        archive = pyarrow.parquet.ParquetFile(path)
+        # days are written in ascending time, so the last row group holds the newest events
+        for index in reversed(range(archive.num_row_groups)):
+            table = archive.read_row_group(index)
+            mask = pyarrow.compute.and_(
+                pyarrow.compute.and_(
+                    pyarrow.compute.is_in(table["category"], value_set=pyarrow.array(parameters.category)),
+                    pyarrow.compute.is_in(table["application"], value_set=pyarrow.array(parameters.app)),
+                ),
+                pyarrow.compute.and_(
+                    pyarrow.compute.greater_equal(table["timestamp"], start_time),
+                    pyarrow.compute.less(table["timestamp"], stop_time),
+                ),
+            )
+            yield table.filter(mask).to_pylist()
+        return
+
+    with gzip.open(path, "rt", newline="") as reader:
+        rows = csv.DictReader(reader)
+        rows = (row for row in rows if row["category"] in parameters.category and row["application"] in parameters.app)
+        yield (row for row in rows if start_time <= row["timestamp"] < stop_time)
+
+
+def restore_archived_values(row: Dict[str, Any]) -> Dict[str, Any]:
+    values = {key: None if value == "" else value for key, value in row.items()}
+    for column in NUMERIC_COLUMNS:
+        if values[column] is not None:
+            values[column] = int(float(values[column])) if column in INTEGER_COLUMNS else float(values[column])
+
+    values["_time"] = datetime.fromisoformat(values.pop("timestamp").replace("Z", "+00:00"))
+    values["_measurement"] = values.pop("category")
+    # the metadata column already holds the fields outside of the schema
+    return values
+
+
+def matches_archived_values(
+    values: Dict[str, Any],
+    parameters: AuditRetrievalRequestSchema,
+    tie_break: Union[Tuple[datetime, str], None],
+) -> bool:
+    filters = (
+        ("env", "environment"),
+        ("method", "method"),
+        ("status", "status"),
+        ("origin", "actor_origin"),
+        ("resource_id", "resource_id"),
+        ("resource_type", "resource_type"),
+    )
+    for name, column in filters:
+        if getattr(parameters, name) and values[column] != getattr(parameters, name):
+            return False
+
+    if tie_break:
+        timestamp, environment = tie_break
+        return values["_time"] < timestamp or values["environment"] < environment
+    return True
+
+
+def read_archived_points(
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    limit: int = 50,
+    tie_break: Union[Tuple[datetime, str], None] = None,
+) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+    invariant_fields = get_invariant_fields()
+
+    events = []
+    day = get_day(stop - timedelta(microseconds=1))
+    while day + DAY > start and len(events) < limit:
+        path = find_archive_file(bucket, day)
+        if path:
+            events.extend(
+                process_point(values, invariant_fields)
+                for values in read_archived_day(path, parameters, start, stop, limit - len(events), tie_break)
+            )
+        day -= DAY
+
+    return events
+
+
+def read_archived_day(
+    path: str,
+    parameters: AuditRetrievalRequestSchema,
+    start: datetime,
+    stop: datetime,
+    limit: int,
+    tie_break: Union[Tuple[datetime, str], None],
+) -> List[Dict[str, Any]]:
+    matches = []
+    for batch in read_archive_batches(path, parameters, start, stop):
+        for row in batch:
+            values = restore_archived_values(row)
+            if matches_archived_values(values, parameters, tie_break):
+                matches.append(values)
+            if len(matches) >= 2 * limit:
+                matches = heapq.nlargest(limit, matches, key=get_archived_order)
+
+        # the remaining batches only hold older events
+        if len(matches) >= limit:
+            break
+
+    return heapq.nlargest(limit, matches, key=get_archived_order)
+
+
+def get_archived_order(values: Dict[str, Any]) -> Tuple[datetime, str]:
+    return values["_time"], values["environment"]
+
+
+async def read_points_from_tiers(
+    request: Request,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    limit: int = 50,
+    cursor_filter: Union[str, None] = None,
+    tie_break: Union[Tuple[datetime, str], None] = None,
+) -> List[Dict[str, Any]]:
+    retention = await run_query(request, read_bucket_retention, client=client, bucket=bucket)
+    now = datetime.now(timezone.utc)
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+    boundary = get_cold_boundary(retention, now) if retention else None
+
+    events = []
+    if not boundary or stop > boundary:
+        hot = parameters
+        if boundary and start < boundary:
+            hot = parameters.copy(update={"start": format_flux_time(boundary)})
+        events = await read_points_from_shards(
+            request,
+            client=client,
+            organization=organization,
+            bucket=bucket,
+            parameters=hot,
+            limit=limit,
+            cursor_filter=cursor_filter,
+        )
+
+    if boundary and start < boundary and len(events) < limit:
+        cold = parameters.copy(update={"start": format_flux_time(start), "stop": format_flux_time(min(stop, boundary))})
+        events += await run_query(
+            request,
+            read_archived_points,
+            bucket=bucket,
+            parameters=cold,
+            limit=limit - len(events),
+            tie_break=tie_break,
+        )
+    return events
+
+
+def read_archived_event(path: str, event_id: str) -> List[Dict[str, Any]]:
+    if path.endswith(".parquet"):
+        rows = pyarrow.parquet.read_table(path, filters=[("event_id", "=", event_id)]).to_pylist()
+    else:
+        with gzip.open(path, "rt", newline="") as reader:
+            rows = [row for row in csv.DictReader(reader) if row["event_id"] == event_id]
+    return sorted((restore_archived_values(row) for row in rows), key=get_archived_order, reverse=True)
+
+
+def read_archived_trail(bucket: str, event_id: str, stop: datetime, started: bool = False) -> List[Dict[str, Any]]:
+    directory = os.path.join(settings.ARCHIVE_DIRECTORY, bucket)
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    days = sorted({name[:10] for name in names if not name.endswith(".part")}, reverse=True)
+    invariant_fields = get_invariant_fields()
+
+    events = []
+    for name in days:
+        day = datetime.strptime(name, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        path = find_archive_file(bucket, day) if day < stop else None
+        if not path:
+            continue
+
+        values = read_archived_event(path, event_id)
+        # the stages of an event are written together, so older days hold none once the trail ended
+        if not values and (started or events):
+            break
+        events.extend(process_point(item, invariant_fields) for item in values)
+
+    return events
+
+
+async def read_event_trail_from_tiers(
+    request: Request,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    event_id: str,
+) -> List[Dict[str, Any]]:
+    retention = await run_query(request, read_bucket_retention, client=client, bucket=bucket)
+    boundary = get_cold_boundary(retention, datetime.now(timezone.utc)) if retention else None
+
+    events = await run_query(
+        request,
+        read_event_trail,
+        client=client,
+        organization=organization,
+        bucket=bucket,
+        event_id=event_id,
+        start=format_flux_time(boundary) if boundary else "0",
+    )
+    if boundary:
+        events += await run_query(
+            request, read_archived_trail, bucket=bucket, event_id=event_id, stop=boundary, started=bool(events)
+        )
+    return events
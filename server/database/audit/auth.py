@@ -5,6 +5,8 @@ from influxdb_client import BucketsApi, InfluxDBClient
 from sqlmodel import Session, select
 
 from server.config.factory import settings
+from server.database.audit.archive import build_retention_rules
+from server.database.audit.rollups import create_rollup_tasks
 from server.events.influxdb import influxdb_event
 from server.models.users import UserAccount
 from server.schemas.inc.audit import AuditRequestSchema
@@ -37,19 +39,27 @@ def create_user_bucket(
 ) -> AuditRequestSchema:
     start_time = time()
 
-    with client:
-        bucket_api = BucketsApi(client)
-        bucket_api.create_bucket(
-            bucket_name=user["username"],
-            org=settings.INFLUXDB_ORG,
-        )
+    bucket_api = BucketsApi(client)
+    plan = user.get("plan", settings.DEFAULT_RETENTION_PLAN)
+    bucket_api.create_bucket(
+        bucket_name=user["username"],
+        retention_rules=build_retention_rules(plan),
+        org=settings.INFLUXDB_ORG,
+    )
+    rollup_buckets = create_rollup_tasks(client=client, bucket=user["username"])
 
     event = influxdb_event(
         execution_time=(time() - start_time) * 1000,
         event_method="POST",
         event_name="bucket-create",
         event_type="write",
-        event_description="Create new bucket for user",
-        data={"bucket_name": user["username"], "org": settings.INFLUXDB_ORG},
+        event_description="Create new bucket for user with the retention of its plan and its downsampling rollups",
+        data={
+            "bucket_name": user["username"],
+            "org": settings.INFLUXDB_ORG,
+            "plan": plan,
+            "retention": settings.RETENTION_PLANS[plan],
+            "rollup_buckets": rollup_buckets,
+        },
     )
     return event
@@ -0,0 +1,185 @@
+import json
+from datetime import datetime, timezone
+from time import time
+from typing import Any, Dict, List, Tuple, Union
+
+from influxdb_client import InfluxDBClient
+from redis import Redis
+
+from server.config.factory import settings
+from server.database.audit.rollups import ROLLUP_TAGS, find_rollup
+from server.database.managers import get_redis_client
+from server.events.influxdb import influxdb_event
+from server.schemas.inc.audit import AuditRequestSchema, AuditRetrievalRequestSchema
+from server.utils.formatters import format_flux_columns, format_flux_filter, parse_flux_duration, resolve_flux_time
+
+# candidate intervals of queries that have to be coarsened
+COARSEN_INTERVALS = ["1s", "10s", "1m", "5m", "15m", "1h", "6h", "1d", "1w"]
+
+
+def get_stats_key(bucket: str, parameters: AuditRetrievalRequestSchema, group_by: Union[List[str], None]) -> str:
+    categories = ",".join(sorted(set(parameters.category)))
+    apps = ",".join(sorted(set(parameters.app)))
+    return f"stats:{bucket}:{categories}:{apps}:{','.join(group_by or [])}"
+
+
+def count_from_query(client: InfluxDBClient, organization: str, query: str) -> int:
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
+    return sum(record.get_value() or 0 for table in result for record in table.records)
+
+
+def read_query_stats(
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    group_by: Union[List[str], None] = None,
+) -> Dict[str, float]:
+    key = get_stats_key(bucket, parameters, group_by)
+    redis_client: Redis = get_redis_client()
+    cached = redis_client.get(key)
+    if cached:
+        return json.loads(cached)
+
+    query = f'from(bucket: "{bucket}") |> range(start: -1d)'
+    query += format_flux_filter("_measurement", parameters.category)
+    query += format_flux_filter("application", parameters.app)
+    events = query + ' |> filter(fn: (r) => r["_field"] == "event_id")'
+    rows = count_from_query(client, organization, events + " |> group() |> count()")
+
+    cardinality = 1
+    if group_by and len(group_by) > 1:
+        # combinations of several columns are counted as groups of pivoted rows
+        fields = ["event_id"] + [column for column in group_by if column not in ROLLUP_TAGS]
+        groups = (
+            f" |> filter(fn: (r) => contains(value: r._field, set: {format_flux_columns(fields)}))"
+            ' |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'
+            f" |> group(columns: {format_flux_columns(group_by)})"
+            ' |> count(column: "event_id") |> group() |> count(column: "event_id")'
+            ' |> rename(columns: {event_id: "_value"})'
+        )
+        cardinality = count_from_query(client, organization, query + groups)
+    elif group_by and group_by[0] in ROLLUP_TAGS:
+        cardinality = count_from_query(
+            client, organization, events + f' |> group() |> distinct(column: "{group_by[0]}") |> count()'
+        )
+    elif group_by:
+        cardinality = count_from_query(
+            client,
+            organization,
+            query + f' |> filter(fn: (r) => r["_field"] == "{group_by[0]}") |> group() |> distinct() |> count()',
+        )
+
+    stats = {"rows_per_hour": rows / 24, "cardinality": max(cardinality, 1)}
+    redis_client.set(key, json.dumps(stats), ex=settings.QUERY_STATS_TTL)
+    return stats
+
+
+def estimate_query_cost(
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    stats: Dict[str, float],
+) -> Dict[str, float]:
+    now = datetime.now(timezone.utc)
+    range_seconds = (resolve_flux_time(parameters.stop, now) - resolve_flux_time(parameters.start, now)).total_seconds()
+    range_seconds = max(range_seconds, 0)
+    windows = -(-range_seconds // parse_flux_duration(interval))
+
+    return {
+        "range_hours": range_seconds / 3600,
+        "windows": windows,
+        "points": windows * stats["cardinality"],
+        "rows": stats["rows_per_hour"] * range_seconds / 3600,
+    }
+
+
+def plan_metric_query(
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    metric_name: str,
+    agg: Union[str, None] = None,
+    group_by: Union[List[str], None] = None,
+    top_k: Union[int, None] = None,
+) -> Tuple[Dict[str, Any], AuditRequestSchema]:
+    start_time = time()
+    plan: Dict[str, Any] = {"decision": "accept", "requested_interval": interval, "interval": interval}
+
+    try:
+        parse_flux_duration(interval)
+    except ValueError:
+        plan.update({"decision": "reject", "message": f"Invalid interval {interval}."})
+        return plan, query_plan_event(start_time, bucket, metric_name, plan)
+
+    stats = read_query_stats(client, organization, bucket, parameters, group_by)
+    if top_k:
+        # every group past the top K is folded into a single other group
+        stats = {**stats, "cardinality": min(stats["cardinality"], top_k + 1)}
+    cost = estimate_query_cost(parameters, interval, stats)
+
+    if cost["points"] > settings.QUERY_MAX_POINTS:
+        hint = ""
+        if group_by:
+            hint = f" or group by fields with fewer than {int(stats['cardinality'])} combined values"
+            hint += ", or lower top_k" if top_k else ", or keep the heaviest groups with top_k"
+        for candidate in COARSEN_INTERVALS:
+            if parse_flux_duration(candidate) <= parse_flux_duration(interval):
+                continue
+            candidate_cost = estimate_query_cost(parameters, candidate, stats)
+            if candidate_cost["points"] <= settings.QUERY_MAX_POINTS:
+                plan.update({"decision": "coarsen", "interval": candidate})
+                cost = candidate_cost
+                break
+        else:
+            plan.update(
+                {
+                    "decision": "reject",
+                    "message": (
+                        f"The query would return about {int(cost['points'])} points, more than the "
+                        f"{settings.QUERY_MAX_POINTS} allowed. Shorten the range between start and stop{hint}."
+                    ),
+                }
+            )
+
+    resolution = None
+    if plan["decision"] != "reject" and agg and not top_k:
+        resolution = find_rollup(client, bucket, parameters, plan["interval"], metric_name, agg, group_by)
+
+    if resolution:
+        plan["resolution"] = resolution
+        if plan["decision"] == "accept":
+            plan["decision"] = "rollup"
+    elif plan["decision"] != "reject" and cost["rows"] > settings.QUERY_MAX_SCANNED_ROWS:
+        plan.update(
+            {
+                "decision": "reject",
+                "message": (
+                    f"The query would scan about {int(cost['rows'])} events, more than the "
+                    f"{settings.QUERY_MAX_SCANNED_ROWS} allowed. Shorten the range between start and stop, or "
+                    "use an interval that is a multiple of 1m without method, status and origin filters "
+                    "so that it can be answered from the rollups."
+                ),
+            }
+        )
+
+    plan.update({key: round(value, 2) for key, value in cost.items()})
+    return plan, query_plan_event(start_time, bucket, metric_name, plan)
+
+
+def query_plan_event(
+    start_time: float,
+    bucket: str,
+    metric_name: str,
+    plan: Dict[str, Any],
+) -> AuditRequestSchema:
+    return influxdb_event(
+        execution_time=(time() - start_time) * 1000,
+        event_method="GET",
+        event_name="query-plan",
+        event_type="read",
+        event_description=f"Plan metric query ({plan['decision']})",
+        data={"bucket": bucket, "metric_name": metric_name, **plan},
+    )
@@ -0,0 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable
+
+from fastapi import Request
+
+from server.config.factory import settings
+from server.utils.messages import raise_499_client_closed_request, raise_504_gateway_timeout
+
+
+@lru_cache()
+def get_query_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=settings.INFLUXDB_QUERY_WORKERS,
+        thread_name_prefix="influxdb-query",
+    )
+
+
+async def wait_for_disconnect(request: Request, poll_interval: float = 0.5) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
+
+
+async def run_query(request: Request, func: Callable[..., Any], **kwargs) -> Any:
+    # the worker thread itself is only released by the HTTP timeout of the InfluxDB client
+    loop = asyncio.get_running_loop()
+    query = loop.run_in_executor(get_query_executor(), partial(func, **kwargs))
+    disconnect = asyncio.ensure_future(wait_for_disconnect(request))
+
+    try:
+        done, _ = await asyncio.wait(
+            {query, disconnect},
+            timeout=settings.INFLUXDB_QUERY_TIMEOUT,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    finally:
+        disconnect.cancel()
+
+    if query in done:
+        return query.result()
+
+    query.cancel()
+    if disconnect in done:
+        raise raise_499_client_closed_request(message="Client disconnected before the query completed.")
+    raise raise_504_gateway_timeout(message=f"Query did not complete within {settings.INFLUXDB_QUERY_TIMEOUT} seconds.")
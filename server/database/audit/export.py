@@ -0,0 +1,297 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+from uuid import uuid4
+
+from influxdb_client import InfluxDBClient
+from influxdb_client.client.flux_table import FluxRecord
+from redis.asyncio import Redis
+
+from server.config.factory import settings
+from server.database.audit.executor import get_query_executor
+from server.database.audit.points import build_influxdb_query, get_invariant_fields
+from server.database.managers import get_async_redis_client
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import format_flux_time, parse_flux_duration, resolve_flux_time
+from server.utils.messages import raise_400_bad_request, raise_404_not_found, raise_409_conflict
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - parquet exports are optional
+    pyarrow = None
+
+EXPORT_COLUMNS = [
+    "timestamp",
+    "category",
+    "application",
+    "environment",
+    "method",
+    "status",
+    "level",
+    "event_id",
+    "event_name",
+    "event_type",
+    "event_stage",
+    "event_duration",
+    "affected_resources",
+    "latency",
+    "cpu_usage",
+    "memory_usage",
+    "event_description",
+    "event_detail",
+    "actor_origin",
+    "actor_detail",
+    "resource_id",
+    "resource_name",
+    "resource_type",
+    "resource_detail",
+    "metadata",
+]
+NUMERIC_COLUMNS = {"event_stage", "affected_resources", "event_duration", "latency", "cpu_usage", "memory_usage"}
+MAX_EXPORT_CHUNKS = 10000
+EXPORT_LOCK_TTL = 30
+
+
+def get_export_formats() -> List[str]:
+    return ["csv", "parquet"] if pyarrow else ["csv"]
+
+
+def get_export_key(job_id: str) -> str:
+    return f"export:{job_id}"
+
+
+def get_export_directory(job_id: str) -> str:
+    return os.path.join(settings.EXPORT_DIRECTORY, job_id)
+
+
+def get_chunk_path(job_id: str, index: int, export_format: str) -> str:
+    extension = "csv.gz" if export_format == "csv" else "parquet"
+    return os.path.join(get_export_directory(job_id), f"chunk-{index:05d}.{extension}")
+
+
+def split_export_range(start: datetime, stop: datetime, chunk: str) -> List[Tuple[datetime, datetime]]:
+    step = timedelta(seconds=parse_flux_duration(chunk))
+    chunks = []
+    while start < stop:
+        chunks.append((start, min(start + step, stop)))
+        start += step
+    return chunks
+
+
+def build_export_row(values: Dict[str, Any], invariant_fields: List[str]) -> Dict[str, Any]:
+    metadata = json.loads(values["metadata"]) if values.get("metadata") else {}
+    for key in values:
+        if key not in invariant_fields:
+            metadata[key] = values[key]
+
+    row = {column: values.get(column) for column in EXPORT_COLUMNS}
+    row.update(
+        {
+            "timestamp": format_flux_time(values["_time"]),
+            "category": values["_measurement"],
+            "metadata": json.dumps(metadata, default=str) if metadata else None,
+        }
+    )
+    return row
+
+
+def write_csv_chunk(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    count = 0
+    with gzip.open(path, "wt", newline="") as writer:
+        csv_writer = csv.DictWriter(writer, fieldnames=EXPORT_COLUMNS)
+        csv_writer.writeheader()
+        for row in rows:
+            csv_writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet_chunk(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    schema = pyarrow.schema(
+        [(column, pyarrow.float64() if column in NUMERIC_COLUMNS else pyarrow.string()) for column in EXPORT_COLUMNS]
+    )
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == settings.EXPORT_ROW_GROUP:
+                writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def write_export_file(records: Iterable[FluxRecord], path: str, export_format: str) -> int:
+    invariant_fields = get_invariant_fields()
+    rows = (build_export_row(record.values, invariant_fields) for record in records)
+
+    partial_path = f"{path}.part"
+    writer = write_csv_chunk if export_format == "csv" else write_parquet_chunk
+    count = writer(partial_path, rows)
+    os.replace(partial_path, path)
+    return count
+
+
+def export_chunk(
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    path: str,
+    export_format: str,
+) -> int:
+    # the file only appears under its final name once it is complete
+    query = build_influxdb_query(bucket=bucket, parameters=parameters) + ' |> group() |> sort(columns: ["_time"])'
+    query_api = client.query_api()
+    records = query_api.query_stream(query=query, org=organization)
+    return write_export_file(records=records, path=path, export_format=export_format)
+
+
+async def create_export_job(
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    export_format: str,
+) -> Dict[str, Any]:
+    if export_format not in get_export_formats():
+        raise raise_400_bad_request(message=f"Export format must be one of {', '.join(get_export_formats())}.")
+
+    now = datetime.now(timezone.utc)
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+    chunks = split_export_range(start, stop, settings.EXPORT_CHUNK)
+    if not chunks:
+        raise raise_400_bad_request(message="The export range is empty.")
+    if len(chunks) > MAX_EXPORT_CHUNKS:
+        raise raise_400_bad_request(message=f"The export range spans more than {MAX_EXPORT_CHUNKS} chunks.")
+
+    job_id = str(uuid4())
+    parameters = parameters.copy(update={"start": format_flux_time(start), "stop": format_flux_time(stop)})
+    client: Redis = get_async_redis_client()
+    await client.hset(
+        get_export_key(job_id),
+        mapping={
+            "id": job_id,
+            "bucket": bucket,
+            "format": export_format,
+            "parameters": parameters.json(),
+            "chunks": len(chunks),
+            "rows": 0,
+            "status": "pending",
+            "error": "",
+            "created_at": format_flux_time(now),
+        },
+    )
+    return await read_export_job(job_id=job_id, bucket=bucket)
+
+
+async def read_export_job(job_id: str, bucket: str) -> Dict[str, Any]:
+    client: Redis = get_async_redis_client()
+    job = await client.hgetall(get_export_key(job_id))
+    job = {key.decode("utf-8"): value.decode("utf-8") for key, value in job.items()}
+    if not job or job["bucket"] != bucket:
+        raise raise_404_not_found(message=f"Export {job_id} does not exist.")
+
+    completed = sorted(int(index) for index in await client.smembers(f"{get_export_key(job_id)}:done"))
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "format": job["format"],
+        "chunks": int(job["chunks"]),
+        "completed": len(completed),
+        "rows": int(job["rows"]),
+        "files": [get_chunk_path(job_id, index, job["format"]) for index in completed],
+        "error": job["error"] or None,
+        "created_at": job["created_at"],
+    }
+
+
+async def is_export_running(job_id: str) -> bool:
+    client: Redis = get_async_redis_client()
+    return bool(await client.exists(f"{get_export_key(job_id)}:lock"))
+
+
+async def refresh_export_lock(job_id: str) -> None:
+    client: Redis = get_async_redis_client()
+    while True:
+        await asyncio.sleep(EXPORT_LOCK_TTL / 3)
+        await client.expire(f"{get_export_key(job_id)}:lock", EXPORT_LOCK_TTL)
+
+
+async def run_export_job(client: InfluxDBClient, organization: str, job_id: str) -> None:
+    # completed chunks are recorded one by one so that an interrupted job resumes where it stopped
+    redis_client: Redis = get_async_redis_client()
+    key = get_export_key(job_id)
+    if not await redis_client.set(f"{key}:lock", 1, nx=True, ex=EXPORT_LOCK_TTL):
+        return
+
+    refresher = asyncio.create_task(refresh_export_lock(job_id))
+    try:
+        job = {k.decode("utf-8"): v.decode("utf-8") for k, v in (await redis_client.hgetall(key)).items()}
+        parameters = AuditRetrievalRequestSchema.parse_raw(job["parameters"])
+        completed = {int(index) for index in await redis_client.smembers(f"{key}:done")}
+        chunks = split_export_range(
+            resolve_flux_time(parameters.start, datetime.now(timezone.utc)),
+            resolve_flux_time(parameters.stop, datetime.now(timezone.utc)),
+            settings.EXPORT_CHUNK,
+        )
+
+        os.makedirs(get_export_directory(job_id), exist_ok=True)
+        await redis_client.hset(key, mapping={"status": "running", "error": ""})
+        semaphore = asyncio.Semaphore(settings.EXPORT_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+
+        async def run_chunk(index: int, chunk_start: datetime, chunk_stop: datetime) -> None:
+            chunk_parameters = parameters.copy(
+                update={"start": format_flux_time(chunk_start), "stop": format_flux_time(chunk_stop)}
+            )
+            async with semaphore:
+                count = await loop.run_in_executor(
+                    get_query_executor(),
+                    lambda: export_chunk(
+                        client=client,
+                        organization=organization,
+                        bucket=job["bucket"],
+                        parameters=chunk_parameters,
+                        path=get_chunk_path(job_id, index, job["format"]),
+                        export_format=job["format"],
+                    ),
+                )
+            await redis_client.sadd(f"{key}:done", index)
+            await redis_client.hincrby(key, "rows", count)
+
+        results = await asyncio.gather(
+            *[
+                run_chunk(index, chunk_start, chunk_stop)
+                for index, (chunk_start, chunk_stop) in enumerate(chunks)
+                if index not in completed
+            ],
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+        await redis_client.hset(key, "status", "completed")
+    except Exception as e:
+        await redis_client.hset(key, mapping={"status": "failed", "error": str(e) or type(e).__name__})
+    finally:
+        refresher.cancel()
+        await redis_client.delete(f"{key}:lock")
+
+
+async def resume_export_job(job_id: str, bucket: str) -> Dict[str, Any]:
+    job = await read_export_job(job_id=job_id, bucket=bucket)
+    if job["status"] == "completed":
+        raise raise_409_conflict(message=f"Export {job_id} is already completed.")
+    if await is_export_running(job_id):
+        raise raise_409_conflict(message=f"Export {job_id} is already running.")
+    return job
@@ -0,0 +1,105 @@
+import asyncio
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta, timezone
+from itertools import islice, product
+from typing import Any, Dict, List, Tuple, Union
+
+from fastapi import Request
+from influxdb_client import InfluxDBClient
+
+from server.config.factory import settings
+from server.database.audit.archive import read_points_from_tiers
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import format_flux_time, resolve_flux_time
+from server.utils.messages import raise_400_bad_request
+
+LogCursor = Tuple[datetime, str, str, str]
+
+
+def get_sort_key(item: Dict[str, Any]) -> LogCursor:
+    return item["timestamp"], item["category"], item["tags"]["application"], item["tags"]["environment"]
+
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    timestamp, category, app, env = get_sort_key(item)
+    payload = json.dumps([format_flux_time(timestamp), category, app, env])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("utf-8")
+
+
+def decode_cursor(cursor: str) -> LogCursor:
+    try:
+        timestamp, category, app, env = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00")), category, app, env
+    except (ValueError, TypeError):
+        raise raise_400_bad_request(message="Invalid cursor.")
+
+
+def build_stream_parameters(
+    parameters: AuditRetrievalRequestSchema,
+    category: str,
+    app: str,
+    cursor: Union[LogCursor, None] = None,
+) -> Tuple[Union[AuditRetrievalRequestSchema, None], Union[str, None]]:
+    # rows are sorted by time, category, app and env, so only rows at the cursor time need the env tie-break
+    stream = parameters.copy(update={"category": [category], "app": [app]})
+    if not cursor:
+        return stream, None
+
+    timestamp, cursor_category, cursor_app, cursor_env = cursor
+    cursor_filter = None
+    if (category, app) > (cursor_category, cursor_app):
+        stop = timestamp
+    else:
+        stop = timestamp + timedelta(microseconds=1)
+        if (category, app) == (cursor_category, cursor_app):
+            cursor_filter = f'r["_time"] < {format_flux_time(timestamp)} or r["environment"] < "{cursor_env}"'
+
+    now = datetime.now(timezone.utc)
+    if stop <= resolve_flux_time(parameters.start, now):
+        return None, None
+    if stop < resolve_flux_time(parameters.stop, now):
+        stream.stop = format_flux_time(stop)
+
+    return stream, cursor_filter
+
+
+async def read_points_from_streams(
+    request: Request,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    offset: int,
+    limit: int = 50,
+    cursor: Union[str, None] = None,
+) -> Tuple[List[Dict[str, Any]], Union[str, None]]:
+    decoded_cursor = decode_cursor(cursor) if cursor else None
+    semaphore = asyncio.Semaphore(settings.INFLUXDB_QUERY_FANOUT)
+
+    async def read_stream(category: str, app: str) -> List[Dict[str, Any]]:
+        stream, cursor_filter = build_stream_parameters(parameters, category, app, decoded_cursor)
+        if not stream:
+            return []
+
+        tie_break = (decoded_cursor[0], decoded_cursor[3]) if cursor_filter else None
+        async with semaphore:
+            return await read_points_from_tiers(
+                request,
+                client=client,
+                organization=organization,
+                bucket=bucket,
+                parameters=stream,
+                limit=offset + limit,
+                cursor_filter=cursor_filter,
+                tie_break=tie_break,
+            )
+
+    pairs = product(sorted(set(parameters.category)), sorted(set(parameters.app)))
+    streams = await asyncio.gather(*[read_stream(category, app) for category, app in pairs])
+
+    merged = heapq.merge(*streams, key=get_sort_key, reverse=True)
+    page = list(islice(merged, offset, offset + limit))
+    next_cursor = encode_cursor(page[-1]) if len(page) == limit else None
+    return page, next_cursor
@@ -1,11 +1,29 @@
+import asyncio
 import json
+import math
+from datetime import datetime, timezone
 from functools import lru_cache
-from typing import List, Union
+from typing import Any, Callable, Dict, List, Tuple, Union
 
+from fastapi import Request
 from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.flux_table import FluxTable
 
+from server.config.factory import settings
+from server.database.audit.executor import run_query
+from server.database.audit.rollups import ROLLUP_TAGS, build_rollup_query, split_rollup_range
 from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import (
+    format_flux_columns,
+    format_flux_filter,
+    format_flux_time,
+    parse_flux_duration,
+    resolve_flux_time,
+)
+from server.utils.messages import raise_400_bad_request
+
+# aggregations that can be computed together in a single reduce
+COMBINED_AGGREGATES = ["count", "sum", "min", "max", "mean"]
 
 
 @lru_cache()
@@ -15,83 +33,110 @@ def get_invariant_fields() -> List[str]:
     return data["invariant_fields"]
 
 
+def process_point(values: Dict[str, Any], invariant_fields: List[str]) -> Dict[str, Any]:
+    # shaped exactly like `AuditResponseSchema` serializes it, so that it can be encoded without validation
+    variant_fields = list(filter(lambda x: x not in invariant_fields, values.keys()))
+    item = {
+        "category": values["_measurement"],
+        "tags": {
+            "application": values["application"],
+            "environment": values["environment"],
+        },
+        "method": values["method"],
+        "status": values["status"],
+        "level": values["level"],
+        "event": {
+            "id": values["event_id"],
+            "name": values["event_name"],
+            "type": values["event_type"],
+            "stage": values["event_stage"],
+            "totalDuration": values["event_duration"],
+            "affectedResources": values["affected_resources"],
+            "latency": values["latency"],
+            "cpuUsage": values["cpu_usage"],
+            "memoryUsage": values["memory_usage"],
+            "detail": {},
+            "description": values["event_description"],
+        },
+        "actor": {
+            "origin": values["actor_origin"],
+            "detail": {},
+        },
+        "resource": {
+            "id": values["resource_id"],
+            "name": values["resource_name"],
+            "type": values["resource_type"],
+            "detail": {},
+        },
+        "timestamp": values["_time"],
+    }
+
+    if values.get("event_detail", None):
+        item["event"]["detail"] = json.loads(values["event_detail"])
+    if values.get("actor_detail", None):
+        item["actor"]["detail"] = json.loads(values["actor_detail"])
+    if values.get("resource_detail", None):
+        item["resource"]["detail"] = json.loads(values["resource_detail"])
+
+    metadata = {}
+    if values.get("metadata", None):
+        for key, value in json.loads(values["metadata"]).items():
+            try:
+                metadata[key] = json.loads(value)
+            except (TypeError, ValueError):
+                metadata[key] = value
+
+    for key in variant_fields:
+        metadata[key] = values[key]
+
+    item["metadata"] = metadata
+    return item
+
+
 def proccess_points(tables: List[FluxTable]):
-    result = []
     invariant_fields = get_invariant_fields()
+    return [process_point(record.values, invariant_fields) for table in tables for record in table.records]
 
-    for table in tables:
-        for record in table.records:
-            values = record.values
-            variant_fields = list(filter(lambda x: x not in invariant_fields, values.keys()))
-            item = {
-                "category": values["_measurement"],
-                "tags": {
-                    "application": values["application"],
-                    "environment": values["environment"],
-                },
-                "method": values["method"],
-                "status": values["status"],
-                "level": values["level"],
-                "event": {
-                    "id": values["event_id"],
-                    "name": values["event_name"],
-                    "type": values["event_type"],
-                    "stage": values["event_stage"],
-                    "total_duration": values["event_duration"],
-                    "affected_resources": values["affected_resources"],
-                    "latency": values["latency"],
-                    "cpu_usage": values["cpu_usage"],
-                    "memory_usage": values["memory_usage"],
-                    "description": values["event_description"],
-                },
-                "actor": {
-                    "origin": values["actor_origin"],
-                },
-                "resource": {
-                    "id": values["resource_id"],
-                    "name": values["resource_name"],
-                    "type": values["resource_type"],
-                },
-                "timestamp": values["_time"],
-            }
-
-            if values.get("event_detail", None):
-                item["event"]["detail"] = json.loads(values["event_detail"])
-            if values.get("actor_detail", None):
-                item["actor"]["detail"] = json.loads(values["actor_detail"])
-            if values.get("resource_detail", None):
-                item["resource"]["detail"] = json.loads(values["resource_detail"])
-
-            metadata = {}
-            if values.get("metadata", None):
-                for key, value in json.loads(values["metadata"]).items():
-                    try:
-                        metadata[key] = json.loads(value)
-                    except ValueError:
-                        metadata[key] = value
-
-            for key in variant_fields:
-                metadata[key] = values[key]
-
-            item["metadata"] = metadata
-            result.append(item)
 
-    return result
+def get_query_fields(
+    parameters: AuditRetrievalRequestSchema,
+    metric_names: List[str],
+    group_by: Union[List[str], None] = None,
+) -> List[str]:
+    fields = metric_names + [column for column in group_by or [] if column not in ROLLUP_TAGS]
+    field_filters = (
+        ("method", "method"),
+        ("status", "status"),
+        ("origin", "actor_origin"),
+        ("resource_id", "resource_id"),
+        ("resource_type", "resource_type"),
+    )
+    for name, field in field_filters:
+        if getattr(parameters, name):
+            fields.append(field)
+    return list(dict.fromkeys(fields))
 
 
 def build_influxdb_query(
     bucket: str,
     parameters: AuditRetrievalRequestSchema,
+    cursor_filter: Union[str, None] = None,
+    fields: Union[List[str], None] = None,
 ):
     query = f'from(bucket: "{bucket}") |> range(start: {parameters.start}, stop: {parameters.stop})'
 
-    if parameters.category:
-        query += f'|> filter(fn: (r) => r["_measurement"] == "{parameters.category}")'
+    if cursor_filter:
+        query += f" |> filter(fn: (r) => {cursor_filter})"
 
-    query += f' |> filter(fn: (r) => r["application"] == "{parameters.app}")'
+    query += format_flux_filter("_measurement", parameters.category)
+    query += format_flux_filter("application", parameters.app)
     if parameters.env:
         query += f' |> filter(fn: (r) => r["environment"] == "{parameters.env}")'
 
+    if fields:
+        field_set = ", ".join(f'"{field}"' for field in fields)
+        query += f" |> filter(fn: (r) => contains(value: r._field, set: [{field_set}]))"
+
     query += ' |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'
 
     if parameters.method:
@@ -100,6 +145,10 @@ def build_influxdb_query(
         query += f' |> filter(fn: (r) => r["status"] == "{parameters.status}")'
     if parameters.origin:
         query += f' |> filter(fn: (r) => r["actor_origin"] == "{parameters.origin}")'
+    if parameters.resource_id:
+        query += f' |> filter(fn: (r) => r["resource_id"] == "{parameters.resource_id}")'
+    if parameters.resource_type:
+        query += f' |> filter(fn: (r) => r["resource_type"] == "{parameters.resource_type}")'
 
     return query
 
@@ -110,13 +159,16 @@ def read_points_from_bucket(
     bucket: str,
     parameters: AuditRetrievalRequestSchema,
     offset: int,
+    limit: int = 50,
+    cursor_filter: Union[str, None] = None,
 ) -> List[Point]:
-    query = build_influxdb_query(bucket=bucket, parameters=parameters)
-    query += f' |> sort(columns: ["_time"], desc: true) |> limit(n: 50, offset: {offset})'
+    query = build_influxdb_query(bucket=bucket, parameters=parameters, cursor_filter=cursor_filter)
+    query += (
+        f' |> group() |> sort(columns: ["_time", "environment"], desc: true) |> limit(n: {limit}, offset: {offset})'
+    )
 
-    with client:
-        query_api = client.query_api()
-        result = query_api.query(query=query, org=organization)
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
 
     result = proccess_points(result)
     return result
@@ -127,19 +179,18 @@ def read_event_trail(
     organization: str,
     bucket: str,
     event_id: str,
+    start: str = "0",
 ):
     query = (
         f'from(bucket: "{bucket}")'
-        " |> range(start: 0)"
+        f" |> range(start: {start})"
         ' |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'
         f' |> filter(fn: (r) => r["event_id"] == "{event_id}")'
         ' |> sort(columns: ["_time"], desc: true)'
     )
 
-    print(query)
-    with client:
-        query_api = client.query_api()
-        result = query_api.query(query=query, org=organization)
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
 
     result = proccess_points(result)
     return result
@@ -159,9 +210,8 @@ def read_list_of_available_metrics(
         ' |> yield(name: "fieldKeys")'
     )
 
-    with client:
-        query_api = client.query_api()
-        result = query_api.query(query=query, org=organization)
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
 
     metrics = [record.values["_value"] for table in result for record in table.records]
     invariant_fields = get_invariant_fields()
@@ -170,37 +220,70 @@ def read_list_of_available_metrics(
     return metrics + ["cpu_usage", "memory_usage"]
 
 
-def process_metric_result(tables: List[FluxTable], metric_name: str, group_by: str = None):
+def get_group_key(values: Dict[str, Any], group_by: Union[List[str], None]) -> str:
+    return ", ".join(str(values[column]) for column in group_by) if group_by else "all"
+
+
+def format_group_key(group_by: List[str]) -> str:
+    # must match `get_group_key` for string columns
+    return ' + ", " + '.join(f'(if exists r["{column}"] then string(v: r["{column}"]) else "")' for column in group_by)
+
+
+def process_metric_result(tables: List[FluxTable], metric_name: str, group_by: Union[List[str], None] = None):
     result = {}
     for table in tables:
         for record in table.records:
             values = record.values
+            key = get_group_key(values, group_by)
 
-            if group_by:
-                if values[group_by] not in result:
-                    result[values[group_by]] = []
+            if key not in result:
+                result[key] = []
 
-                result[values[group_by]].append(
-                    {
-                        "range": f'{values["_start"]} - {values["_stop"]}',
-                        "value": values[metric_name],
-                    },
-                )
-            else:
-                if "all" not in result:
-                    result["all"] = []
-
-                result["all"].append(
-                    {
-                        "range": f'{values["_start"]} - {values["_stop"]}',
-                        "value": values[metric_name],
-                    },
-                )
+            result[key].append(
+                {
+                    "range": f'{values["_start"]} - {values["_stop"]}',
+                    "value": values[metric_name],
+                },
+            )
 
     result = [{"group_key": key, "data": value} for key, value in result.items()]
     return result
 
 
+def read_top_groups(
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    metric_name: str,
+    group_by: List[str],
+    top_k: int,
+    order_by: str,
+) -> List[str]:
+    query = build_influxdb_query(
+        bucket=bucket,
+        parameters=parameters,
+        fields=get_query_fields(parameters, [metric_name], group_by),
+    )
+    query += (
+        f" |> map(fn: (r) => ({{r with _group: {format_group_key(group_by)}}}))"
+        ' |> group(columns: ["_group"])'
+        f' |> {order_by}(column: "{metric_name}")'
+        " |> group()"
+        f' |> top(n: {top_k}, columns: ["{metric_name}"])'
+    )
+
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
+
+    return [record.values["_group"] for table in result for record in table.records]
+
+
+def order_top_groups(result: List[Dict[str, Any]], top_groups: List[str]) -> List[Dict[str, Any]]:
+    ranks = {key: rank for rank, key in enumerate(top_groups)}
+    return sorted(result, key=lambda group: ranks.get(group["group_key"], len(top_groups)))
+
+
 def calculate_metrics_from_bucket(
     client: InfluxDBClient,
     organization: str,
@@ -209,17 +292,64 @@ def calculate_metrics_from_bucket(
     interval: str,
     metric_name: str,
     agg: str,
-    group_by: Union[str, None] = None,
+    group_by: Union[List[str], None] = None,
+    top_groups: Union[List[str], None] = None,
+    resolution: Union[str, None] = None,
 ) -> List[Point]:
-    query = build_influxdb_query(bucket=bucket, parameters=parameters)
-
-    if group_by:
-        query += f' |> group(columns: ["{group_by}"])'
-    query += f' |> window(every: {interval}) |> {agg}(column: "{metric_name}")'
-
-    with client:
-        query_api = client.query_api()
-        result = query_api.query(query=query, org=organization)
+    if resolution:
+        # windows the rollup task has not written yet are read from the raw bucket
+        rollup_parameters, raw_parameters = split_rollup_range(parameters, resolution, interval)
+        results = []
+        if rollup_parameters:
+            query = build_rollup_query(
+                bucket=bucket,
+                resolution=resolution,
+                parameters=rollup_parameters,
+                interval=interval,
+                metric_name=metric_name,
+                agg=agg,
+                group_by=group_by,
+            )
+            tables = client.query_api().query(query=query, org=organization)
+            results.append(process_metric_result(tables, metric_name, group_by))
+        if raw_parameters:
+            results.append(
+                calculate_metrics_from_bucket(
+                    client=client,
+                    organization=organization,
+                    bucket=bucket,
+                    parameters=raw_parameters,
+                    interval=interval,
+                    metric_name=metric_name,
+                    agg=agg,
+                    group_by=group_by,
+                )
+            )
+        return combine_grouped_shards(results, ["data"])
+
+    if top_groups is not None:
+        # groups outside of the top K are folded into a single other group
+        query = build_influxdb_query(
+            bucket=bucket,
+            parameters=parameters,
+            fields=get_query_fields(parameters, [metric_name], group_by),
+        )
+        query += (
+            f" |> map(fn: (r) => ({{r with _group: {format_group_key(group_by)}}}))"
+            f" |> map(fn: (r) => ({{r with _group: if contains(value: r._group, set: {format_flux_columns(top_groups)})"
+            ' then r._group else "other"}))'
+            ' |> group(columns: ["_group"])'
+            f' |> window(every: {interval}) |> {agg}(column: "{metric_name}")'
+        )
+        group_by = ["_group"]
+    else:
+        query = build_influxdb_query(bucket=bucket, parameters=parameters)
+        # every series is merged into one group, as when the windows are merged across shards
+        query += f" |> group(columns: {format_flux_columns(group_by)})" if group_by else " |> group()"
+        query += f' |> window(every: {interval}) |> {agg}(column: "{metric_name}")'
+
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
 
     result = process_metric_result(result, metric_name, group_by)
     return result
@@ -230,15 +360,17 @@ def process_metric_count(tables: List[FluxTable], metric_name: str):
     for table in tables:
         for record in table.records:
             values = record.values
-            metric_value = values[metric_name]
             key = f'{values["_start"]} - {values["_stop"]}'
 
             if key not in result:
-                result[key] = {}
+                result[key] = {"start": values["_start"], "data": {}}
 
-            result[key][metric_value] = result[key].get(metric_value, 0) + 1
+            result[key]["data"][values[metric_name]] = values["_value"]
 
-    result = [{"range": key, "data": value} for key, value in result.items()]
+    result = [
+        {"range": key, "data": value["data"]}
+        for key, value in sorted(result.items(), key=lambda item: item[1]["start"])
+    ]
     return result
 
 
@@ -251,12 +383,387 @@ def calculate_metrics_count_from_bucket(
     metric_name: str,
 ) -> List[Point]:
     query = build_influxdb_query(bucket=bucket, parameters=parameters)
-    query += f' |> group(columns: ["{metric_name}"]) |> window(every: {interval})'
+    query += (
+        f' |> keep(columns: ["_time", "{metric_name}"])'
+        f' |> group(columns: ["{metric_name}"])'
+        f" |> window(every: {interval})"
+        f' |> duplicate(column: "{metric_name}", as: "_value")'
+        " |> count()"
+    )
 
-    print(query)
-    with client:
-        query_api = client.query_api()
-        result = query_api.query(query=query, org=organization)
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
 
     result = process_metric_count(result, metric_name)
     return result
+
+
+def parse_metric_pairs(metrics: List[str]) -> List[Tuple[str, str]]:
+    pairs = []
+    for metric in metrics:
+        metric_name, _, agg = metric.partition(":")
+        agg = agg or "mean"
+        if not metric_name or agg not in COMBINED_AGGREGATES:
+            raise raise_400_bad_request(
+                message=f"Invalid metric {metric}, expected <metric_name>:<{'|'.join(COMBINED_AGGREGATES)}>."
+            )
+        if (metric_name, agg) not in pairs:
+            pairs.append((metric_name, agg))
+    return pairs
+
+
+def build_combined_reducer(pairs: List[Tuple[str, str]]) -> str:
+    # the count of non null values also tells whether the minimum and maximum were seeded
+    identity = []
+    columns = []
+    for metric_name in dict.fromkeys(metric_name for metric_name, _ in pairs):
+        aggs = {agg for name, agg in pairs if name == metric_name}
+        value = f"float(v: r.{metric_name})"
+        count = f"accumulator.{metric_name}_count"
+
+        identity.append(f"{metric_name}_count: 0.0")
+        columns.append(f"{metric_name}_count: if exists r.{metric_name} then {count} + 1.0 else {count}")
+
+        if aggs & {"sum", "mean"}:
+            total = f"accumulator.{metric_name}_sum"
+            identity.append(f"{metric_name}_sum: 0.0")
+            columns.append(f"{metric_name}_sum: if exists r.{metric_name} then {total} + {value} else {total}")
+
+        for agg, operator in (("min", "<"), ("max", ">")):
+            if agg in aggs:
+                current = f"accumulator.{metric_name}_{agg}"
+                identity.append(f"{metric_name}_{agg}: 0.0")
+                columns.append(
+                    f"{metric_name}_{agg}: if not exists r.{metric_name} then {current}"
+                    f" else if {count} == 0.0 or {value} {operator} {current} then {value} else {current}"
+                )
+
+    return f"reduce(identity: {{{', '.join(identity)}}}, fn: (r, accumulator) => ({{{', '.join(columns)}}}))"
+
+
+def process_combined_metric_result(
+    tables: List[FluxTable],
+    pairs: List[Tuple[str, str]],
+    group_by: Union[List[str], None] = None,
+) -> List[Dict[str, Any]]:
+    result = {}
+    for table in tables:
+        for record in table.records:
+            values = record.values
+            key = get_group_key(values, group_by)
+            if key not in result:
+                result[key] = {"group_key": key, "range": [], "data": {f"{name}:{agg}": [] for name, agg in pairs}}
+
+            result[key]["range"].append(f'{values["_start"]} - {values["_stop"]}')
+            for metric_name, agg in pairs:
+                count = values[f"{metric_name}_count"]
+                if agg == "count":
+                    value = count
+                elif not count:
+                    value = None
+                elif agg == "mean":
+                    value = values[f"{metric_name}_sum"] / count
+                else:
+                    value = values[f"{metric_name}_{agg}"]
+                result[key]["data"][f"{metric_name}:{agg}"].append(value)
+
+    return list(result.values())
+
+
+def build_combined_query(
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    pairs: List[Tuple[str, str]],
+    group_by: Union[List[str], None] = None,
+) -> str:
+    fields = get_query_fields(parameters, [metric_name for metric_name, _ in pairs], group_by)
+    query = build_influxdb_query(bucket=bucket, parameters=parameters, fields=fields)
+    query += f" |> group(columns: {format_flux_columns(group_by)})" if group_by else " |> group()"
+    query += f" |> window(every: {interval}) |> {build_combined_reducer(pairs)}"
+    return query
+
+
+def calculate_combined_metrics_from_bucket(
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    pairs: List[Tuple[str, str]],
+    group_by: Union[List[str], None] = None,
+) -> List[Dict[str, Any]]:
+    query = build_combined_query(bucket, parameters, interval, pairs, group_by)
+
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
+
+    return process_combined_metric_result(result, pairs, group_by)
+
+
+def plan_time_shards(parameters: AuditRetrievalRequestSchema, step: float) -> List[AuditRetrievalRequestSchema]:
+    # shards start at multiples of `step` since the epoch, where Flux windows also start
+    now = datetime.now(timezone.utc)
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+    if (stop - start).total_seconds() <= parse_flux_duration(settings.QUERY_SHARD_SPAN):
+        return [parameters]
+
+    shards = []
+    boundary = (math.floor(start.timestamp() / step) + 1) * step
+    while start < stop:
+        end = min(datetime.fromtimestamp(boundary, timezone.utc), stop)
+        shards.append(parameters.copy(update={"start": format_flux_time(start), "stop": format_flux_time(end)}))
+        start = end
+        boundary += step
+    return shards
+
+
+def get_window_seconds(interval: str) -> Union[float, None]:
+    # calendar windows do not have a fixed length to align shards to
+    if "mo" in interval or "y" in interval:
+        return None
+    try:
+        return parse_flux_duration(interval)
+    except ValueError:
+        return None
+
+
+def get_aligned_shard_step(window: float) -> float:
+    return math.ceil(parse_flux_duration(settings.QUERY_SHARD_SPAN) / window) * window
+
+
+async def run_shards(
+    request: Request,
+    func: Callable,
+    shards: List[AuditRetrievalRequestSchema],
+    **kwargs,
+) -> List[Any]:
+    semaphore = asyncio.Semaphore(settings.QUERY_SHARD_PARALLELISM)
+
+    async def run_shard(shard: AuditRetrievalRequestSchema) -> Any:
+        async with semaphore:
+            return await run_query(request, func, parameters=shard, **kwargs)
+
+    return await asyncio.gather(*[run_shard(shard) for shard in shards])
+
+
+def combine_grouped_shards(results: List[List[Dict[str, Any]]], columns: List[str]) -> List[Dict[str, Any]]:
+    combined = {}
+    for result in results:
+        for group in result:
+            if group["group_key"] not in combined:
+                combined[group["group_key"]] = group
+                continue
+            for column in columns:
+                if isinstance(group[column], dict):
+                    for key, values in group[column].items():
+                        combined[group["group_key"]][column][key].extend(values)
+                else:
+                    combined[group["group_key"]][column].extend(group[column])
+    return list(combined.values())
+
+
+def calculate_metric_partials_from_bucket(
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    metric_name: str,
+    group_by: Union[List[str], None] = None,
+) -> List[Dict[str, Any]]:
+    pairs = [(metric_name, agg) for agg in ("sum", "min", "max")]
+    query = build_combined_query(bucket, parameters, interval, pairs, group_by)
+
+    query_api = client.query_api()
+    result = query_api.query(query=query, org=organization)
+
+    return [
+        {
+            "group_key": get_group_key(record.values, group_by),
+            "start": record.values["_start"],
+            "count": record.values[f"{metric_name}_count"],
+            "sum": record.values[f"{metric_name}_sum"],
+            "min": record.values[f"{metric_name}_min"],
+            "max": record.values[f"{metric_name}_max"],
+        }
+        for table in result
+        for record in table.records
+    ]
+
+
+def combine_metric_partials(
+    results: List[List[Dict[str, Any]]],
+    parameters: AuditRetrievalRequestSchema,
+    window: float,
+    agg: str,
+) -> List[Dict[str, Any]]:
+    windows = {}
+    for result in results:
+        for partial in result:
+            if not partial["count"]:
+                continue
+
+            window_start = math.floor(partial["start"].timestamp() / window) * window
+            key = (partial["group_key"], window_start)
+            if key not in windows:
+                windows[key] = dict(partial)
+                continue
+
+            merged = windows[key]
+            merged["min"] = min(merged["min"], partial["min"])
+            merged["max"] = max(merged["max"], partial["max"])
+            merged["sum"] += partial["sum"]
+            merged["count"] += partial["count"]
+
+    now = datetime.now(timezone.utc)
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+
+    groups = {}
+    for (group_key, window_start), merged in sorted(windows.items(), key=lambda item: item[0][1]):
+        window_range = (
+            f"{max(start, datetime.fromtimestamp(window_start, timezone.utc))}"
+            f" - {min(stop, datetime.fromtimestamp(window_start + window, timezone.utc))}"
+        )
+        if agg == "mean":
+            value = merged["sum"] / merged["count"]
+        elif agg == "count":
+            value = int(merged["count"])
+        else:
+            value = merged[agg]
+        groups.setdefault(group_key, []).append({"range": window_range, "value": value})
+
+    return [{"group_key": key, "data": value} for key, value in groups.items()]
+
+
+async def calculate_metrics_from_shards(
+    request: Request,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    metric_name: str,
+    agg: str,
+    group_by: Union[List[str], None] = None,
+    top_k: Union[int, None] = None,
+    order_by: str = "sum",
+    resolution: Union[str, None] = None,
+) -> List[Dict[str, Any]]:
+    # windows longer than a shard are split, and their partial aggregates merged across shards
+    kwargs = dict(
+        client=client,
+        organization=organization,
+        bucket=bucket,
+        interval=interval,
+        metric_name=metric_name,
+        group_by=group_by,
+    )
+    top_groups = None
+    if top_k:
+        top_groups = await run_query(
+            request,
+            read_top_groups,
+            client=client,
+            organization=organization,
+            bucket=bucket,
+            parameters=parameters,
+            metric_name=metric_name,
+            group_by=group_by,
+            top_k=top_k,
+            order_by=order_by,
+        )
+        if not top_groups:
+            return []
+
+    # the rollup is picked once per request by plan_metric_query
+    window = get_window_seconds(interval)
+    if window is None or resolution:
+        result = await run_query(
+            request,
+            calculate_metrics_from_bucket,
+            parameters=parameters,
+            agg=agg,
+            top_groups=top_groups,
+            resolution=resolution,
+            **kwargs,
+        )
+        return order_top_groups(result, top_groups) if top_groups else result
+
+    span = parse_flux_duration(settings.QUERY_SHARD_SPAN)
+    if window > span and agg in COMBINED_AGGREGATES and top_groups is None:
+        shards = plan_time_shards(parameters, span)
+        if len(shards) > 1:
+            results = await run_shards(request, calculate_metric_partials_from_bucket, shards, **kwargs)
+            return combine_metric_partials(results, parameters, window, agg)
+
+    shards = plan_time_shards(parameters, get_aligned_shard_step(window))
+    results = await run_shards(request, calculate_metrics_from_bucket, shards, agg=agg, top_groups=top_groups, **kwargs)
+    result = combine_grouped_shards(results, ["data"])
+    return order_top_groups(result, top_groups) if top_groups else result
+
+
+async def calculate_metrics_count_from_shards(
+    request: Request,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    metric_name: str,
+) -> List[Dict[str, Any]]:
+    kwargs = dict(client=client, organization=organization, bucket=bucket, interval=interval, metric_name=metric_name)
+    window = get_window_seconds(interval)
+    if window is None:
+        return await run_query(request, calculate_metrics_count_from_bucket, parameters=parameters, **kwargs)
+
+    shards = plan_time_shards(parameters, get_aligned_shard_step(window))
+    results = await run_shards(request, calculate_metrics_count_from_bucket, shards, **kwargs)
+    return [window_count for result in results for window_count in result]
+
+
+async def calculate_combined_metrics_from_shards(
+    request: Request,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    pairs: List[Tuple[str, str]],
+    group_by: Union[List[str], None] = None,
+) -> List[Dict[str, Any]]:
+    kwargs = dict(client=client, organization=organization, bucket=bucket, interval=interval, pairs=pairs)
+    window = get_window_seconds(interval)
+    if window is None:
+        return await run_query(
+            request, calculate_combined_metrics_from_bucket, parameters=parameters, group_by=group_by, **kwargs
+        )
+
+    shards = plan_time_shards(parameters, get_aligned_shard_step(window))
+    results = await run_shards(request, calculate_combined_metrics_from_bucket, shards, group_by=group_by, **kwargs)
+    return combine_grouped_shards(results, ["range", "data"])
+
+
+async def read_points_from_shards(
+    request: Request,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    limit: int = 50,
+    cursor_filter: Union[str, None] = None,
+) -> List[Dict[str, Any]]:
+    shards = plan_time_shards(parameters, parse_flux_duration(settings.QUERY_SHARD_SPAN))[::-1]
+    kwargs = dict(client=client, organization=organization, bucket=bucket, offset=0, cursor_filter=cursor_filter)
+
+    events = []
+    for index in range(0, len(shards), settings.QUERY_SHARD_PARALLELISM):
+        wave = shards[index : index + settings.QUERY_SHARD_PARALLELISM]
+        results = await run_shards(request, read_points_from_bucket, wave, limit=limit - len(events), **kwargs)
+        for result in results:
+            events.extend(result)
+        if len(events) >= limit:
+            break
+    return events[:limit]
@@ -0,0 +1,214 @@
+import json
+import math
+from datetime import datetime, timezone
+from typing import List, Tuple, Union
+
+from influxdb_client import BucketsApi, InfluxDBClient, TasksApi
+from influxdb_client.domain.task_create_request import TaskCreateRequest
+from redis import Redis
+
+from server.config.factory import settings
+from server.database.managers import get_redis_client
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import (
+    format_flux_columns,
+    format_flux_filter,
+    format_flux_time,
+    parse_flux_duration,
+    resolve_flux_time,
+)
+
+ROLLUP_FIELDS = ["event_duration", "affected_resources", "latency", "cpu_usage", "memory_usage"]
+ROLLUP_AGGREGATES = ["count", "sum", "min", "max", "mean"]
+ROLLUP_TAGS = ["application", "environment"]
+
+# ordered from the coarsest to the finest resolution
+ROLLUP_RESOLUTIONS = ["1d", "1h", "1m"]
+
+# seconds the rollup tasks wait past the end of a window before writing it
+ROLLUP_TASK_OFFSET = 10
+
+
+def get_rollup_bucket(bucket: str, resolution: str) -> str:
+    return f"{bucket}_rollup_{resolution}"
+
+
+def build_rollup_task(bucket: str, resolution: str) -> str:
+    fields = ", ".join(f'"{field}"' for field in ROLLUP_FIELDS)
+    streams = ", ".join(
+        f'data |> aggregateWindow(every: {resolution}, fn: {agg}, timeSrc: "_start", createEmpty: false)'
+        f' |> map(fn: (r) => ({{r with _field: r._field + "_{agg}", _value: float(v: r._value)}}))'
+        for agg in ROLLUP_AGGREGATES
+    )
+
+    return (
+        f'option task = {{name: "{get_rollup_bucket(bucket, resolution)}", every: {resolution},'
+        f" offset: {ROLLUP_TASK_OFFSET}s}}\n\n"
+        f'data = from(bucket: "{bucket}")'
+        " |> range(start: -task.every)"
+        f" |> filter(fn: (r) => contains(value: r._field, set: [{fields}]))\n\n"
+        f"union(tables: [{streams}])"
+        f' |> to(bucket: "{get_rollup_bucket(bucket, resolution)}", org: "{settings.INFLUXDB_ORG}")'
+    )
+
+
+def create_rollup_tasks(client: InfluxDBClient, bucket: str) -> List[str]:
+    bucket_api = BucketsApi(client)
+    tasks_api = TasksApi(client)
+    rollup_buckets = []
+
+    for resolution in ROLLUP_RESOLUTIONS:
+        rollup_bucket = get_rollup_bucket(bucket, resolution)
+        bucket_api.create_bucket(bucket_name=rollup_bucket, org=settings.INFLUXDB_ORG)
+        tasks_api.create_task(
+            task_create_request=TaskCreateRequest(
+                flux=build_rollup_task(bucket, resolution),
+                org=settings.INFLUXDB_ORG,
+                status="active",
+                description=f"Downsample numeric fields of {bucket} into {resolution} windows",
+            ),
+        )
+        rollup_buckets.append(rollup_bucket)
+
+    return rollup_buckets
+
+
+def read_rollup_resolutions(client: InfluxDBClient, bucket: str) -> List[str]:
+    key = f"rollups:{bucket}"
+    redis_client: Redis = get_redis_client()
+    cached = redis_client.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    bucket_api = BucketsApi(client)
+    resolutions = [
+        resolution
+        for resolution in ROLLUP_RESOLUTIONS
+        if bucket_api.find_bucket_by_name(get_rollup_bucket(bucket, resolution))
+    ]
+    redis_client.set(key, json.dumps(resolutions), ex=settings.QUERY_STATS_TTL)
+    return resolutions
+
+
+def select_rollup(
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    metric_name: str,
+    agg: str,
+    group_by: Union[List[str], None] = None,
+    resolutions: List[str] = ROLLUP_RESOLUTIONS,
+) -> Union[str, None]:
+    # rollups only keep the tag columns, and calendar windows cannot be split at a fixed boundary
+    if metric_name not in ROLLUP_FIELDS or agg not in ROLLUP_AGGREGATES:
+        return None
+    if parameters.method or parameters.status or parameters.origin:
+        return None
+    if parameters.resource_id or parameters.resource_type:
+        return None
+    if any(column not in ROLLUP_TAGS for column in group_by or []):
+        return None
+
+    if "mo" in interval or "y" in interval:
+        return None
+
+    try:
+        interval_seconds = parse_flux_duration(interval)
+    except ValueError:
+        return None
+
+    for resolution in ROLLUP_RESOLUTIONS:
+        if resolution in resolutions and interval_seconds % parse_flux_duration(resolution) == 0:
+            return resolution
+    return None
+
+
+def find_rollup(
+    client: InfluxDBClient,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    metric_name: str,
+    agg: str,
+    group_by: Union[List[str], None] = None,
+) -> Union[str, None]:
+    if select_rollup(parameters, interval, metric_name, agg, group_by) is None:
+        return None
+    resolutions = read_rollup_resolutions(client, bucket)
+    return select_rollup(parameters, interval, metric_name, agg, group_by, resolutions)
+
+
+def split_rollup_range(
+    parameters: AuditRetrievalRequestSchema,
+    resolution: str,
+    interval: str,
+    now: Union[datetime, None] = None,
+) -> Tuple[Union[AuditRetrievalRequestSchema, None], Union[AuditRetrievalRequestSchema, None]]:
+    # the rollup task only writes a window once it closed, later windows are read from raw events
+    now = now or datetime.now(timezone.utc)
+    step = parse_flux_duration(resolution)
+    window = parse_flux_duration(interval)
+    written = math.floor((now.timestamp() - ROLLUP_TASK_OFFSET) / step) * step
+    boundary = datetime.fromtimestamp(math.floor(written / window) * window, timezone.utc)
+
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+    rollup_parameters = raw_parameters = None
+    if start < boundary:
+        rollup_parameters = parameters.copy(
+            update={"start": format_flux_time(start), "stop": format_flux_time(min(stop, boundary))}
+        )
+    if stop > boundary:
+        raw_parameters = parameters.copy(
+            update={"start": format_flux_time(max(start, boundary)), "stop": format_flux_time(stop)}
+        )
+    return rollup_parameters, raw_parameters
+
+
+def build_rollup_query(
+    bucket: str,
+    resolution: str,
+    parameters: AuditRetrievalRequestSchema,
+    interval: str,
+    metric_name: str,
+    agg: str,
+    group_by: Union[List[str], None] = None,
+) -> str:
+    query = (
+        f'from(bucket: "{get_rollup_bucket(bucket, resolution)}")'
+        f" |> range(start: {parameters.start}, stop: {parameters.stop})"
+    )
+
+    query += format_flux_filter("_measurement", parameters.category)
+    query += format_flux_filter("application", parameters.app)
+    if parameters.env:
+        query += f' |> filter(fn: (r) => r["environment"] == "{parameters.env}")'
+
+    if agg == "mean":
+        query += (
+            f' |> filter(fn: (r) => r["_field"] == "{metric_name}_sum" or r["_field"] == "{metric_name}_count")'
+            ' |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'
+        )
+    else:
+        query += (
+            f' |> filter(fn: (r) => r["_field"] == "{metric_name}_{agg}")'
+            ' |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'
+        )
+
+    query += f" |> group(columns: {format_flux_columns(group_by)})" if group_by else " |> group()"
+    query += f" |> window(every: {interval})"
+
+    if agg == "mean":
+        query += (
+            " |> reduce(identity: {sum: 0.0, count: 0.0}, fn: (r, accumulator) => ({"
+            f"sum: accumulator.sum + r.{metric_name}_sum, count: accumulator.count + r.{metric_name}_count"
+            "}))"
+            f" |> map(fn: (r) => ({{r with {metric_name}: if r.count > 0.0 then r.sum / r.count else 0.0}}))"
+        )
+    else:
+        # counts and sums add up across windows, minimums and maximums nest
+        reducer = "sum" if agg in ("count", "sum") else agg
+        query += (
+            f' |> {reducer}(column: "{metric_name}_{agg}") |> rename(columns: {{{metric_name}_{agg}: "{metric_name}"}})'
+        )
+
+    return query
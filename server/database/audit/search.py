@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from fastapi import Request
+from influxdb_client import InfluxDBClient
+from sqlalchemy import delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from server.config.factory import settings
+from server.database.audit.executor import run_query
+from server.database.audit.points import proccess_points
+from server.models.search import EventSearchIndex
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import format_flux_filter, format_flux_time, resolve_flux_time
+
+# (time, measurement, application, event_id)
+SearchPosting = Tuple[datetime, str, str, str]
+
+
+async def read_search_postings(
+    session: AsyncSession,
+    bucket: str,
+    query: str,
+    parameters: AuditRetrievalRequestSchema,
+    limit: int = 50,
+) -> List[SearchPosting]:
+    now = datetime.now(timezone.utc)
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+
+    stmt = (
+        select(
+            EventSearchIndex.event_time,
+            EventSearchIndex.measurement,
+            EventSearchIndex.application,
+            EventSearchIndex.event_id,
+        )
+        .where(EventSearchIndex.bucket == bucket)
+        .where(EventSearchIndex.day >= start.date(), EventSearchIndex.day <= stop.date())
+        .where(EventSearchIndex.event_time >= start, EventSearchIndex.event_time < stop)
+        .where(EventSearchIndex.document.op("@@")(func.websearch_to_tsquery("simple", query)))
+        .order_by(EventSearchIndex.event_time.desc())
+        .limit(limit)
+    )
+    if parameters.category:
+        stmt = stmt.where(EventSearchIndex.measurement.in_(parameters.category))
+    if parameters.app:
+        stmt = stmt.where(EventSearchIndex.application.in_(parameters.app))
+
+    result = await session.execute(stmt)
+    return [tuple(row) for row in result.all()]
+
+
+async def prune_search_index(session: AsyncSession, buckets: List[Tuple[str, int]]) -> int:
+    now = datetime.now(timezone.utc)
+    deleted = 0
+    for bucket, retention in buckets:
+        expired = now - timedelta(seconds=retention)
+        result = await session.execute(
+            delete(EventSearchIndex)
+            .where(EventSearchIndex.bucket == bucket)
+            .where(EventSearchIndex.day <= expired.date())
+            .where(EventSearchIndex.event_time < expired)
+        )
+        deleted += result.rowcount
+    await session.commit()
+    return deleted
+
+
+def build_search_batches(postings: List[SearchPosting]) -> List[List[SearchPosting]]:
+    batches = []
+    for posting in sorted(postings, reverse=True):
+        if not batches or len(batches[-1]) >= settings.SEARCH_BATCH_SIZE:
+            batches.append([posting])
+        elif (batches[-1][0][0] - posting[0]).total_seconds() > settings.SEARCH_BATCH_SPAN:
+            batches.append([posting])
+        else:
+            batches[-1].append(posting)
+    return batches
+
+
+def build_search_query(bucket: str, batch: List[SearchPosting]) -> str:
+    start = batch[-1][0]
+    stop = batch[0][0] + timedelta(microseconds=1)
+    event_ids = ", ".join(f'"{event_id}"' for event_id in sorted({posting[3] for posting in batch}))
+
+    query = f'from(bucket: "{bucket}") |> range(start: {format_flux_time(start)}, stop: {format_flux_time(stop)})'
+    query += format_flux_filter("_measurement", sorted({posting[1] for posting in batch}))
+    query += format_flux_filter("application", sorted({posting[2] for posting in batch}))
+    query += (
+        ' |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'
+        f" |> filter(fn: (r) => contains(value: r.event_id, set: [{event_ids}]))"
+    )
+    return query
+
+
+def read_search_batch(
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    batch: List[SearchPosting],
+) -> List[Dict[str, Any]]:
+    query_api = client.query_api()
+    result = query_api.query(query=build_search_query(bucket, batch), org=organization)
+
+    # the range also holds other events of the same measurements
+    postings = {(posting[0], posting[1], posting[3]) for posting in batch}
+    return [
+        item
+        for item in proccess_points(result)
+        if (item["timestamp"], item["category"], item["event"]["id"]) in postings
+    ]
+
+
+async def search_events(
+    request: Request,
+    session: AsyncSession,
+    client: InfluxDBClient,
+    organization: str,
+    bucket: str,
+    query: str,
+    parameters: AuditRetrievalRequestSchema,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    postings = await read_search_postings(session, bucket, query, parameters, limit)
+    semaphore = asyncio.Semaphore(settings.INFLUXDB_QUERY_FANOUT)
+
+    async def read_batch(batch: List[SearchPosting]) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await run_query(
+                request,
+                read_search_batch,
+                client=client,
+                organization=organization,
+                bucket=bucket,
+                batch=batch,
+            )
+
+    batches = await asyncio.gather(*[read_batch(batch) for batch in build_search_batches(postings)])
+    events = [item for batch in batches for item in batch]
+    return sorted(events, key=lambda item: item["timestamp"], reverse=True)
@@ -0,0 +1,66 @@
+import asyncio
+import sys
+from time import perf_counter
+from typing import Callable, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from server.config.factory import settings
+from server.database.managers import close_async_engine, get_async_session_factory
+
+
+async def time_sessions(open_session: Callable[[], AsyncSession], requests: int) -> List[float]:
+    durations = []
+    for _ in range(requests):
+        start_time = perf_counter()
+        session = open_session()
+        try:
+            await session.execute(text("SELECT 1"))
+        finally:
+            await session.close()
+        durations.append((perf_counter() - start_time) * 1000)
+    return durations
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    ordered = sorted(durations)
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+    }
+
+
+async def benchmark_sessions(requests: int = 200) -> Dict[str, Dict[str, float]]:
+    engines: List[AsyncEngine] = []
+
+    def open_session_on_new_engine() -> AsyncSession:
+        engine = create_async_engine(settings.RDS_URI_ASYNC)
+        engines.append(engine)
+        return sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)()
+
+    try:
+        per_request = summarize(await time_sessions(open_session_on_new_engine, requests))
+    finally:
+        await asyncio.gather(*[engine.dispose() for engine in engines])
+
+    try:
+        # the first session opens the pool, as the first request after startup does
+        await time_sessions(get_async_session_factory(), 1)
+        shared = summarize(await time_sessions(get_async_session_factory(), requests))
+    finally:
+        await close_async_engine()
+
+    return {
+        "per_request_engine": per_request,
+        "shared_engine": shared,
+        "saved": {key: round(per_request[key] - shared[key], 3) for key in shared},
+    }
+
+
+if __name__ == "__main__":
+    results = asyncio.run(benchmark_sessions(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
+    for name, summary in results.items():
+        print(f"{name:<20} " + "  ".join(f"{key}={value}" for key, value in summary.items()))
@@ -0,0 +1,71 @@
+import json
+from typing import Any, Dict
+
+from fastapi import HTTPException
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.config.factory import settings
+from server.database.audit.auth import check_user_access_key
+from server.database.cache.invalidation import publish_invalidation, register_invalidation_handler
+from server.database.managers import get_async_redis_client
+from server.utils.caches import TTLCache
+from server.utils.messages import raise_404_not_found, raise_503_service_unavailable
+
+ACCESS_REVOCATION_CHANNEL = "revoke:access"
+# cached in place of the account for keys that do not exist
+INVALID_ACCESS_KEY = b""
+
+access_cache = TTLCache(maxsize=settings.ACCESS_CACHE_SIZE, ttl=settings.ACCESS_CACHE_TTL)
+
+
+def get_access_key(api_key: str) -> str:
+    return f"access:{api_key}"
+
+
+def load_access_entry(api_key: str, entry: bytes) -> Dict[str, Any]:
+    if entry == INVALID_ACCESS_KEY:
+        raise raise_404_not_found(message=f"User with access key {api_key} does not exist.")
+    return json.loads(entry)
+
+
+async def read_user_access(session: AsyncSession, api_key: str) -> Dict[str, Any]:
+    # unknown keys are cached for `ACCESS_NEGATIVE_TTL` seconds so bogus keys do not reach Postgres
+    entry = access_cache.get(api_key)
+    if entry is not None:
+        return load_access_entry(api_key, entry)
+
+    client: Redis = get_async_redis_client()
+    key = get_access_key(api_key)
+    try:
+        entry = await client.get(key)
+        if entry is None:
+            try:
+                user = await check_user_access_key(session, api_key)
+                entry = user.json().encode("utf-8")
+                await client.set(key, entry, ex=settings.ACCESS_KEY_TTL)
+            except HTTPException:
+                entry = INVALID_ACCESS_KEY
+                await client.set(key, entry, ex=settings.ACCESS_NEGATIVE_TTL)
+                access_cache.set(api_key, entry, ttl=min(settings.ACCESS_CACHE_TTL, settings.ACCESS_NEGATIVE_TTL))
+                raise
+    except RedisError:
+        raise raise_503_service_unavailable(message="Access keys cannot be verified right now.")
+
+    access_cache.set(api_key, entry)
+    return load_access_entry(api_key, entry)
+
+
+async def revoke_access_key(api_key: str) -> None:
+    client: Redis = get_async_redis_client()
+    await client.delete(get_access_key(api_key))
+    drop_cached_access(api_key)
+    await publish_invalidation(ACCESS_REVOCATION_CHANNEL, api_key)
+
+
+def drop_cached_access(api_key: str) -> None:
+    access_cache.delete(api_key)
+
+
+register_invalidation_handler(ACCESS_REVOCATION_CHANNEL, drop_cached_access)
@@ -0,0 +1,42 @@
+import asyncio
+
+from server.config.factory import settings
+from server.database.audit.auth import get_admin_user
+from server.database.cache.invalidation import register_invalidation_handler
+from server.database.managers import get_async_session_factory, get_redis_client
+from server.models.users import UserAccount
+from server.utils.caches import TTLCache
+
+ADMIN_INVALIDATION_CHANNEL = "invalidate:admin"
+
+admin_cache = TTLCache(maxsize=1, ttl=settings.ADMIN_CACHE_TTL)
+admin_lock = asyncio.Lock()
+
+
+def cache_admin(admin: UserAccount) -> None:
+    admin_cache.set("admin", admin)
+
+
+async def read_cached_admin() -> UserAccount:
+    admin = admin_cache.get("admin")
+    if admin:
+        return admin
+
+    # concurrent misses wait for a single query
+    async with admin_lock:
+        admin = admin_cache.get("admin")
+        if admin:
+            return admin
+
+        async with get_async_session_factory()() as session:
+            admin = await get_admin_user(session=session)
+        cache_admin(admin)
+        return admin
+
+
+def publish_admin_invalidation() -> None:
+    # the admin token is only written by the synchronous onboarding at startup
+    get_redis_client().publish(ADMIN_INVALIDATION_CHANNEL, "admin")
+
+
+register_invalidation_handler(ADMIN_INVALIDATION_CHANNEL, lambda message: admin_cache.clear())
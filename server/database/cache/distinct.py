@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from itertools import product
+from typing import Any, Dict
+
+from redis.asyncio import Redis
+
+from server.database.cache.sketches import SKETCH_RESOLUTIONS, plan_sketch_windows
+from server.database.managers import get_async_redis_client
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import resolve_flux_time
+from server.utils.messages import raise_400_bad_request
+
+DISTINCT_DIMENSIONS = ["actor_origin", "resource_id", "resource_type"]
+
+# standard error of the 16384 registers of a Redis HyperLogLog
+DISTINCT_STANDARD_ERROR = 0.0081
+
+
+def get_distinct_key(
+    bucket: str,
+    measurement: str,
+    application: str,
+    dimension: str,
+    resolution: str,
+    window_start: int,
+) -> str:
+    return f"hll:{bucket}:{measurement}:{application}:{dimension}:{resolution}:{window_start}"
+
+
+async def count_distinct_from_counters(
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    dimension: str,
+) -> Dict[str, Any]:
+    if dimension not in DISTINCT_DIMENSIONS:
+        raise raise_400_bad_request(message=f"Distinct counts are only available for {', '.join(DISTINCT_DIMENSIONS)}.")
+    filters = [parameters.env, parameters.method, parameters.status, parameters.origin]
+    if any(filters) or parameters.resource_id or parameters.resource_type:
+        raise raise_400_bad_request(message="Distinct counts can only be filtered by category and app.")
+
+    now = datetime.now(timezone.utc)
+    windows = plan_sketch_windows(resolve_flux_time(parameters.start, now), resolve_flux_time(parameters.stop, now))
+    keys = [
+        get_distinct_key(bucket, measurement, application, dimension, resolution, window_start)
+        for measurement, application in product(set(parameters.category), set(parameters.app))
+        for resolution, window_start in windows
+    ]
+
+    client: Redis = get_async_redis_client()
+    # a PFCOUNT of several keys counts their union like PFMERGE, without writing a merged key to expire
+    count = await client.pfcount(*keys) if keys else 0
+    if windows:
+        start = datetime.fromtimestamp(windows[0][1], timezone.utc)
+        stop = datetime.fromtimestamp(windows[-1][1] + SKETCH_RESOLUTIONS[windows[-1][0]], timezone.utc)
+    else:
+        start = stop = now
+
+    return {
+        "dimension": dimension,
+        "range": f"{start} - {stop}",
+        "count": count,
+        "error": DISTINCT_STANDARD_ERROR,
+    }
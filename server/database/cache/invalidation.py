@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict
+
+from redis.asyncio import Redis
+
+from server.config.factory import settings
+from server.database.managers import get_async_redis_client
+
+logger = logging.getLogger(__name__)
+
+# in-process caches register a handler per channel, a single pub/sub
+# connection per process delivers their invalidations
+invalidation_handlers: Dict[str, Callable[[str], None]] = {}
+invalidation_state: Dict[str, Any] = {"pubsub": None, "listener": None}
+
+
+def register_invalidation_handler(channel: str, handler: Callable[[str], None]) -> None:
+    invalidation_handlers[channel] = handler
+
+
+async def publish_invalidation(channel: str, message: str) -> None:
+    client: Redis = get_async_redis_client()
+    await client.publish(channel, message)
+
+
+def dispatch_invalidation(channel: str, message: str) -> None:
+    handler = invalidation_handlers.get(channel)
+    if handler:
+        handler(message)
+
+
+async def listen_for_invalidations() -> None:
+    pubsub = invalidation_state["pubsub"]
+    await pubsub.subscribe(*invalidation_handlers)
+    while True:
+        try:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message:
+                dispatch_invalidation(message["channel"].decode("utf-8"), message["data"].decode("utf-8"))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to read cache invalidations")
+            await asyncio.sleep(1)
+
+
+def start_invalidation_listener() -> None:
+    client = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    invalidation_state["pubsub"] = client.pubsub()
+    invalidation_state["listener"] = asyncio.get_running_loop().create_task(listen_for_invalidations())
+
+
+async def stop_invalidation_listener() -> None:
+    if invalidation_state["listener"]:
+        invalidation_state["listener"].cancel()
+        await asyncio.gather(invalidation_state["listener"], return_exceptions=True)
+    if invalidation_state["pubsub"]:
+        await invalidation_state["pubsub"].close()
+    invalidation_state.update({"pubsub": None, "listener": None})
@@ -0,0 +1,74 @@
+import logging
+from contextlib import asynccontextmanager
+from time import time
+from typing import AsyncIterator
+from uuid import uuid4
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from server.config.factory import settings
+from server.database.managers import get_async_redis_client
+from server.utils.messages import raise_429_too_many_requests, raise_503_service_unavailable
+
+logger = logging.getLogger(__name__)
+
+HASHING_SLOTS = "limits:hashing"
+
+
+def get_rate_limit_key(scope: str, identifier: str) -> str:
+    return f"limits:{scope}:{identifier.lower()}"
+
+
+async def check_rate_limit(scope: str, identifier: str, limit: int) -> None:
+    # requests are let through when Redis cannot be reached
+    now = time()
+    window = settings.AUTH_RATE_LIMIT_WINDOW
+    key = get_rate_limit_key(scope, identifier)
+
+    try:
+        client: Redis = get_async_redis_client()
+        async with client.pipeline(transaction=True) as pipeline:
+            pipeline.zremrangebyscore(key, 0, now - window)
+            pipeline.zadd(key, {uuid4().hex: now})
+            pipeline.zcard(key)
+            pipeline.expire(key, window)
+            _, _, count, _ = await pipeline.execute()
+    except RedisError:
+        logger.warning("Rate limit of %s not checked, Redis is unavailable", key)
+        return
+
+    if count > limit:
+        raise raise_429_too_many_requests(
+            message="Too many attempts, try again later.",
+            headers={"Retry-After": str(window)},
+        )
+
+
+@asynccontextmanager
+async def hold_hashing_slot() -> AsyncIterator[None]:
+    slot = uuid4().hex
+    client: Redis = get_async_redis_client()
+    try:
+        now = time()
+        async with client.pipeline(transaction=True) as pipeline:
+            pipeline.zremrangebyscore(HASHING_SLOTS, 0, now - settings.PASSWORD_HASH_SLOT_TIMEOUT)
+            pipeline.zadd(HASHING_SLOTS, {slot: now})
+            pipeline.zrank(HASHING_SLOTS, slot)
+            _, _, rank = await pipeline.execute()
+    except RedisError:
+        logger.warning("Hashing slot not acquired, Redis is unavailable")
+        yield
+        return
+
+    if rank >= settings.PASSWORD_HASH_CONCURRENCY:
+        await client.zrem(HASHING_SLOTS, slot)
+        raise raise_503_service_unavailable(message="Too many password checks in progress, try again shortly.")
+
+    try:
+        yield
+    finally:
+        try:
+            await client.zrem(HASHING_SLOTS, slot)
+        except RedisError:
+            logger.warning("Hashing slot not released, it expires on its own")
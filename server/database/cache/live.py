@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Set
+
+from fastapi import Request
+from redis.asyncio import Redis
+
+from server.config.factory import settings
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSubscriber:
+    # events past `LIVE_QUEUE_SIZE` are dropped, and their number reported before the next delivered one
+    def __init__(self, parameters: AuditRetrievalRequestSchema) -> None:
+        self.parameters = parameters
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+# a single pub/sub connection per process fans events out to every subscriber
+live_subscribers: Dict[str, Set[LiveSubscriber]] = {}
+live_state: Dict[str, Any] = {"pubsub": None, "reader": None}
+live_lock = asyncio.Lock()
+
+
+def get_live_channel(bucket: str) -> str:
+    return f"events:{bucket}"
+
+
+def matches_live_filters(parameters: AuditRetrievalRequestSchema, event: Dict[str, Any]) -> bool:
+    if parameters.category and event["category"] not in parameters.category:
+        return False
+    if parameters.app and event["tags"]["application"] not in parameters.app:
+        return False
+
+    values = {
+        "env": event["tags"]["environment"],
+        "method": event["method"],
+        "status": event["status"],
+        "origin": event["actor"]["origin"],
+        "resource_id": event["resource"]["id"],
+        "resource_type": event["resource"]["type"],
+    }
+    return all(getattr(parameters, name) in (None, value) for name, value in values.items())
+
+
+def dispatch_live_events(bucket: str, events: List[Dict[str, Any]]) -> None:
+    for subscriber in list(live_subscribers.get(bucket, ())):
+        for event in events:
+            if matches_live_filters(subscriber.parameters, event):
+                subscriber.offer(event)
+
+
+async def read_live_events() -> None:
+    pubsub = live_state["pubsub"]
+    while True:
+        try:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if not message:
+                continue
+
+            bucket = message["channel"].decode("utf-8").split(":", 1)[1]
+            dispatch_live_events(bucket, json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to read live events")
+            await asyncio.sleep(1)
+
+
+async def subscribe_to_bucket(bucket: str, parameters: AuditRetrievalRequestSchema) -> LiveSubscriber:
+    subscriber = LiveSubscriber(parameters)
+    async with live_lock:
+        if live_state["pubsub"] is None:
+            client = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+            live_state["pubsub"] = client.pubsub()
+
+        if bucket not in live_subscribers:
+            await live_state["pubsub"].subscribe(get_live_channel(bucket))
+            live_subscribers[bucket] = set()
+        live_subscribers[bucket].add(subscriber)
+
+        if live_state["reader"] is None or live_state["reader"].done():
+            live_state["reader"] = asyncio.create_task(read_live_events())
+    return subscriber
+
+
+async def unsubscribe_from_bucket(bucket: str, subscriber: LiveSubscriber) -> None:
+    async with live_lock:
+        subscribers = live_subscribers.get(bucket, set())
+        subscribers.discard(subscriber)
+        if not subscribers and bucket in live_subscribers:
+            del live_subscribers[bucket]
+            await live_state["pubsub"].unsubscribe(get_live_channel(bucket))
+
+
+async def close_live_events() -> None:
+    if live_state["reader"]:
+        live_state["reader"].cancel()
+    if live_state["pubsub"]:
+        await live_state["pubsub"].close()
+    live_state.update({"pubsub": None, "reader": None})
+    live_subscribers.clear()
+
+
+async def stream_live_events(
+    request: Request,
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+) -> AsyncIterator[str]:
+    subscriber = await subscribe_to_bucket(bucket, parameters)
+    try:
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.LIVE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            if subscriber.dropped:
+                yield f"event: dropped\ndata: {subscriber.dropped}\n\n"
+                subscriber.dropped = 0
+            yield f"event: audit\ndata: {json.dumps(event)}\n\n"
+    finally:
+        await unsubscribe_from_bucket(bucket, subscriber)
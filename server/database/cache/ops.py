@@ -2,18 +2,18 @@ import json
 from time import time
 from typing import Any, Dict, List, Tuple, Union
 
-from redis import Redis
+from redis.asyncio import Redis
 
-from server.database.managers import get_redis_client
+from server.database.managers import get_async_redis_client
 from server.events.cache import redis_cache_event
 from server.schemas.inc.audit import AuditRequestSchema
 from server.utils.messages import raise_410_gone
 
 
-def cache_data(*, key: str, data: Any, ttl: Union[int, None] = None) -> AuditRequestSchema:
+async def cache_data(*, key: str, data: Any, ttl: Union[int, None] = None) -> AuditRequestSchema:
     start_time = time()
-    client: Redis = get_redis_client()
-    client.set(key, data, ex=ttl)
+    client: Redis = get_async_redis_client()
+    await client.set(key, data, ex=ttl)
 
     return redis_cache_event(
         execution_time=(time() - start_time) * 1000,
@@ -25,11 +25,11 @@ def cache_data(*, key: str, data: Any, ttl: Union[int, None] = None) -> AuditReq
     )
 
 
-def is_in_cache(*, key: str) -> Tuple[bool, AuditRequestSchema]:
+async def is_in_cache(*, key: str) -> Tuple[bool, AuditRequestSchema]:
     start_time = time()
     try:
-        client: Redis = get_redis_client()
-        is_valid = True if client.exists(key) else False
+        client: Redis = get_async_redis_client()
+        is_valid = True if await client.exists(key) else False
         if not is_valid:
             return is_valid, None
 
@@ -45,7 +45,7 @@ def is_in_cache(*, key: str) -> Tuple[bool, AuditRequestSchema]:
         raise raise_410_gone(message="Token expired or invalid.")
 
 
-def activate_from_cache(
+async def activate_from_cache(
     *,
     key: str,
 ) -> Tuple[Union[List[Dict[str, Any]], Dict[str, Any]], List[AuditRequestSchema]]:
@@ -53,11 +53,18 @@ def activate_from_cache(
     start_time = time()
 
     try:
-        client: Redis = get_redis_client()
-        data = json.loads(client.get(key).decode("utf-8"))
+        client: Redis = get_async_redis_client()
+        # a single round trip, and a key can only be used once
+        async with client.pipeline(transaction=True) as pipeline:
+            pipeline.get(key)
+            pipeline.delete(key)
+            cached, _ = await pipeline.execute()
+
+        data = json.loads(cached.decode("utf-8"))
+        execution_time = (time() - start_time) * 1000
         events.append(
             redis_cache_event(
-                execution_time=(time() - start_time) * 1000,
+                execution_time=execution_time,
                 event_method="get",
                 event_name="cache-get",
                 event_type="read",
@@ -65,11 +72,9 @@ def activate_from_cache(
                 cached_data={key: data},
             )
         )
-
-        client.delete(key)
         events.append(
             redis_cache_event(
-                execution_time=(time() - start_time) * 1000,
+                execution_time=execution_time,
                 event_method="delete",
                 event_name="cache-delete",
                 event_type="write",
@@ -82,15 +87,15 @@ def activate_from_cache(
         raise raise_410_gone(message="Token expired or invalid.")
 
 
-def read_from_cache(
+async def read_from_cache(
     *,
     key: str,
 ) -> Tuple[Union[List[Dict[str, Any]], Dict[str, Any]], AuditRequestSchema]:
     start_time = time()
 
     try:
-        client: Redis = get_redis_client()
-        data = json.loads(client.get(key).decode("utf-8"))
+        client: Redis = get_async_redis_client()
+        data = json.loads((await client.get(key)).decode("utf-8"))
 
         event = redis_cache_event(
             execution_time=(time() - start_time) * 1000,
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from typing import Dict, Set, Tuple, Union
+
+from redis import Redis
+
+from server.database.managers import get_redis_client
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import format_flux_time, resolve_flux_time
+from server.utils.messages import raise_400_bad_request
+
+POSTINGS_RESOLUTION = 3600
+
+# scored by the time from which the postings of each bucket are complete
+POSTINGS_COVERAGE = "postings:coverage"
+
+# query parameters answered from the postings, and the field they index
+INDEXED_PARAMETERS = {"resource_id": "resource_id", "resource_type": "resource_type", "origin": "actor_origin"}
+
+
+def get_postings_key(bucket: str, dimension: str, value: str) -> str:
+    return f"postings:{bucket}:{dimension}:{value}"
+
+
+def read_postings(
+    bucket: str, filters: Dict[str, str], start: int, stop: int
+) -> Tuple[Union[float, None], Set[Tuple[str, int]]]:
+    client: Redis = get_redis_client()
+    pipeline = client.pipeline(transaction=False)
+    pipeline.zscore(POSTINGS_COVERAGE, bucket)
+    for dimension, value in filters.items():
+        pipeline.zrangebyscore(get_postings_key(bucket, dimension, value), start, f"({stop}")
+
+    coverage, *results = pipeline.execute()
+    matches = None
+    for members in results:
+        postings = set()
+        for member in members:
+            measurement, hour = member.decode("utf-8").rsplit(":", 1)
+            postings.add((measurement, int(hour)))
+        matches = postings if matches is None else matches & postings
+    return coverage, matches or set()
+
+
+def narrow_indexed_parameters(bucket: str, parameters: AuditRetrievalRequestSchema) -> AuditRetrievalRequestSchema:
+    # events older than the coverage were stored before they were indexed, so only the end of such ranges is narrowed
+    filters = {
+        dimension: getattr(parameters, name)
+        for name, dimension in INDEXED_PARAMETERS.items()
+        if getattr(parameters, name)
+    }
+    if not filters:
+        return parameters
+
+    now = datetime.now(timezone.utc)
+    start = resolve_flux_time(parameters.start, now)
+    stop = resolve_flux_time(parameters.stop, now)
+    first_hour = int(start.timestamp()) // POSTINGS_RESOLUTION * POSTINGS_RESOLUTION
+
+    coverage, postings = read_postings(bucket, filters, first_hour, int(stop.timestamp()))
+    measurements = {measurement for measurement, _ in postings}
+    if parameters.category:
+        measurements &= set(parameters.category)
+    hours = [hour for measurement, hour in postings if measurement in measurements]
+
+    if coverage is None or start.timestamp() < coverage:
+        if not parameters.category:
+            raise raise_400_bad_request(message="At least one category is required before the start of the index.")
+        if coverage is None:
+            return parameters
+
+        covered_stop = datetime.fromtimestamp(
+            max([coverage] + [hour + POSTINGS_RESOLUTION for hour in hours]), timezone.utc
+        )
+        if covered_stop >= stop:
+            return parameters
+        return parameters.copy(update={"stop": format_flux_time(covered_stop)})
+
+    update = {"category": sorted(measurements)}
+    if hours:
+        update["start"] = format_flux_time(max(start, datetime.fromtimestamp(min(hours), timezone.utc)))
+        update["stop"] = format_flux_time(
+            min(stop, datetime.fromtimestamp(max(hours) + POSTINGS_RESOLUTION, timezone.utc))
+        )
+    return parameters.copy(update=update)
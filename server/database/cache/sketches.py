@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+from itertools import product
+from typing import Any, Dict, List, Tuple, Union
+
+from redis.asyncio import Redis
+
+from server.config.factory import settings
+from server.database.managers import get_async_redis_client
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import resolve_flux_time
+from server.utils.messages import raise_400_bad_request
+
+SKETCH_FIELDS = ["latency", "event_duration"]
+
+# ordered from the coarsest to the finest window
+SKETCH_RESOLUTIONS = {"1d": 86400, "1h": 3600}
+
+
+def get_sketch_gamma() -> float:
+    accuracy = settings.SKETCH_RELATIVE_ACCURACY
+    return (1 + accuracy) / (1 - accuracy)
+
+
+def get_sketch_key(
+    bucket: str,
+    measurement: str,
+    application: str,
+    field: str,
+    resolution: str,
+    window_start: int,
+) -> str:
+    return f"sketch:{bucket}:{measurement}:{application}:{field}:{resolution}:{window_start}"
+
+
+def plan_sketch_windows(start: datetime, stop: datetime) -> List[Tuple[str, int]]:
+    finest = SKETCH_RESOLUTIONS["1h"]
+    current = int(start.timestamp()) // finest * finest
+    end = -(-int(stop.timestamp()) // finest) * finest
+
+    windows = []
+    while current < end:
+        for resolution, seconds in SKETCH_RESOLUTIONS.items():
+            if current % seconds == 0 and current + seconds <= end:
+                windows.append((resolution, current))
+                current += seconds
+                break
+    return windows
+
+
+async def read_merged_sketch(keys: List[str]) -> Dict[str, int]:
+    client: Redis = get_async_redis_client()
+    async with client.pipeline(transaction=False) as pipeline:
+        for key in keys:
+            pipeline.hgetall(key)
+        sketches = await pipeline.execute()
+
+    merged: Dict[str, int] = {}
+    for sketch in sketches:
+        for index, count in sketch.items():
+            index = index.decode("utf-8")
+            merged[index] = merged.get(index, 0) + int(count)
+    return merged
+
+
+def estimate_quantiles(sketch: Dict[str, int], quantiles: List[float]) -> Dict[float, Union[float, None]]:
+    total = sum(sketch.values())
+    if not total:
+        return {quantile: None for quantile in quantiles}
+
+    gamma = get_sketch_gamma()
+    indexes = sorted(sketch, key=lambda index: float("-inf") if index == "zero" else int(index))
+
+    estimates = {}
+    for quantile in quantiles:
+        rank = quantile * (total - 1)
+        seen = 0
+        for index in indexes:
+            seen += sketch[index]
+            if seen > rank:
+                break
+        estimates[quantile] = 0.0 if index == "zero" else 2 * gamma ** int(index) / (gamma + 1)
+    return estimates
+
+
+async def calculate_percentiles_from_sketches(
+    bucket: str,
+    parameters: AuditRetrievalRequestSchema,
+    metric_name: str,
+    quantiles: List[float],
+) -> Dict[str, Any]:
+    if metric_name not in SKETCH_FIELDS:
+        raise raise_400_bad_request(message=f"Percentiles are only available for {', '.join(SKETCH_FIELDS)}.")
+    if any(quantile < 0 or quantile > 1 for quantile in quantiles):
+        raise raise_400_bad_request(message="Quantiles must be between 0 and 1.")
+    filters = [parameters.env, parameters.method, parameters.status, parameters.origin]
+    if any(filters) or parameters.resource_id or parameters.resource_type:
+        raise raise_400_bad_request(message="Percentiles can only be filtered by category and app.")
+
+    now = datetime.now(timezone.utc)
+    windows = plan_sketch_windows(resolve_flux_time(parameters.start, now), resolve_flux_time(parameters.stop, now))
+    keys = [
+        get_sketch_key(bucket, measurement, application, metric_name, resolution, window_start)
+        for measurement, application in product(set(parameters.category), set(parameters.app))
+        for resolution, window_start in windows
+    ]
+
+    sketch = await read_merged_sketch(keys)
+    estimates = estimate_quantiles(sketch, quantiles)
+    if windows:
+        start = datetime.fromtimestamp(windows[0][1], timezone.utc)
+        stop = datetime.fromtimestamp(windows[-1][1] + SKETCH_RESOLUTIONS[windows[-1][0]], timezone.utc)
+    else:
+        start = stop = now
+
+    return {
+        "metric": metric_name,
+        "range": f"{start} - {stop}",
+        "count": sum(sketch.values()),
+        "data": {str(quantile): value for quantile, value in estimates.items()},
+    }
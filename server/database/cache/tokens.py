@@ -0,0 +1,65 @@
+from hashlib import sha256
+from time import time
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from server.config.factory import settings
+from server.database.cache.invalidation import publish_invalidation, register_invalidation_handler
+from server.database.managers import get_async_redis_client
+from server.schemas.out.auth import TokenUser
+from server.security.auth.token import decode_jwt_payload, read_token_user
+from server.utils.caches import TTLCache
+from server.utils.messages import raise_503_service_unavailable
+
+TOKEN_INVALIDATION_CHANNEL = "invalidate:tokens"
+
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.JWT_MIN * 60)
+
+
+def get_token_key(token: str) -> str:
+    # the tokens themselves are not kept in memory
+    return sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_valid_after_key(user_id: int) -> str:
+    return f"tokens:valid_after:{user_id}"
+
+
+async def read_cached_token_user(token: str) -> TokenUser:
+    key = get_token_key(token)
+    user = token_cache.get(key)
+    if user:
+        return user
+
+    payload = decode_jwt_payload(token)
+    user = read_token_user(payload)
+
+    client: Redis = get_async_redis_client()
+    try:
+        valid_after = await client.get(get_valid_after_key(user.id))
+    except RedisError:
+        raise raise_503_service_unavailable(message="Tokens cannot be verified right now.")
+    if valid_after is not None and payload.get("iat", 0) < int(valid_after):
+        raise ValueError("token issued before the credentials changed")
+
+    ttl = payload.get("exp", 0) - time()
+    if ttl > 0:
+        token_cache.set(key, user, ttl=ttl)
+    return user
+
+
+async def invalidate_user_tokens(user_id: int) -> None:
+    client: Redis = get_async_redis_client()
+    # tokens carry whole seconds, so those issued within the second of the change stay valid,
+    # and the mark can expire with the last token it rejects
+    await client.set(get_valid_after_key(user_id), int(time()), ex=settings.JWT_MIN * 60)
+    drop_cached_tokens(str(user_id))
+    await publish_invalidation(TOKEN_INVALIDATION_CHANNEL, str(user_id))
+
+
+def drop_cached_tokens(user_id: str) -> None:
+    token_cache.delete_matching(lambda user: str(user.id) == user_id)
+
+
+register_invalidation_handler(TOKEN_INVALIDATION_CHANNEL, drop_cached_tokens)
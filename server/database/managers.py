@@ -1,15 +1,64 @@
+import socket
 from functools import lru_cache
+from threading import Lock
+from typing import Dict, List
 
+from influxdb_client import InfluxDBClient
 from redis import Redis
+from redis.asyncio import BlockingConnectionPool
+from redis.asyncio import Redis as AsyncRedis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
 from sqlmodel import create_engine
+from urllib3.connection import HTTPConnection
 
 from server.config.factory import settings
+from server.models.search import EventSearchIndex  # noqa: F401 registers the table in the shared metadata
 from server.models.users import BaseSQLTable as UserTables
 
+influxdb_clients: Dict[str, InfluxDBClient] = {}
+influxdb_clients_lock = Lock()
+
+
+def get_column_upgrades() -> List[str]:
+    # create_all skips existing tables, so columns added to them later are added here
+    plan = settings.DEFAULT_RETENTION_PLAN.replace("'", "''")
+    return [f"ALTER TABLE accounts ADD COLUMN IF NOT EXISTS plan VARCHAR NOT NULL DEFAULT '{plan}'"]
+
 
 def create_db_and_tables() -> None:
     engine = create_engine(settings.RDS_URI, echo=True)
     UserTables.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for statement in get_column_upgrades():
+            connection.execute(text(statement))
+
+
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    return create_async_engine(
+        settings.RDS_URI_ASYNC,
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+        # statements prepared by asyncpg are reused for the life of a pooled connection
+        connect_args={"prepared_statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE},
+    )
+
+
+@lru_cache()
+def get_async_session_factory() -> sessionmaker:
+    return sessionmaker(get_async_engine(), expire_on_commit=False, class_=AsyncSession)
+
+
+async def close_async_engine() -> None:
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    get_async_session_factory.cache_clear()
+    get_async_engine.cache_clear()
 
 
 @lru_cache()
@@ -17,6 +66,61 @@ def get_redis_client() -> Redis:
     return Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
 
 
+@lru_cache()
+def get_async_redis_client() -> AsyncRedis:
+    pool = BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        max_connections=settings.REDIS_POOL_SIZE,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
+    return AsyncRedis(connection_pool=pool)
+
+
+async def close_async_redis_client() -> None:
+    if get_async_redis_client.cache_info().currsize:
+        client = get_async_redis_client()
+        await client.close()
+        await client.connection_pool.disconnect()
+    get_async_redis_client.cache_clear()
+
+
 def ping_redis_server() -> bool:
     client: Redis = get_redis_client()
     return client.ping()
+
+
+def get_shared_influxdb_client(token: str) -> InfluxDBClient:
+    with influxdb_clients_lock:
+        client = influxdb_clients.get(token)
+        if client:
+            return client
+
+        for stale_client in influxdb_clients.values():
+            stale_client.close()
+        influxdb_clients.clear()
+
+        client = InfluxDBClient(
+            url=f"http://{settings.INFLUXDB_HOST}:{settings.INFLUXDB_PORT}",
+            token=token,
+            org=settings.INFLUXDB_ORG,
+            timeout=settings.INFLUXDB_QUERY_TIMEOUT * 1000,
+            connection_pool_maxsize=settings.INFLUXDB_POOL_SIZE,
+        )
+        if settings.INFLUXDB_KEEP_ALIVE:
+            pool_manager = client.api_client.rest_client.pool_manager
+            pool_manager.connection_pool_kw["socket_options"] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+
+        influxdb_clients[token] = client
+        return client
+
+
+def close_influxdb_clients() -> None:
+    with influxdb_clients_lock:
+        for client in influxdb_clients.values():
+            client.close()
+        influxdb_clients.clear()
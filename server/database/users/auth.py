@@ -2,19 +2,25 @@ from time import time
 from typing import Tuple
 
 from pydantic import EmailStr
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 from sqlmodel import or_, select
 
+from server.database.cache.access import revoke_access_key
+from server.database.cache.tokens import invalidate_user_tokens
 from server.events.rds import relational_db_event
 from server.models.users import UserAccount
 from server.schemas.inc.audit import AuditRequestSchema
 from server.schemas.inc.auth import PasswordChangeRequestSchema, SignupRequestSchema
-from server.security.auth.authentication import pwd_context
+from server.security.auth.authentication import hash_plain_password, run_password_job, verify_and_update_password
 from server.utils.messages import (
     raise_400_bad_request,
     raise_401_unauthorized,
     raise_403_forbidden,
     raise_404_not_found,
+    raise_409_conflict,
 )
 from server.utils.utilities import generate_random_key
 
@@ -30,34 +36,66 @@ async def read_user_by_email_or_username(
     return user
 
 
+def build_account_insert(user: UserAccount) -> Select:
+    # a taken username, email or access key inserts nothing instead of failing
+    table = UserAccount.__table__
+    stmt = (
+        insert(table)
+        .values(**user.dict(exclude={"id", "last_updated_at"}))
+        .on_conflict_do_nothing()
+        .returning(*table.columns)
+    )
+    return select(UserAccount).from_statement(stmt)
+
+
+def build_account_update(user_id: int, **values) -> Select:
+    table = UserAccount.__table__
+    stmt = update(table).where(table.c.id == user_id).values(**values).returning(*table.columns)
+    return select(UserAccount).from_statement(stmt).execution_options(populate_existing=True)
+
+
+async def update_user_account(session: AsyncSession, user_id: int, **values) -> UserAccount:
+    query = await session.execute(build_account_update(user_id, **values))
+    user = query.scalar()
+    if not user:
+        raise raise_404_not_found(message=f"User account {user_id} does not exist.")
+
+    await session.commit()
+    return user
+
+
 async def create_user_account(
     session: AsyncSession,
     payload: SignupRequestSchema,
 ) -> Tuple[UserAccount, AuditRequestSchema]:
     start_time = time()
-    user = await read_user_by_email_or_username(
-        session=session,
-        username=payload.username,
-        email=payload.email,
+    hashed_password = await run_password_job(hash_plain_password, payload.password)
+    query = await session.execute(
+        build_account_insert(
+            UserAccount(
+                username=payload.username,
+                email=payload.email,
+                hashed_password=hashed_password,
+                access_key=generate_random_key(),
+            )
+        )
     )
+    user = query.scalar()
 
-    if user:
-        if user.username == payload.username:
+    if not user:
+        # only a conflicting signup reads the account it conflicts with
+        user = await read_user_by_email_or_username(
+            session=session,
+            username=payload.username,
+            email=payload.email,
+        )
+        if user and user.username == payload.username:
             raise raise_400_bad_request(message=f"The username {payload.username} is already registered.")
-        if user.email == payload.email:
+        if user and user.email == payload.email:
             raise raise_400_bad_request(message=f"The email {payload.email} is already registered.")
+        raise raise_409_conflict(message="The account could not be created, please try again.")
 
-    hashed_password = pwd_context.hash_plain_password(payload.password)
-    user = UserAccount(
-        username=payload.username,
-        email=payload.email,
-        hashed_password=hashed_password,
-        access_key=generate_random_key(),
-    )
-
-    session.add(user)
     await session.commit()
-    await session.refresh(user)
 
     event = relational_db_event(
         execution_time=(time() - start_time) * 1000,
@@ -88,9 +126,14 @@ async def authenticate_user(
     if not user.is_active:
         raise raise_403_forbidden(message=f"The account for username {username} is not activated.")
 
-    if not pwd_context.verify_password(password, user.hashed_password):
+    is_valid, new_hash = await run_password_job(verify_and_update_password, password, user.hashed_password)
+    if not is_valid:
         raise raise_401_unauthorized(message="Incorrect password.")
 
+    if new_hash:
+        # rehashed with the current parameters
+        user = await update_user_account(session, user.id, hashed_password=new_hash)
+
     event = relational_db_event(
         execution_time=(time() - start_time) * 1000,
         affected_resource_count=1,
@@ -109,14 +152,7 @@ async def activate_user_account(
     user_id: int,
 ) -> Tuple[UserAccount, AuditRequestSchema]:
     start_time = time()
-    stmt = select(UserAccount).where(UserAccount.id == user_id)
-    query = await session.execute(stmt)
-    user = query.scalar()
-
-    user.is_active = True
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
+    user = await update_user_account(session, user_id, is_active=True)
 
     event = relational_db_event(
         execution_time=(time() - start_time) * 1000,
@@ -131,6 +167,33 @@ async def activate_user_account(
     return user, event
 
 
+async def rotate_access_key(
+    session: AsyncSession,
+    user_id: int,
+) -> Tuple[UserAccount, AuditRequestSchema]:
+    start_time = time()
+    stmt = select(UserAccount.access_key).where(UserAccount.id == user_id)
+    query = await session.execute(stmt)
+    access_key = query.scalar()
+    if not access_key:
+        raise raise_404_not_found(message=f"User account {user_id} does not exist.")
+
+    user = await update_user_account(session, user_id, access_key=generate_random_key())
+    await revoke_access_key(access_key)
+
+    event = relational_db_event(
+        execution_time=(time() - start_time) * 1000,
+        affected_resource_count=1,
+        user=user,
+        event_method="write",
+        event_name="user-access-key-rotated",
+        event_type="update",
+        event_description=f"Access key for {user.username} was rotated",
+    )
+
+    return user, event
+
+
 async def read_user_by_email(
     session: AsyncSession,
     email: EmailStr,
@@ -166,13 +229,13 @@ async def update_password(
     query = await session.execute(stmt)
     user = query.scalar()
 
-    if not pwd_context.verify_password(payload.current_password, user.hashed_password):
+    is_valid, _ = await run_password_job(verify_and_update_password, payload.current_password, user.hashed_password)
+    if not is_valid:
         raise raise_401_unauthorized(message="Incorrect password.")
 
-    user.hashed_password = pwd_context.hash_plain_password(payload.new_password)
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
+    hashed_password = await run_password_job(hash_plain_password, payload.new_password)
+    user = await update_user_account(session, user_id, hashed_password=hashed_password)
+    await invalidate_user_tokens(user.id)
 
     event = relational_db_event(
         execution_time=(time() - start_time) * 1000,
@@ -193,14 +256,9 @@ async def reset_user_password(
     new_password: str,
 ) -> Tuple[UserAccount, AuditRequestSchema]:
     start_time = time()
-    stmt = select(UserAccount).where(UserAccount.id == user_id)
-    query = await session.execute(stmt)
-    user = query.scalar()
-
-    user.hashed_password = pwd_context.hash_plain_password(new_password)
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
+    hashed_password = await run_password_job(hash_plain_password, new_password)
+    user = await update_user_account(session, user_id, hashed_password=hashed_password)
+    await invalidate_user_tokens(user.id)
 
     event = relational_db_event(
         execution_time=(time() - start_time) * 1000,
@@ -5,10 +5,25 @@ from time import time
 import requests
 from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlmodel import Session, create_engine, select
 
 from server.config.factory import settings
-from server.database.managers import create_db_and_tables, ping_redis_server
+from server.database.audit.archive import start_archival, stop_archival
+from server.database.audit.executor import get_query_executor
+from server.database.cache.access import access_cache
+from server.database.cache.admin import admin_cache, cache_admin, publish_admin_invalidation
+from server.database.cache.invalidation import start_invalidation_listener, stop_invalidation_listener
+from server.database.cache.live import close_live_events
+from server.database.cache.tokens import token_cache
+from server.database.managers import (
+    close_async_engine,
+    close_async_redis_client,
+    close_influxdb_clients,
+    create_db_and_tables,
+    get_shared_influxdb_client,
+    ping_redis_server,
+)
 from server.docs.manager import read_api_metadata, read_tags_metadata
 from server.events.http import create_http_event
 from server.events.startup import (
@@ -21,9 +36,9 @@ from server.models.users import UserAccount
 from server.routes.audit import router as audit_router
 from server.routes.auth import router as auth_router
 from server.routes.user import router as user_router
-from server.schemas.base import HealthResponseSchema
+from server.schemas.base import CacheHealthResponseSchema, HealthResponseSchema
 from server.schemas.inc.audit import AuditSchema
-from server.security.auth.authentication import pwd_context
+from server.security.auth.authentication import get_password_executor, pwd_context
 from server.security.dependencies.sessions import get_influxdb_admin
 from server.utils.enums import Tags
 from server.utils.tasks import publish_task
@@ -41,6 +56,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=settings.RESPONSE_GZIP_MINIMUM_SIZE)
 
 
 def influxdb_onboarding(base_url, user, password, organization):
@@ -132,6 +148,7 @@ def create_admin_credentials():
 
     admin_event, admin = create_admin_account(user, password, organization, api_token)
     events.append(admin_event)
+    publish_admin_invalidation()
 
     return events, admin
 
@@ -156,6 +173,10 @@ def on_startup():
     print("Redis server pinged!")
 
     admin_creation_events, admin = create_admin_credentials()
+    cache_admin(admin)
+    start_invalidation_listener()
+    influx_client = get_shared_influxdb_client(token=admin.api_token)
+    start_archival(client=influx_client, organization=settings.INFLUXDB_ORG, admin=admin)
     print("Startup complete!")
 
     startup_events.extend(admin_creation_events)
@@ -166,6 +187,18 @@ def on_startup():
     subprocess.run("rm config-event.json", shell=True)
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_archival()
+    await stop_invalidation_listener()
+    get_query_executor().shutdown(wait=False, cancel_futures=True)
+    get_password_executor().shutdown(wait=False, cancel_futures=True)
+    close_influxdb_clients()
+    await close_live_events()
+    await close_async_engine()
+    await close_async_redis_client()
+
+
 @app.get("/health", response_model=HealthResponseSchema, tags=[Tags.health_check])
 async def health(
     request: Request,
@@ -184,6 +217,24 @@ async def health(
     return settings
 
 
+@app.get("/health/caches", response_model=CacheHealthResponseSchema, tags=[Tags.health_check])
+async def cache_health(
+    request: Request,
+    admin: UserAccount = Depends(get_influxdb_admin),
+):
+    start_time = time()
+    events = [
+        create_http_event(
+            request=request,
+            status_code=200,
+            affected_resource_count=0,
+            execution_time=(time() - start_time) * 1000,
+        ),
+    ]
+    publish_task(admin=admin, bucket=admin.username, event_data=events)
+    return {"admin": admin_cache.stats(), "access": access_cache.stats(), "tokens": token_cache.stats()}
+
+
 app.include_router(auth_router)
 app.include_router(user_router)
 app.include_router(audit_router)
@@ -0,0 +1,22 @@
+from datetime import date, datetime
+
+from sqlalchemy import Column, DateTime, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlmodel import Field, SQLModel
+
+
+class EventSearchIndex(SQLModel, table=True):
+    __tablename__ = "event_search"
+    __table_args__ = (
+        Index("ix_event_search_document", "document", postgresql_using="gin"),
+        Index("ix_event_search_bucket_day", "bucket", "day"),
+    )
+
+    id: int = Field(primary_key=True)
+    bucket: str = Field(...)
+    day: date = Field(...)
+    measurement: str = Field(...)
+    application: str = Field(...)
+    event_time: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    event_id: str = Field(...)
+    document: str = Field(sa_column=Column(TSVECTOR, nullable=False))
@@ -3,6 +3,7 @@ from typing import Union
 from pydantic import EmailStr
 from sqlmodel import Field
 
+from server.config.factory import settings
 from server.models.base import BaseSQLTable
 
 
@@ -16,3 +17,4 @@ class UserAccount(BaseSQLTable, table=True):
     api_token: Union[str, None] = Field(default=None, nullable=True, index=True, unique=True)
     is_active: bool = Field(default=False)
     is_superuser: bool = Field(default=False)
+    plan: str = Field(default_factory=lambda: settings.DEFAULT_RETENTION_PLAN)
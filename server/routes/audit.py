@@ -1,24 +1,51 @@
 from typing import Any, Dict, List, Union
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, status
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Path, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from influxdb_client import InfluxDBClient
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from server.config.factory import settings
+from server.database.audit.archive import read_event_trail_from_tiers
+from server.database.audit.cost import plan_metric_query
+from server.database.audit.executor import run_query
+from server.database.audit.export import create_export_job, read_export_job, resume_export_job, run_export_job
+from server.database.audit.merge import read_points_from_streams
 from server.database.audit.points import (
-    calculate_metrics_count_from_bucket,
-    calculate_metrics_from_bucket,
-    read_event_trail,
+    COMBINED_AGGREGATES,
+    calculate_combined_metrics_from_shards,
+    calculate_metrics_count_from_shards,
+    calculate_metrics_from_shards,
+    parse_metric_pairs,
     read_list_of_available_metrics,
-    read_points_from_bucket,
 )
+from server.database.audit.search import search_events
+from server.database.cache.distinct import count_distinct_from_counters
+from server.database.cache.live import stream_live_events
+from server.database.cache.sketches import calculate_percentiles_from_sketches
 from server.models.users import UserAccount
 from server.schemas.inc.audit import AuditRequestSchema, AuditRetrievalRequestSchema
-from server.schemas.out.audit import AuditResponseSchema, MetricCountResponseSchema, MetricResponseSchema
+from server.schemas.out.audit import (
+    AuditResponseSchema,
+    CombinedMetricResponseSchema,
+    DistinctCountResponseSchema,
+    ExportJobResponseSchema,
+    MetricCountResponseSchema,
+    MetricPercentileResponseSchema,
+    MetricResponseSchema,
+)
 from server.schemas.out.auth import TokenUser
-from server.security.dependencies.audit import log_retrieval_query_parameters, verify_user_access
+from server.security.dependencies.audit import (
+    live_query_parameters,
+    log_retrieval_query_parameters,
+    search_query_parameters,
+    verify_user_access,
+)
 from server.security.dependencies.auth import is_user_active
-from server.security.dependencies.sessions import get_influxdb_admin, get_influxdb_client
+from server.security.dependencies.sessions import get_database_session, get_influxdb_admin, get_influxdb_client
 from server.utils.enums import Tags
+from server.utils.messages import raise_400_bad_request
+from server.utils.responses import trusted_json_response
 from server.utils.tasks import publish_task
 
 router = APIRouter(
@@ -54,24 +81,53 @@ async def log_audit_event(
     response_model=List[AuditResponseSchema],
 )
 async def read_logs(
+    request: Request,
+    response: Response,
     current_user: TokenUser = Depends(is_user_active),
     influx_client: InfluxDBClient = Depends(get_influxdb_client),
     parameters: AuditRetrievalRequestSchema = Depends(log_retrieval_query_parameters),
     page: int = Query(default=1, description="Page number", example=1),
+    cursor: Union[str, None] = Query(
+        default=None,
+        description="Cursor from the X-Next-Cursor header of the previous page, takes precedence over page",
+    ),
 ):
     try:
-        data = read_points_from_bucket(
+        data, next_cursor = await read_points_from_streams(
+            request=request,
             client=influx_client,
             organization=settings.INFLUXDB_ORG,
             bucket=current_user.username,
             parameters=parameters,
-            offset=(page - 1) * 50,
+            offset=0 if cursor else (page - 1) * 50,
+            cursor=cursor,
         )
-        return data
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return trusted_json_response(data, response)
     except HTTPException as e:
         raise e
 
 
+@router.get(
+    "/log/stream",
+    summary="Follow audit events",
+    description="Stream newly logged audit events as Server-Sent Events",
+    response_class=StreamingResponse,
+)
+async def stream_logs(
+    request: Request,
+    current_user: TokenUser = Depends(is_user_active),
+    parameters: AuditRetrievalRequestSchema = Depends(live_query_parameters),
+):
+    return StreamingResponse(
+        stream_live_events(request=request, bucket=current_user.username, parameters=parameters),
+        media_type="text/event-stream",
+        # identity keeps the gzip middleware from buffering the stream
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     "/log/{event_id}",
     summary="Read log audit events",
@@ -79,18 +135,53 @@ async def read_logs(
     response_model=List[AuditResponseSchema],
 )
 async def read_single_event(
+    request: Request,
+    response: Response,
     current_user: TokenUser = Depends(is_user_active),
     influx_client: InfluxDBClient = Depends(get_influxdb_client),
     event_id: str = Path(..., description="Event ID", example="1234567890"),
 ):
     try:
-        data = read_event_trail(
+        data = await read_event_trail_from_tiers(
+            request,
             client=influx_client,
             organization=settings.INFLUXDB_ORG,
             bucket=current_user.username,
             event_id=event_id,
         )
-        return data
+        return trusted_json_response(data, response)
+    except HTTPException as e:
+        raise e
+
+
+@router.get(
+    "/search",
+    summary="Search audit events",
+    description="Search the descriptions and details of audit events",
+    response_model=List[AuditResponseSchema],
+)
+async def search_logs(
+    request: Request,
+    response: Response,
+    current_user: TokenUser = Depends(is_user_active),
+    session: AsyncSession = Depends(get_database_session),
+    influx_client: InfluxDBClient = Depends(get_influxdb_client),
+    parameters: AuditRetrievalRequestSchema = Depends(search_query_parameters),
+    q: str = Query(..., min_length=1, description="Words or quoted phrases to search for", example="johndoe"),
+    limit: int = Query(default=50, ge=1, le=500, description="Maximum number of events", example=50),
+):
+    try:
+        data = await search_events(
+            request=request,
+            session=session,
+            client=influx_client,
+            organization=settings.INFLUXDB_ORG,
+            bucket=current_user.username,
+            query=q,
+            parameters=parameters,
+            limit=limit,
+        )
+        return trusted_json_response(data, response)
     except HTTPException as e:
         raise e
 
@@ -102,11 +193,14 @@ async def read_single_event(
     response_model=List[str],
 )
 async def read_metrics_list(
+    request: Request,
     current_user: TokenUser = Depends(is_user_active),
     influx_client: InfluxDBClient = Depends(get_influxdb_client),
 ):
     try:
-        metrics = read_list_of_available_metrics(
+        metrics = await run_query(
+            request,
+            read_list_of_available_metrics,
             client=influx_client,
             organization=settings.INFLUXDB_ORG,
             bucket=current_user.username,
@@ -116,6 +210,61 @@ async def read_metrics_list(
         raise e
 
 
+@router.get(
+    "/metrics/combined",
+    summary="Calculate several metrics",
+    description="Calculate several metric:agg pairs from the audit log in a single pass",
+    response_model=List[CombinedMetricResponseSchema],
+)
+async def calculate_combined_metrics(
+    request: Request,
+    response: Response,
+    admin: UserAccount = Depends(get_influxdb_admin),
+    current_user: TokenUser = Depends(is_user_active),
+    influx_client: InfluxDBClient = Depends(get_influxdb_client),
+    parameters: AuditRetrievalRequestSchema = Depends(log_retrieval_query_parameters),
+    interval: str = Query(default="1m", description="Interval to calculate the metrics"),
+    metric: List[str] = Query(
+        ...,
+        description="Metric and aggregation pairs",
+        example=["latency:mean", "cpu_usage:max"],
+    ),
+    group_by: List[str] = Query(default=[], description="Fields to group by", example=["status"]),
+):
+    try:
+        pairs = parse_metric_pairs(metric)
+        plan, event = await run_query(
+            request,
+            plan_metric_query,
+            client=influx_client,
+            organization=settings.INFLUXDB_ORG,
+            bucket=current_user.username,
+            parameters=parameters,
+            interval=interval,
+            metric_name=",".join(f"{metric_name}:{agg}" for metric_name, agg in pairs),
+            group_by=group_by,
+        )
+        publish_task(admin=admin, bucket=admin.username, event_data=event)
+        if plan["decision"] == "reject":
+            raise raise_400_bad_request(message=plan["message"])
+
+        interval = plan["interval"]
+        response.headers["X-Query-Interval"] = interval
+        data = await calculate_combined_metrics_from_shards(
+            request,
+            client=influx_client,
+            organization=settings.INFLUXDB_ORG,
+            bucket=current_user.username,
+            parameters=parameters,
+            interval=interval,
+            pairs=pairs,
+            group_by=group_by,
+        )
+        return data
+    except HTTPException as e:
+        raise e
+
+
 @router.get(
     "/metrics/{metric_name}",
     summary="Calculate a metric",
@@ -123,16 +272,28 @@ async def read_metrics_list(
     response_model=List[MetricResponseSchema],
 )
 async def calculate_metric(
+    request: Request,
+    response: Response,
+    admin: UserAccount = Depends(get_influxdb_admin),
     current_user: TokenUser = Depends(is_user_active),
     influx_client: InfluxDBClient = Depends(get_influxdb_client),
     parameters: AuditRetrievalRequestSchema = Depends(log_retrieval_query_parameters),
     interval: str = Query(default="1m", description="Interval to calculate the metric"),
     metric_name: str = Path(..., description="Name of the metric to be calculated", example="cpu_usage"),
     agg: str = Query(default="mean", description="Aggregation function to be used", example="sum"),
-    group_by: Union[str, None] = Query(default=None, description="Field to group by", example="status"),
+    group_by: List[str] = Query(default=[], description="Fields to group by", example=["status"]),
+    top_k: Union[int, None] = Query(default=None, ge=1, description="Number of heaviest groups to keep", example=10),
+    order_by: str = Query(default="sum", description="Aggregation ranking the groups", example="sum"),
 ):
     try:
-        data = calculate_metrics_from_bucket(
+        if top_k and not group_by:
+            raise raise_400_bad_request(message="top_k requires at least one group_by field.")
+        if order_by not in COMBINED_AGGREGATES:
+            raise raise_400_bad_request(message=f"order_by must be one of {', '.join(COMBINED_AGGREGATES)}.")
+
+        plan, event = await run_query(
+            request,
+            plan_metric_query,
             client=influx_client,
             organization=settings.INFLUXDB_ORG,
             bucket=current_user.username,
@@ -141,6 +302,27 @@ async def calculate_metric(
             metric_name=metric_name,
             agg=agg,
             group_by=group_by,
+            top_k=top_k,
+        )
+        publish_task(admin=admin, bucket=admin.username, event_data=event)
+        if plan["decision"] == "reject":
+            raise raise_400_bad_request(message=plan["message"])
+
+        interval = plan["interval"]
+        response.headers["X-Query-Interval"] = interval
+        data = await calculate_metrics_from_shards(
+            request,
+            client=influx_client,
+            organization=settings.INFLUXDB_ORG,
+            bucket=current_user.username,
+            parameters=parameters,
+            interval=interval,
+            metric_name=metric_name,
+            agg=agg,
+            group_by=group_by,
+            top_k=top_k,
+            order_by=order_by,
+            resolution=plan.get("resolution"),
         )
         return data
     except HTTPException as e:
@@ -154,6 +336,9 @@ async def calculate_metric(
     response_model=List[MetricCountResponseSchema],
 )
 async def calculate_metric_count(
+    request: Request,
+    response: Response,
+    admin: UserAccount = Depends(get_influxdb_admin),
     current_user: TokenUser = Depends(is_user_active),
     influx_client: InfluxDBClient = Depends(get_influxdb_client),
     parameters: AuditRetrievalRequestSchema = Depends(log_retrieval_query_parameters),
@@ -161,7 +346,25 @@ async def calculate_metric_count(
     metric_name: str = Path(..., description="Name of the metric to be calculated", example="status"),
 ):
     try:
-        data = calculate_metrics_count_from_bucket(
+        plan, event = await run_query(
+            request,
+            plan_metric_query,
+            client=influx_client,
+            organization=settings.INFLUXDB_ORG,
+            bucket=current_user.username,
+            parameters=parameters,
+            interval=interval,
+            metric_name=metric_name,
+            group_by=[metric_name],
+        )
+        publish_task(admin=admin, bucket=admin.username, event_data=event)
+        if plan["decision"] == "reject":
+            raise raise_400_bad_request(message=plan["message"])
+
+        interval = plan["interval"]
+        response.headers["X-Query-Interval"] = interval
+        data = await calculate_metrics_count_from_shards(
+            request,
             client=influx_client,
             organization=settings.INFLUXDB_ORG,
             bucket=current_user.username,
@@ -172,3 +375,121 @@ async def calculate_metric_count(
         return data
     except HTTPException as e:
         raise e
+
+
+@router.get(
+    "/metrics/{metric_name}/percentile",
+    summary="Calculate metric percentiles",
+    description="Estimate percentiles of a metric from the quantile sketches kept at ingest",
+    response_model=MetricPercentileResponseSchema,
+)
+async def calculate_metric_percentile(
+    current_user: TokenUser = Depends(is_user_active),
+    parameters: AuditRetrievalRequestSchema = Depends(log_retrieval_query_parameters),
+    metric_name: str = Path(..., description="Name of the metric to be calculated", example="latency"),
+    q: List[float] = Query(default=[0.5, 0.95, 0.99], description="Quantiles to be estimated", example=[0.99]),
+):
+    try:
+        return await calculate_percentiles_from_sketches(
+            bucket=current_user.username,
+            parameters=parameters,
+            metric_name=metric_name,
+            quantiles=q,
+        )
+    except HTTPException as e:
+        raise e
+
+
+@router.get(
+    "/metrics/{dimension}/distinct",
+    summary="Count distinct values",
+    description="Estimate the number of distinct actor origins or resources from the counters kept at ingest",
+    response_model=DistinctCountResponseSchema,
+)
+async def count_distinct_values(
+    current_user: TokenUser = Depends(is_user_active),
+    parameters: AuditRetrievalRequestSchema = Depends(log_retrieval_query_parameters),
+    dimension: str = Path(..., description="Dimension to be counted", example="resource_id"),
+):
+    try:
+        return await count_distinct_from_counters(
+            bucket=current_user.username,
+            parameters=parameters,
+            dimension=dimension,
+        )
+    except HTTPException as e:
+        raise e
+
+
+@router.post(
+    "/export",
+    summary="Export audit events",
+    description="Export audit events into chunked files on the server, in the background",
+    response_model=ExportJobResponseSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def export_logs(
+    background_tasks: BackgroundTasks,
+    current_user: TokenUser = Depends(is_user_active),
+    influx_client: InfluxDBClient = Depends(get_influxdb_client),
+    parameters: AuditRetrievalRequestSchema = Depends(log_retrieval_query_parameters),
+    export_format: str = Query(
+        default="csv",
+        alias="format",
+        description="Format of the exported files",
+        example="parquet",
+    ),
+):
+    try:
+        job = await create_export_job(bucket=current_user.username, parameters=parameters, export_format=export_format)
+        background_tasks.add_task(
+            run_export_job,
+            client=influx_client,
+            organization=settings.INFLUXDB_ORG,
+            job_id=job["id"],
+        )
+        return job
+    except HTTPException as e:
+        raise e
+
+
+@router.get(
+    "/export/{job_id}",
+    summary="Read export progress",
+    description="Read the progress and the files of an export",
+    response_model=ExportJobResponseSchema,
+)
+async def read_export(
+    current_user: TokenUser = Depends(is_user_active),
+    job_id: str = Path(..., description="Export ID", example="22a8fd00-179c-4045-b716-0c4f6070ad3c"),
+):
+    try:
+        return await read_export_job(job_id=job_id, bucket=current_user.username)
+    except HTTPException as e:
+        raise e
+
+
+@router.post(
+    "/export/{job_id}/resume",
+    summary="Resume an export",
+    description="Resume a failed or interrupted export from its first missing chunk",
+    response_model=ExportJobResponseSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def resume_export(
+    background_tasks: BackgroundTasks,
+    current_user: TokenUser = Depends(is_user_active),
+    influx_client: InfluxDBClient = Depends(get_influxdb_client),
+    job_id: str = Path(..., description="Export ID", example="22a8fd00-179c-4045-b716-0c4f6070ad3c"),
+):
+    try:
+        job = await resume_export_job(job_id=job_id, bucket=current_user.username)
+        background_tasks.add_task(
+            run_export_job,
+            client=influx_client,
+            organization=settings.INFLUXDB_ORG,
+            job_id=job_id,
+        )
+        return job
+    except HTTPException as e:
+        raise e
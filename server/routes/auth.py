@@ -24,6 +24,7 @@ from server.security.auth.token import create_jwt
 from server.security.dependencies.auth import (
     email_input_field,
     is_user_active,
+    limit_requests_by_ip,
     login_request_form,
     password_change_request_form,
     password_reset_request_form,
@@ -35,7 +36,7 @@ from server.utils.messages import raise_410_gone
 from server.utils.tasks import publish_task
 from server.utils.utilities import create_temporary_activation_url
 
-router = APIRouter(prefix="/auth", tags=[Tags.authentication])
+router = APIRouter(prefix="/auth", tags=[Tags.authentication], dependencies=[Depends(limit_requests_by_ip)])
 
 
 @router.post(
@@ -62,7 +63,7 @@ async def register(
         )
         events.append(event)
 
-        url, event = create_temporary_activation_url(new_user, f"{request.base_url}auth/activate")
+        url, event = await create_temporary_activation_url(new_user, f"{request.base_url}auth/activate")
         events.append(event)
 
         return {"msg": f"Account created. Activate your account using {url}."}
@@ -142,7 +143,7 @@ async def activate_account(
     start_time = time()
 
     try:
-        user, cache_events = activate_from_cache(key=key)
+        user, cache_events = await activate_from_cache(key=key)
         events.extend(cache_events)
 
         event = create_user_bucket(client=influx_client, user=user)
@@ -188,7 +189,7 @@ async def resend_activation_key(
         user, event = await read_user_by_email(session=session, email=email)
         events.append(event)
 
-        url, event = create_temporary_activation_url(user, f"{request.base_url}auth/activate")
+        url, event = await create_temporary_activation_url(user, f"{request.base_url}auth/activate")
         events.append(event)
 
         return {"msg": f"Activation key resent. Activate your account using {url}."}
@@ -266,7 +267,7 @@ async def forgot_password(
         user, event = await read_user_by_email(session=session, email=email)
         events.append(event)
 
-        url, event = create_temporary_activation_url(user, f"{request.base_url}auth/password/reset")
+        url, event = await create_temporary_activation_url(user, f"{request.base_url}auth/password/reset")
         events.append(event)
 
         return {"msg": f"Activation key resent. Activate your account using {url}."}
@@ -302,7 +303,7 @@ async def is_reset_password_route_valid(
     start_time = time()
 
     try:
-        is_valid, event = is_in_cache(key=key)
+        is_valid, event = await is_in_cache(key=key)
         events.append(event)
 
         if is_valid:
@@ -342,7 +343,7 @@ async def reset_password(
     start_time = time()
 
     try:
-        user, cache_events = activate_from_cache(key=key)
+        user, cache_events = await activate_from_cache(key=key)
         events.extend(cache_events)
 
         updated_user, event = await reset_user_password(
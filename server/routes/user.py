@@ -3,6 +3,7 @@ from time import time
 from fastapi import APIRouter, Depends, HTTPException, Path, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from server.database.users.auth import rotate_access_key
 from server.database.users.user import read_user_by_id
 from server.events.http import create_http_event
 from server.models.users import UserAccount
@@ -125,3 +126,39 @@ async def read_current_user_access_key(
             ),
         )
         publish_task(admin=admin, bucket=admin.username, event_data=events)
+
+
+@router.post(
+    "/access-key/rotate",
+    summary="Rotate current user access key",
+    description="Replace the access key of the current user with a new one",
+    response_model=UserAccessKeyResponseSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def rotate_current_user_access_key(
+    request: Request,
+    admin: UserAccount = Depends(get_influxdb_admin),
+    current_user: TokenUser = Depends(is_user_active),
+    session: AsyncSession = Depends(get_database_session),
+) -> UserAccessKeyResponseSchema:
+    status_code = 200
+    events = []
+    start_time = time()
+
+    try:
+        user, event = await rotate_access_key(session=session, user_id=current_user.id)
+        events.append(event)
+        return user
+    except HTTPException as e:
+        status_code = e.status_code
+        raise e
+    finally:
+        events.append(
+            create_http_event(
+                request=request,
+                status_code=status_code,
+                affected_resource_count=len(events),
+                execution_time=(time() - start_time) * 1000,
+            ),
+        )
+        publish_task(admin=admin, bucket=admin.username, event_data=events)
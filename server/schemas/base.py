@@ -27,6 +27,20 @@ class HealthResponseSchema(BaseResponseSchema):
     DEBUG: bool
 
 
+class CacheStatsSchema(BaseResponseSchema):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    hit_rate: Union[float, None] = None
+
+
+class CacheHealthResponseSchema(BaseResponseSchema):
+    admin: CacheStatsSchema
+    access: CacheStatsSchema
+    tokens: CacheStatsSchema
+
+
 class MessageResponseSchema(BaseResponseSchema):
     loc: Union[List[str], None] = None
     msg: str
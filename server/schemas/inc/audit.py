@@ -135,12 +135,14 @@ class AuditSchema(AuditRequestSchema):
 
 
 class AuditRetrievalRequestSchema(BaseRequestSchema):
-    category: str = Field(title="category", description="Category", example="http_events")
-    app: str = Field(title="app", description="Application", example="spectratrace_api")
+    category: List[str] = Field(title="category", description="Categories", example=["http_events"])
+    app: List[str] = Field(title="app", description="Applications", example=["spectratrace_api"])
     env: Union[str, None] = Field(default=None, title="env", description="Environment")
     method: Union[str, None] = Field(default=None, title="method", description="Method")
     status: Union[str, None] = Field(default=None, title="status", description="Status")
     origin: Union[str, None] = Field(default=None, title="origin", description="Origin")
+    resource_id: Union[str, None] = Field(default=None, title="resource_id", description="Resource ID")
+    resource_type: Union[str, None] = Field(default=None, title="resource_type", description="Resource type")
     start: Union[datetime, str] = Field(default="1d", title="start", description="Start time")
     stop: Union[datetime, str] = Field(default="now()", title="stop", description="Stop time")
 
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
 
 from pydantic import Field
 
@@ -128,3 +128,95 @@ class MetricCountResponseSchema(BaseResponseSchema):
                 },
             },
         }
+
+
+class MetricPercentileResponseSchema(BaseResponseSchema):
+    metric: str = Field(title="Metric", description="Name of the metric")
+    range: str = Field(title="Range", description="Range covered by the merged sketches")
+    count: int = Field(title="Count", description="Number of values in the range")
+    data: Dict[str, Union[float, None]] = Field(title="Data", description="Estimated value of each quantile")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "metric": "latency",
+                "range": "2023-06-11 00:00:00+00:00 - 2023-06-12 00:00:00+00:00",
+                "count": 1250,
+                "data": {
+                    "0.5": 0.05,
+                    "0.95": 0.21,
+                    "0.99": 0.48,
+                },
+            },
+        }
+
+
+class DistinctCountResponseSchema(BaseResponseSchema):
+    dimension: str = Field(title="Dimension", description="Name of the counted dimension")
+    range: str = Field(title="Range", description="Range covered by the merged counters")
+    count: int = Field(title="Count", description="Estimated number of distinct values in the range")
+    error: float = Field(title="Error", description="Standard error of the estimate relative to the count")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "dimension": "resource_id",
+                "range": "2023-06-11 00:00:00+00:00 - 2023-06-12 00:00:00+00:00",
+                "count": 4120,
+                "error": 0.0081,
+            },
+        }
+
+
+class CombinedMetricResponseSchema(BaseResponseSchema):
+    group_key: str = Field(title="Group Key", description="Group key of the metrics")
+    range: List[str] = Field(title="Range", description="Range of every window")
+    data: Dict[str, List[Union[float, None]]] = Field(
+        title="Data",
+        description="Values of every metric:agg pair, aligned with the ranges",
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "group_key": "all",
+                "range": [
+                    "2023-06-11 00:00:00+00:00 - 2023-06-11 01:00:00+00:00",
+                    "2023-06-11 01:00:00+00:00 - 2023-06-11 02:00:00+00:00",
+                ],
+                "data": {
+                    "latency:mean": [0.05, 0.07],
+                    "cpu_usage:max": [0.8, 0.6],
+                },
+            },
+        }
+
+
+class ExportJobResponseSchema(BaseResponseSchema):
+    id: str = Field(title="Export ID", description="ID of the export job")
+    status: str = Field(title="Status", description="One of pending, running, completed or failed")
+    format: str = Field(title="Format", description="Format of the exported files")
+    chunks: int = Field(title="Chunks", description="Number of time chunks of the export")
+    completed: int = Field(title="Completed", description="Number of chunks exported so far")
+    rows: int = Field(title="Rows", description="Number of events exported so far")
+    files: List[str] = Field(title="Files", description="Files of the completed chunks")
+    error: Union[str, None] = Field(default=None, title="Error", description="Error of the last failed run")
+    created_at: str = Field(title="Created At", description="Time the export was requested")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "id": "22a8fd00-179c-4045-b716-0c4f6070ad3c",
+                "status": "running",
+                "format": "csv",
+                "chunks": 24,
+                "completed": 2,
+                "rows": 5120,
+                "files": [
+                    "exports/22a8fd00-179c-4045-b716-0c4f6070ad3c/chunk-00000.csv.gz",
+                    "exports/22a8fd00-179c-4045-b716-0c4f6070ad3c/chunk-00001.csv.gz",
+                ],
+                "error": None,
+                "createdAt": "2023-06-11T00:00:00.000000Z",
+            },
+        }
@@ -22,6 +22,10 @@ class TokenData(TokenUser):
         title="expiry of token",
         decription="A timestamp definining tokens period of validity.",
     )
+    iat: datetime = Field(
+        title="issue time of token",
+        decription="A timestamp of when the token was issued.",
+    )
     sub: str = Field(
         title="OAuth2.0 token subject",
         decription="A string for subject of the token as per OAuth2.0 requirements.",
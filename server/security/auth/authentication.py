@@ -1,9 +1,22 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Tuple, Union
+
 from passlib.context import CryptContext
 
+from server.config.factory import settings
+from server.database.cache.limits import hold_hashing_slot
+from server.utils.messages import raise_503_service_unavailable
+
 
 class PasswordContext:
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        )
 
     def hash_plain_password(self, password: str) -> str:
         return self.pwd_context.hash(password)
@@ -11,9 +24,40 @@ class PasswordContext:
     def verify_password(self, password: str, hashed_password: str) -> bool:
         return self.pwd_context.verify(password, hashed_password)
 
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Union[str, None]]:
+        # the new hash is only returned when the stored one uses outdated parameters
+        return self.pwd_context.verify_and_update(password, hashed_password)
+
 
 def get_password_context() -> PasswordContext:
     return PasswordContext()
 
 
 pwd_context: PasswordContext = get_password_context()
+password_jobs: Dict[str, int] = {"pending": 0}
+
+
+def hash_plain_password(password: str) -> str:
+    return pwd_context.hash_plain_password(password)
+
+
+def verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Union[str, None]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+@lru_cache()
+def get_password_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+
+
+async def run_password_job(func: Callable[..., Any], *args) -> Any:
+    if password_jobs["pending"] >= settings.PASSWORD_HASH_QUEUE_DEPTH:
+        raise raise_503_service_unavailable(message="Too many password checks in progress, try again shortly.")
+
+    password_jobs["pending"] += 1
+    try:
+        async with hold_hashing_slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_password_executor(), func, *args)
+    finally:
+        password_jobs["pending"] -= 1
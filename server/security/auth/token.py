@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Union
+from typing import Any, Dict, Union
 
 from jose import JWTError, jwt
 from pydantic import ValidationError
@@ -11,8 +11,9 @@ from server.schemas.out.auth import TokenData, TokenUser
 
 def create_jwt(data: UserAccount, expires_delta: Union[datetime, None] = None) -> str:
     expires_delta = expires_delta if expires_delta else timedelta(minutes=settings.JWT_MIN)
-    expire = datetime.utcnow() + expires_delta
-    to_encode = TokenData(**data.dict(), exp=expire, sub=settings.JWT_SUBJECT)
+    issued_at = datetime.utcnow()
+    expire = issued_at + expires_delta
+    to_encode = TokenData(**data.dict(), exp=expire, iat=issued_at, sub=settings.JWT_SUBJECT)
     return jwt.encode(
         to_encode.dict(),
         key=settings.JWT_SECRET_KEY,
@@ -20,21 +21,29 @@ def create_jwt(data: UserAccount, expires_delta: Union[datetime, None] = None) -
     )
 
 
-def decode_jwt(token: str) -> TokenUser:
+def decode_jwt_payload(token: str) -> Dict[str, Any]:
     try:
-        payload = jwt.decode(
+        return jwt.decode(
             token=token,
             key=settings.JWT_SECRET_KEY,
             algorithms=[settings.JWT_ALGORITHM],
         )
+    except JWTError as token_decode_error:
+        raise ValueError("unable to decode JWT") from token_decode_error
+
+
+def read_token_user(payload: Dict[str, Any]) -> TokenUser:
+    try:
         user_data = TokenUser(
             id=payload.get("id"),
             username=payload.get("username"),
             email=payload.get("email"),
             is_active=payload.get("is_active"),
         )
-    except JWTError as token_decode_error:
-        raise ValueError("unable to decode JWT") from token_decode_error
     except ValidationError as validation_error:
         raise ValueError("invalid payload in JWT") from validation_error
     return user_data
+
+
+def decode_jwt(token: str) -> TokenUser:
+    return read_token_user(decode_jwt_payload(token))
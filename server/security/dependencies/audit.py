@@ -1,13 +1,15 @@
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Union
 
-from fastapi import Depends, Header, HTTPException, Query
+from fastapi import Depends, Header, Query
 from sqlmodel import Session
 
-from server.database.audit.auth import check_user_access_key
-from server.database.cache.ops import cache_data, is_in_cache, read_from_cache
+from server.database.cache.access import read_user_access
+from server.database.cache.postings import narrow_indexed_parameters
 from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.schemas.out.auth import TokenUser
+from server.security.dependencies.auth import is_user_active
 from server.security.dependencies.sessions import get_database_session
-from server.utils.messages import raise_401_unauthorized
+from server.utils.messages import raise_400_bad_request, raise_401_unauthorized
 
 
 def verify_api_key(
@@ -27,36 +29,71 @@ async def verify_user_access(
     api_key: str = Depends(verify_api_key),
     session: Session = Depends(get_database_session),
 ) -> Dict[str, Any]:
-    try:
-        is_valid, _ = is_in_cache(key=api_key)
-        if not is_valid:
-            user = await check_user_access_key(session, api_key)
-            cache_data(key=api_key, data=user.json())
-            return user.dict()
-
-        user, _ = read_from_cache(key=api_key)
-        return user
-    except HTTPException as e:
-        raise e
+    return await read_user_access(session, api_key)
 
 
 def log_retrieval_query_parameters(
-    category: str = Query(title="Category", description="Category", example="http_events"),
-    app: str = Query(title="Application", description="Application", example="spectratrace_api"),
+    current_user: TokenUser = Depends(is_user_active),
+    category: List[str] = Query(
+        default=[],
+        title="Category",
+        description="One or more categories, required unless filtering by resource or origin",
+        example=["http_events"],
+    ),
+    app: List[str] = Query(title="Application", description="One or more applications", example=["spectratrace_api"]),
     env: Union[str, None] = Query(default=None, title="Environment", description="Environment"),
     method: Union[str, None] = Query(default=None, title="Method", description="Method"),
     status: Union[str, None] = Query(default=None, title="Status", description="Status"),
     origin: Union[str, None] = Query(default=None, title="Origin", description="Origin"),
+    resource_id: Union[str, None] = Query(default=None, title="Resource ID", description="Resource ID"),
+    resource_type: Union[str, None] = Query(default=None, title="Resource Type", description="Resource type"),
     start: Union[str, None] = Query(default="1d", title="Start", description="Start time"),
     stop: Union[str, None] = Query(default="now()", title="Stop", description="Stop time"),
 ) -> AuditRetrievalRequestSchema:
-    return AuditRetrievalRequestSchema(
+    if not category and not (origin or resource_id or resource_type):
+        raise raise_400_bad_request(message="At least one category is required unless filtering by resource or origin.")
+
+    parameters = AuditRetrievalRequestSchema(
         category=category,
         app=app,
         env=env,
         method=method,
         status=status,
         origin=origin,
+        resource_id=resource_id,
+        resource_type=resource_type,
         start=start,
         stop=stop,
     )
+    return narrow_indexed_parameters(bucket=current_user.username, parameters=parameters)
+
+
+def search_query_parameters(
+    category: List[str] = Query(default=[], title="Category", description="Categories to search in"),
+    app: List[str] = Query(default=[], title="Application", description="Applications to search in"),
+    start: Union[str, None] = Query(default="1d", title="Start", description="Start time"),
+    stop: Union[str, None] = Query(default="now()", title="Stop", description="Stop time"),
+) -> AuditRetrievalRequestSchema:
+    return AuditRetrievalRequestSchema(category=category, app=app, start=start, stop=stop)
+
+
+def live_query_parameters(
+    category: List[str] = Query(default=[], title="Category", description="Categories to follow"),
+    app: List[str] = Query(default=[], title="Application", description="Applications to follow"),
+    env: Union[str, None] = Query(default=None, title="Environment", description="Environment"),
+    method: Union[str, None] = Query(default=None, title="Method", description="Method"),
+    status: Union[str, None] = Query(default=None, title="Status", description="Status"),
+    origin: Union[str, None] = Query(default=None, title="Origin", description="Origin"),
+    resource_id: Union[str, None] = Query(default=None, title="Resource ID", description="Resource ID"),
+    resource_type: Union[str, None] = Query(default=None, title="Resource Type", description="Resource type"),
+) -> AuditRetrievalRequestSchema:
+    return AuditRetrievalRequestSchema(
+        category=category,
+        app=app,
+        env=env,
+        method=method,
+        status=status,
+        origin=origin,
+        resource_id=resource_id,
+        resource_type=resource_type,
+    )
@@ -1,10 +1,12 @@
-from fastapi import Depends, Form
+from fastapi import Depends, Form, Request
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import EmailStr
 
+from server.config.factory import settings
+from server.database.cache.limits import check_rate_limit
+from server.database.cache.tokens import read_cached_token_user
 from server.schemas.inc.auth import LoginRequestSchema, PasswordChangeRequestSchema, SignupRequestSchema
 from server.schemas.out.auth import TokenUser
-from server.security.auth.token import decode_jwt
 from server.utils.messages import raise_403_forbidden, raise_422_unprocessable_entity
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
@@ -14,7 +16,7 @@ async def decode_user_token(
     token: str = Depends(oauth2_scheme),
 ) -> TokenUser:
     try:
-        user_data: TokenUser = decode_jwt(token)
+        user_data: TokenUser = await read_cached_token_user(token)
         return user_data
     except ValueError:
         raise raise_403_forbidden(
@@ -31,6 +33,11 @@ async def is_user_active(
     return user
 
 
+async def limit_requests_by_ip(request: Request) -> None:
+    host = request.client.host if request.client else "unknown"
+    await check_rate_limit("ip", host, settings.AUTH_RATE_LIMIT_PER_IP)
+
+
 def username_input_field(
     username: str = Form(
         title="Username",
@@ -115,20 +122,23 @@ def signup_request_form(
     return SignupRequestSchema(username=username, email=email, password=password)
 
 
-def login_request_form(
+async def login_request_form(
     username: str = Depends(username_input_field),
     password: str = Depends(password_input_field),
 ):
+    await check_rate_limit("username", username, settings.AUTH_RATE_LIMIT_PER_USERNAME)
     return LoginRequestSchema(username=username, password=password)
 
 
-def password_change_request_form(
+async def password_change_request_form(
+    user: TokenUser = Depends(is_user_active),
     current_password: str = Depends(password_input_field),
     new_password: str = Depends(new_password_input_field),
     repeat_password: str = Depends(repeat_password_input_field),
 ):
     if new_password != repeat_password:
         raise raise_422_unprocessable_entity("Passwords do not match.")
+    await check_rate_limit("username", user.username, settings.AUTH_RATE_LIMIT_PER_USERNAME)
     return PasswordChangeRequestSchema(current_password=current_password, new_password=new_password)
 
 
@@ -1,17 +1,14 @@
 from fastapi import Depends
 from influxdb_client import InfluxDBClient
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from server.config.factory import settings
-from server.database.audit.auth import get_admin_user
+from server.database.cache.admin import read_cached_admin
+from server.database.managers import get_async_session_factory, get_shared_influxdb_client
 from server.models.users import UserAccount
 
 
-def get_async_database_session():
-    url = settings.RDS_URI_ASYNC
-    engine = create_async_engine(url)
-    SessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+def get_async_database_session() -> AsyncSession:
+    SessionLocal = get_async_session_factory()
     return SessionLocal()
 
 
@@ -23,19 +20,10 @@ async def get_database_session() -> AsyncSession:
         await session.close()
 
 
-async def get_influxdb_admin(session: AsyncSession = Depends(get_database_session)):
-    admin: UserAccount = await get_admin_user(session=session)
-    return admin
+async def get_influxdb_admin() -> UserAccount:
+    # cached in process, see `server.database.cache.admin`
+    return await read_cached_admin()
 
 
-def get_influxdb_client(admin: UserAccount = Depends(get_influxdb_admin)):
-    client: InfluxDBClient = InfluxDBClient(
-        url=f"http://{settings.INFLUXDB_HOST}:{settings.INFLUXDB_PORT}",
-        token=admin.api_token,
-        org=settings.INFLUXDB_ORG,
-    )
-
-    try:
-        yield client
-    finally:
-        client.close()
+def get_influxdb_client(admin: UserAccount = Depends(get_influxdb_admin)) -> InfluxDBClient:
+    return get_shared_influxdb_client(token=admin.api_token)
@@ -1,7 +1,22 @@
-from datetime import datetime, timezone
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List
 
 from pydash import camel_case
 
+FLUX_DURATION_UNITS = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "ms": 1e-3,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 604800,
+    "mo": 2592000,
+    "y": 31536000,
+}
+
 
 def format_datetime_into_isoformat(ts: datetime) -> str:
     return ts.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
@@ -9,3 +24,33 @@ def format_datetime_into_isoformat(ts: datetime) -> str:
 
 def format_dict_key_to_camel_case(key: str) -> str:
     return camel_case(key)
+
+
+def parse_flux_duration(duration: str) -> float:
+    # calendar units are approximated, 1mo as 30 days and 1y as 365 days
+    parts = re.findall(r"(\d+)(mo|ms|us|ns|[smhdwy])", duration)
+    if not parts or "".join(f"{value}{unit}" for value, unit in parts) != duration:
+        raise ValueError(f"invalid duration {duration}")
+    return sum(int(value) * FLUX_DURATION_UNITS[unit] for value, unit in parts)
+
+
+def resolve_flux_time(value: str, now: datetime) -> datetime:
+    if value == "now()":
+        return now
+    if value.startswith("-"):
+        return now - timedelta(seconds=parse_flux_duration(value[1:]))
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def format_flux_time(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def format_flux_filter(column: str, values: List[str]) -> str:
+    # an empty set of values matches nothing
+    condition = " or ".join(f'r["{column}"] == "{value}"' for value in values) or "false"
+    return f" |> filter(fn: (r) => {condition})"
+
+
+def format_flux_columns(columns: List[str]) -> str:
+    return "[" + ", ".join(f'"{column}"' for column in columns) + "]"
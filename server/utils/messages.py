@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 
 from fastapi import HTTPException, status
 
@@ -32,6 +32,13 @@ def raise_404_not_found(message: str = "Not found") -> HTTPException:
     )
 
 
+def raise_409_conflict(message: str = "Conflict") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"msg": message},
+    )
+
+
 def raise_410_gone(message: str = "Gone") -> HTTPException:
     return HTTPException(
         status_code=status.HTTP_410_GONE,
@@ -44,3 +51,34 @@ def raise_422_unprocessable_entity(message: str = "Unprocessable entity") -> HTT
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         detail={"msg": message},
     )
+
+
+def raise_429_too_many_requests(
+    message: str = "Too many requests", headers: Optional[Dict[str, str]] = None
+) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={"msg": message},
+        headers=headers or None,
+    )
+
+
+def raise_499_client_closed_request(message: str = "Client closed request") -> HTTPException:
+    return HTTPException(
+        status_code=499,
+        detail={"msg": message},
+    )
+
+
+def raise_503_service_unavailable(message: str = "Service unavailable") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={"msg": message},
+    )
+
+
+def raise_504_gateway_timeout(message: str = "Gateway timeout") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail={"msg": message},
+    )
@@ -0,0 +1,28 @@
+from time import perf_counter
+from typing import Any, Mapping, Union
+
+import orjson
+from fastapi import Response
+
+
+class TrustedJSONResponse(Response):
+    # FastAPI does not validate returned responses, the content must already match the response model
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Union[Mapping[str, str], None] = None,
+    ) -> None:
+        start_time = perf_counter()
+        super().__init__(content=content, status_code=status_code, headers=headers)
+        self.headers.append("Server-Timing", f"serialize;dur={(perf_counter() - start_time) * 1000:.3f}")
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def trusted_json_response(content: Any, response: Response) -> TrustedJSONResponse:
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return TrustedJSONResponse(content=content, headers=headers)
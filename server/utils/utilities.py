@@ -13,7 +13,7 @@ def generate_random_key() -> str:
     return token
 
 
-def create_temporary_activation_url(user: UserAccount, url: HttpUrl) -> Tuple[HttpUrl, AuditRequestSchema]:
+async def create_temporary_activation_url(user: UserAccount, url: HttpUrl) -> Tuple[HttpUrl, AuditRequestSchema]:
     key = generate_random_key()
-    event = cache_data(key=key, data=user.json(), ttl=60)
+    event = await cache_data(key=key, data=user.json(), ttl=60)
     return f"{url}?key={key}", event
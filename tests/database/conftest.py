@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+from typing import Any, Union
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "parameters(**values): fields of the retrieval parameters of the tests")
+
+
+@pytest.fixture
+def parameters(request) -> AuditRetrievalRequestSchema:
+    marker = request.node.get_closest_marker("parameters")
+    # validators do not run on defaults, so the default range is passed explicitly
+    values = {"category": ["http_events"], "app": ["api"], "start": "1d", "stop": "now()"}
+    values.update(marker.kwargs if marker else {})
+    return AuditRetrievalRequestSchema(**values)
+
+
+def make_table(*rows):
+    return SimpleNamespace(records=[SimpleNamespace(values=row) for row in rows])
+
+
+class FakeRequest:
+    # disconnects once it was polled `polls` times, never without them
+    def __init__(self, polls: Union[int, None] = None):
+        self.polls = polls
+
+    async def is_disconnected(self) -> bool:
+        if self.polls is None:
+            return False
+        self.polls -= 1
+        return self.polls < 0
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        self.client.executions += 1
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    # commands queued on a pipeline are synchronous, the others are awaited
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.counters = {}
+        self.sets = {}
+        self.calls = []
+        self.executions = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        self.calls.append(("get", key))
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.calls.append(("set", key, ex))
+        self.values[key] = value
+
+    async def delete(self, key):
+        self.calls.append(("delete", key))
+        self.values.pop(key, None)
+
+    def hgetall(self, key):
+        self.calls.append(("hgetall", key))
+        return self.hashes.get(key, {})
+
+    def zremrangebyscore(self, key, low, high):
+        members = self.sets.setdefault(key, {})
+        for member in [member for member, score in members.items() if low <= score <= high]:
+            del members[member]
+
+    def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update(mapping)
+
+    def zcard(self, key):
+        return len(self.sets.get(key, {}))
+
+    def zrank(self, key, member):
+        return sorted(self.sets[key], key=self.sets[key].get).index(member)
+
+    def expire(self, key, seconds):
+        pass
+
+    async def zrem(self, key, member):
+        self.sets[key].pop(member, None)
+
+    async def pfcount(self, *keys):
+        self.calls.append(("pfcount", *keys))
+        return len(set().union(*(self.counters.get(key, set()) for key in keys)))
+
+
+class FakeResult:
+    def __init__(self, value: Any = None, rowcount: int = 0):
+        self.value = value
+        self.rowcount = rowcount
+
+    def scalar(self) -> Any:
+        return self.value
+
+
+class FakeSession:
+    # statements return the given results in order, values being wrapped as scalars
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt.compile(dialect=postgresql.dialect()))
+        result = self.results.pop(0) if self.results else None
+        return result if isinstance(result, FakeResult) else FakeResult(result)
+
+    async def commit(self):
+        self.commits += 1
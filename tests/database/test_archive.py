@@ -0,0 +1,197 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from server.config.factory import settings
+from server.database.audit import archive
+from server.database.audit.archive import (
+    build_retention_rules,
+    get_archive_path,
+    get_cold_boundary,
+    plan_archive_days,
+    read_archived_points,
+    read_archived_trail,
+    read_event_trail_from_tiers,
+    take_stale_archive_days,
+)
+from server.database.audit.export import write_export_file
+from server.utils.formatters import format_flux_time
+
+DAY = datetime(2023, 6, 1, tzinfo=timezone.utc)
+
+pytestmark = pytest.mark.parameters(start=DAY, stop=DAY + timedelta(days=1))
+
+
+def make_record(hour: int, category: str = "http_events", env: str = "staging", **values):
+    record = {
+        "_time": DAY + timedelta(hours=hour),
+        "_measurement": category,
+        "application": "api",
+        "environment": env,
+        "method": "GET",
+        "status": "success",
+        "level": "info",
+        "event_id": f"event-{hour}",
+        "event_name": "request",
+        "event_type": "read",
+        "event_stage": 1,
+        "event_duration": 12.5,
+        "affected_resources": 1,
+        "latency": 8.0,
+        "cpu_usage": 0.1,
+        "memory_usage": 0.2,
+        "event_description": "a request",
+        "event_detail": '{"path": "/"}',
+        "actor_origin": "127.0.0.1",
+        "actor_detail": None,
+        "resource_id": "1",
+        "resource_name": "users",
+        "resource_type": "table",
+        "resource_detail": None,
+        "metadata": None,
+    }
+    record.update(values)
+    return SimpleNamespace(values=record)
+
+
+@pytest.fixture
+def archive_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_DIRECTORY", str(tmp_path))
+    return tmp_path
+
+
+class TestRetention:
+    def test_plans_map_to_expiring_rules(self):
+        assert build_retention_rules("free").every_seconds == 30 * 86400
+
+    def test_unknown_plan(self):
+        with pytest.raises(HTTPException) as error:
+            build_retention_rules("unlimited")
+        assert error.value.status_code == 400
+
+    def test_only_closed_days_of_the_hot_window_are_archived(self, archive_directory):
+        now = DAY + timedelta(days=3, hours=6)
+        assert get_cold_boundary(2 * 86400, now) == DAY + timedelta(days=2)
+        assert plan_archive_days("user", 2 * 86400, now) == [DAY + timedelta(days=2)]
+
+        (archive_directory / "user").mkdir()
+        write_export_file([], path=get_archive_path("user", DAY + timedelta(days=2), "csv"), export_format="csv")
+        assert plan_archive_days("user", 2 * 86400, now) == []
+
+    def test_days_written_after_their_archival_are_archived_again(self, archive_directory):
+        class FakeRedis:
+            def __init__(self):
+                self.members = {"archive:stale:user": {b"2023-06-03", b"2023-05-01"}}
+
+            async def smembers(self, key):
+                return set(self.members.get(key, set()))
+
+            async def srem(self, key, *members):
+                self.members[key] -= set(members)
+
+        now = DAY + timedelta(days=3, hours=6)
+        (archive_directory / "user").mkdir()
+        write_export_file([], path=get_archive_path("user", DAY + timedelta(days=2), "csv"), export_format="csv")
+
+        redis_client = FakeRedis()
+        stale_days = asyncio.run(take_stale_archive_days(redis_client, "user"))
+        assert redis_client.members["archive:stale:user"] == set()
+        # days before the cold boundary are partially expired and keep their archive
+        assert plan_archive_days("user", 2 * 86400, now, stale_days) == [DAY + timedelta(days=2)]
+
+
+class TestReadArchivedPoints:
+    def test_events_are_filtered_and_shaped_like_hot_events(self, archive_directory, parameters):
+        (archive_directory / "user").mkdir()
+        records = [
+            make_record(1, metadata='{"trace": "\\"abc\\""}', region="eu"),
+            make_record(2, category="cache_events"),
+            make_record(3, env="production"),
+            make_record(3, env="staging"),
+        ]
+        write_export_file(records, path=get_archive_path("user", DAY, "csv"), export_format="csv")
+
+        events = read_archived_points("user", parameters, limit=10)
+        assert [(event["event"]["id"], event["tags"]["environment"]) for event in events] == [
+            ("event-3", "staging"),
+            ("event-3", "production"),
+            ("event-1", "staging"),
+        ]
+        assert events[0]["timestamp"] == DAY + timedelta(hours=3)
+        assert events[0]["event"]["stage"] == 1 and events[0]["event"]["latency"] == 8.0
+        assert events[0]["event"]["detail"] == {"path": "/"}
+        assert events[2]["metadata"] == {"trace": "abc", "region": "eu"}
+
+    def test_cursor_tie_break(self, archive_directory, parameters):
+        (archive_directory / "user").mkdir()
+        records = [make_record(3, env="production"), make_record(3, env="staging")]
+        write_export_file(records, path=get_archive_path("user", DAY, "csv"), export_format="csv")
+
+        events = read_archived_points("user", parameters, tie_break=(DAY + timedelta(hours=3), "staging"))
+        assert [event["tags"]["environment"] for event in events] == ["production"]
+
+    def test_only_the_newest_events_are_kept(self, archive_directory, parameters):
+        (archive_directory / "user").mkdir()
+        records = [make_record(hour, category="cache_events" if hour % 2 else "http_events") for hour in range(12)]
+        write_export_file(records, path=get_archive_path("user", DAY, "csv"), export_format="csv")
+
+        events = read_archived_points("user", parameters, limit=3)
+        assert [event["event"]["id"] for event in events] == ["event-10", "event-8", "event-6"]
+
+    def test_older_parquet_row_groups_are_skipped(self, monkeypatch, archive_directory, parameters):
+        pyarrow = pytest.importorskip("pyarrow")
+        monkeypatch.setattr(settings, "EXPORT_ROW_GROUP", 2)
+        (archive_directory / "user").mkdir()
+        path = get_archive_path("user", DAY, "parquet")
+        write_export_file([make_record(hour) for hour in range(6)], path=path, export_format="parquet")
+
+        read_row_group = pyarrow.parquet.ParquetFile.read_row_group
+        groups = []
+
+        def count_row_groups(self, index, *args, **kwargs):
+            groups.append(index)
+            return read_row_group(self, index, *args, **kwargs)
+
+        monkeypatch.setattr(archive.pyarrow.parquet.ParquetFile, "read_row_group", count_row_groups)
+        events = read_archived_points("user", parameters, limit=3)
+        assert [event["event"]["id"] for event in events] == ["event-5", "event-4", "event-3"]
+        assert groups == [2, 1]
+
+
+class TestReadArchivedTrail:
+    def test_trail_is_read_from_the_archived_days(self, archive_directory):
+        (archive_directory / "user").mkdir()
+        for day, hours in ((-1, [5]), (0, [3, 3, 4]), (1, [2])):
+            time = DAY + timedelta(days=day)
+            records = [
+                make_record(hour, env=f"env-{index}", _time=time + timedelta(hours=hour))
+                for index, hour in enumerate(hours)
+            ]
+            write_export_file(records, path=get_archive_path("user", time, "csv"), export_format="csv")
+
+        events = read_archived_trail("user", "event-3", stop=DAY + timedelta(days=2))
+        assert [event["tags"]["environment"] for event in events] == ["env-1", "env-0"]
+        assert read_archived_trail("user", "event-3", stop=DAY) == []
+
+    def test_hot_trail_starts_at_the_cold_boundary(self, archive_directory, monkeypatch):
+        (archive_directory / "user").mkdir()
+        write_export_file([make_record(3)], path=get_archive_path("user", DAY, "csv"), export_format="csv")
+        queries = []
+
+        async def fake_run_query(request, func, **kwargs):
+            if func is archive.read_bucket_retention:
+                return 2 * 86400
+            if func is archive.read_event_trail:
+                queries.append(kwargs["start"])
+                return []
+            return func(**kwargs)
+
+        monkeypatch.setattr(archive, "run_query", fake_run_query)
+        events = asyncio.run(read_event_trail_from_tiers(None, None, "org", "user", "event-3"))
+
+        now = datetime.now(timezone.utc)
+        assert queries == [format_flux_time(get_cold_boundary(2 * 86400, now))]
+        assert [event["event"]["id"] for event in events] == ["event-3"]
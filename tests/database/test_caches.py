@@ -0,0 +1,194 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from server.database.cache import access
+from server.database.cache import admin as admin_module
+from server.database.cache import tokens
+from server.database.cache.access import read_user_access, revoke_access_key
+from server.database.cache.admin import cache_admin, publish_admin_invalidation, read_cached_admin
+from server.database.cache.invalidation import dispatch_invalidation
+from server.database.cache.tokens import invalidate_user_tokens, read_cached_token_user
+from server.models.users import UserAccount
+from server.security.auth.token import create_jwt
+from server.utils import caches
+from server.utils.caches import TTLCache
+from tests.database.conftest import FakeRedis, FakeSession
+
+
+class TestTTLCache:
+    def test_entries_expire(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(caches, "monotonic", lambda: now[0])
+        cache = TTLCache(maxsize=4, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=30)
+
+        now[0] += 10
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert cache.stats() == {"size": 1, "maxsize": 4, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+class TestCachedAdmin:
+    def test_database_is_only_read_on_a_miss(self, monkeypatch):
+        reads = []
+
+        async def get_admin_user(session):
+            reads.append(session)
+            return SimpleNamespace(username="admin", api_token=f"token-{len(reads)}")
+
+        monkeypatch.setattr(admin_module, "get_admin_user", get_admin_user)
+        monkeypatch.setattr(admin_module, "get_async_session_factory", lambda: FakeSession)
+        monkeypatch.setattr(admin_module, "admin_cache", TTLCache(maxsize=1, ttl=60))
+
+        async def read_twice():
+            return [(await read_cached_admin()).api_token for _ in range(2)]
+
+        assert asyncio.run(read_twice()) == ["token-1", "token-1"]
+        admin_module.admin_cache.clear()
+        assert asyncio.run(read_twice()) == ["token-2", "token-2"]
+
+        cache_admin(SimpleNamespace(username="admin", api_token="startup"))
+        assert asyncio.run(read_cached_admin()).api_token == "startup"
+        assert len(reads) == 2
+
+    def test_new_admin_token_clears_the_cache_of_every_process(self, monkeypatch):
+        published = []
+        redis_client = SimpleNamespace(publish=lambda channel, message: published.append((channel, message)))
+        monkeypatch.setattr(admin_module, "get_redis_client", lambda: redis_client)
+        monkeypatch.setattr(admin_module, "admin_cache", TTLCache(maxsize=1, ttl=60))
+        cache_admin(SimpleNamespace(username="admin", api_token="old"))
+
+        publish_admin_invalidation()
+        dispatch_invalidation(*published[0])
+        assert published == [(admin_module.ADMIN_INVALIDATION_CHANNEL, "admin")]
+        assert admin_module.admin_cache.get("admin") is None
+
+
+class TestAccessCache:
+    @pytest.fixture
+    def redis_client(self, monkeypatch):
+        client = FakeRedis()
+        monkeypatch.setattr(access, "get_async_redis_client", lambda: client)
+        monkeypatch.setattr(access, "access_cache", TTLCache(maxsize=8, ttl=30))
+        return client
+
+    def test_keys_are_read_once_per_tier(self, monkeypatch, redis_client):
+        reads = []
+
+        async def check_user_access_key(session, api_key):
+            reads.append(api_key)
+            return SimpleNamespace(json=lambda: '{"username": "user"}')
+
+        monkeypatch.setattr(access, "check_user_access_key", check_user_access_key)
+
+        assert asyncio.run(read_user_access(None, "key")) == {"username": "user"}
+        assert asyncio.run(read_user_access(None, "key")) == {"username": "user"}
+        assert reads == ["key"]
+        assert redis_client.calls == [("get", "access:key"), ("set", "access:key", 86400)]
+
+        dispatch_invalidation(access.ACCESS_REVOCATION_CHANNEL, "key")
+        asyncio.run(read_user_access(None, "key"))
+        assert reads == ["key"] and redis_client.calls[-1] == ("get", "access:key")
+
+    def test_revoked_keys_are_dropped_by_every_process(self, monkeypatch, redis_client):
+        published = []
+
+        async def publish_invalidation(channel, message):
+            published.append((channel, message))
+
+        monkeypatch.setattr(access, "publish_invalidation", publish_invalidation)
+        redis_client.values["access:key"] = b'{"username": "user"}'
+        access.access_cache.set("key", b'{"username": "user"}')
+
+        asyncio.run(revoke_access_key("key"))
+        assert "access:key" not in redis_client.values
+        assert access.access_cache.get("key") is None
+
+        # another process still holding the key drops it when the revocation reaches it
+        access.access_cache.set("key", b'{"username": "user"}')
+        dispatch_invalidation(*published[0])
+        assert access.access_cache.get("key") is None
+
+    def test_unknown_keys_are_cached(self, monkeypatch, redis_client):
+        reads = []
+
+        async def check_user_access_key(session, api_key):
+            reads.append(api_key)
+            raise HTTPException(status_code=404)
+
+        monkeypatch.setattr(access, "check_user_access_key", check_user_access_key)
+
+        for _ in range(2):
+            with pytest.raises(HTTPException) as error:
+                asyncio.run(read_user_access(None, "bogus"))
+            assert error.value.status_code == 404
+        assert reads == ["bogus"]
+        assert redis_client.calls[-1] == ("set", "access:bogus", 60)
+
+
+class TestTokenCache:
+    @pytest.fixture
+    def redis_client(self, monkeypatch):
+        client = FakeRedis()
+        monkeypatch.setattr(tokens, "get_async_redis_client", lambda: client)
+        monkeypatch.setattr(tokens, "token_cache", TTLCache(maxsize=8, ttl=60))
+        return client
+
+    def test_tokens_are_verified_once_until_invalidated(self, monkeypatch, redis_client):
+        decoded = []
+        decode_jwt_payload = tokens.decode_jwt_payload
+
+        def count_decodes(token):
+            decoded.append(token)
+            return decode_jwt_payload(token)
+
+        monkeypatch.setattr(tokens, "decode_jwt_payload", count_decodes)
+        token = create_jwt(UserAccount(id=7, username="username", email="user@email.com", is_active=True))
+
+        assert asyncio.run(read_cached_token_user(token)).id == 7
+        assert asyncio.run(read_cached_token_user(token)).username == "username"
+        assert len(decoded) == 1 and token not in tokens.token_cache.entries
+
+        dispatch_invalidation(tokens.TOKEN_INVALIDATION_CHANNEL, "8")
+        asyncio.run(read_cached_token_user(token))
+        dispatch_invalidation(tokens.TOKEN_INVALIDATION_CHANNEL, "7")
+        asyncio.run(read_cached_token_user(token))
+        assert len(decoded) == 2
+
+    def test_tokens_issued_before_the_invalidation_are_rejected(self, monkeypatch, redis_client):
+        async def publish_invalidation(channel, message):
+            pass
+
+        monkeypatch.setattr(tokens, "publish_invalidation", publish_invalidation)
+        token = create_jwt(UserAccount(id=7, username="username", email="user@email.com", is_active=True))
+        issued_at = tokens.decode_jwt_payload(token)["iat"]
+        assert asyncio.run(read_cached_token_user(token)).id == 7
+
+        monkeypatch.setattr(tokens, "time", lambda: issued_at + 1.5)
+        asyncio.run(invalidate_user_tokens(7))
+        assert redis_client.values["tokens:valid_after:7"] == issued_at + 1
+        with pytest.raises(ValueError):
+            asyncio.run(read_cached_token_user(token))
+
+        # a token issued in the second of the change, such as the next login, stays valid
+        redis_client.values["tokens:valid_after:7"] = str(issued_at).encode()
+        assert asyncio.run(read_cached_token_user(token)).id == 7
+
+    def test_invalid_tokens_are_not_cached(self, redis_client):
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                asyncio.run(read_cached_token_user("not-a-token"))
+        assert tokens.token_cache.stats()["size"] == 0
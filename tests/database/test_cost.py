@@ -0,0 +1,62 @@
+import pytest
+
+from server.config.factory import settings
+from server.database.audit import cost, rollups
+from server.database.audit.cost import plan_metric_query
+
+pytestmark = pytest.mark.parameters(app=["spectratrace_api"], start="365d")
+
+
+@pytest.fixture(autouse=True)
+def rollup_resolutions(monkeypatch):
+    resolutions = list(rollups.ROLLUP_RESOLUTIONS)
+    monkeypatch.setattr(rollups, "read_rollup_resolutions", lambda client, bucket: resolutions)
+    return resolutions
+
+
+def use_stats(monkeypatch, rows_per_hour: float, cardinality: int = 1):
+    monkeypatch.setattr(
+        cost,
+        "read_query_stats",
+        lambda *args, **kwargs: {"rows_per_hour": rows_per_hour, "cardinality": cardinality},
+    )
+
+
+class TestPlanMetricQuery:
+    def test_too_many_windows_are_coarsened(self, monkeypatch, parameters):
+        use_stats(monkeypatch, rows_per_hour=10)
+        plan, event = plan_metric_query(None, "org", "user", parameters, "1s", "latency", "mean")
+
+        assert plan["decision"] == "coarsen"
+        assert plan["interval"] == "1h"
+        assert plan["points"] <= settings.QUERY_MAX_POINTS
+        assert event.event.name == "query-plan"
+
+    def test_compatible_queries_use_rollups(self, monkeypatch, parameters):
+        use_stats(monkeypatch, rows_per_hour=10**9)
+        plan, _ = plan_metric_query(None, "org", "user", parameters, "1d", "latency", "mean")
+
+        assert plan["decision"] == "rollup"
+        assert plan["resolution"] == "1d"
+
+    def test_buckets_without_rollups_are_planned_raw(self, monkeypatch, parameters, rollup_resolutions):
+        use_stats(monkeypatch, rows_per_hour=10**9)
+        rollup_resolutions.clear()
+        plan, _ = plan_metric_query(None, "org", "user", parameters, "1d", "latency", "mean")
+
+        assert plan["decision"] == "reject"
+        assert "resolution" not in plan
+
+    def test_expensive_raw_queries_are_rejected(self, monkeypatch, parameters):
+        use_stats(monkeypatch, rows_per_hour=10**9)
+        plan, _ = plan_metric_query(None, "org", "user", parameters, "1d", "latency", "median")
+
+        assert plan["decision"] == "reject"
+        assert "rollups" in plan["message"]
+
+    def test_high_cardinality_groups_are_rejected(self, monkeypatch, parameters):
+        use_stats(monkeypatch, rows_per_hour=10, cardinality=10**6)
+        plan, _ = plan_metric_query(None, "org", "user", parameters, "1m", "latency", "mean", ["status"])
+
+        assert plan["decision"] == "reject"
+        assert "group by" in plan["message"]
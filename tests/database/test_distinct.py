@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from server.database.cache import distinct
+from server.database.cache.distinct import DISTINCT_STANDARD_ERROR, count_distinct_from_counters
+from tests.database.conftest import FakeRedis
+
+pytestmark = pytest.mark.parameters(
+    app=["api", "worker"],
+    start=datetime(2023, 6, 10, 23, tzinfo=timezone.utc),
+    stop=datetime(2023, 6, 12, tzinfo=timezone.utc),
+)
+
+
+class TestCountDistinct:
+    def test_windows_are_merged_in_a_single_count(self, monkeypatch, parameters):
+        client = FakeRedis()
+        monkeypatch.setattr(distinct, "get_async_redis_client", lambda: client)
+
+        day = int(datetime(2023, 6, 11, tzinfo=timezone.utc).timestamp())
+        client.counters[f"hll:user:http_events:api:resource_id:1d:{day}"] = {"1", "2"}
+        client.counters[f"hll:user:http_events:worker:resource_id:1d:{day}"] = {"2", "3"}
+
+        result = asyncio.run(count_distinct_from_counters("user", parameters, "resource_id"))
+
+        assert result["count"] == 3 and result["error"] == DISTINCT_STANDARD_ERROR
+        (command, *keys), *_ = client.calls
+        assert command == "pfcount" and len(keys) == 4 and len(client.calls) == 1
+
+    def test_unsupported_requests_are_rejected(self, parameters):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(count_distinct_from_counters("user", parameters, "event_name"))
+        assert error.value.status_code == 400
+
+        parameters.status = "success"
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(count_distinct_from_counters("user", parameters, "resource_id"))
+        assert error.value.status_code == 400
@@ -0,0 +1,31 @@
+import asyncio
+from time import sleep
+
+import pytest
+from fastapi import HTTPException
+
+from server.config.factory import settings
+from server.database.audit.executor import run_query
+from tests.database.conftest import FakeRequest
+
+
+def slow_query(duration: float, result: str) -> str:
+    sleep(duration)
+    return result
+
+
+class TestRunQuery:
+    def test_returns_query_result(self):
+        result = asyncio.run(run_query(FakeRequest(), slow_query, duration=0, result="rows"))
+        assert result == "rows"
+
+    def test_query_timeout(self, monkeypatch):
+        monkeypatch.setattr(settings, "INFLUXDB_QUERY_TIMEOUT", 0.1)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(run_query(FakeRequest(), slow_query, duration=1, result="rows"))
+        assert error.value.status_code == 504
+
+    def test_client_disconnect(self):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(run_query(FakeRequest(polls=0), slow_query, duration=1, result="rows"))
+        assert error.value.status_code == 499
@@ -0,0 +1,52 @@
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from server.database.audit.export import export_chunk, split_export_range
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+
+
+def make_record(second: int):
+    return SimpleNamespace(
+        values={
+            "_measurement": "http_events",
+            "_time": datetime(2023, 6, 11, 0, 0, second, tzinfo=timezone.utc),
+            "application": "api",
+            "environment": "staging",
+            "event_id": str(second),
+            "event_stage": 1,
+            "latency": 0.05,
+            "actor_origin": "127.0.0.1",
+            "metadata": json.dumps({"key": "value"}),
+        }
+    )
+
+
+class TestExport:
+    def test_split_export_range(self):
+        start = datetime(2023, 6, 11, tzinfo=timezone.utc)
+        stop = datetime(2023, 6, 11, 2, 30, tzinfo=timezone.utc)
+        chunks = split_export_range(start, stop, "1h")
+
+        assert len(chunks) == 3
+        assert chunks[0][0] == start and chunks[-1][1] == stop
+
+    def test_chunk_is_streamed_into_gzip_csv(self, tmp_path):
+        client = Mock()
+        client.query_api.return_value.query_stream.return_value = iter([make_record(1), make_record(2)])
+        parameters = AuditRetrievalRequestSchema(category=["http_events"], app=["api"], start="1h", stop="now()")
+        path = os.path.join(tmp_path, "chunk-00000.csv.gz")
+
+        count = export_chunk(client, "org", "user", parameters, path, "csv")
+
+        assert count == 2
+        assert os.listdir(tmp_path) == ["chunk-00000.csv.gz"]
+        with gzip.open(path, "rt") as reader:
+            rows = list(csv.DictReader(reader))
+        assert [row["event_id"] for row in rows] == ["1", "2"]
+        assert rows[0]["timestamp"] == "2023-06-11T00:00:01.000000Z"
+        assert json.loads(rows[0]["metadata"]) == {"key": "value"}
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from server.config.factory import settings
+from server.database.cache import limits
+from server.database.cache.limits import HASHING_SLOTS, check_rate_limit, hold_hashing_slot
+from tests.database.conftest import FakeRedis
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(limits, "get_async_redis_client", lambda: client)
+    return client
+
+
+class TestRateLimits:
+    def test_requests_past_the_limit_are_rejected(self, monkeypatch, redis_client):
+        now = [1000.0]
+        monkeypatch.setattr(limits, "time", lambda: now[0])
+
+        async def attempt(identifier):
+            await check_rate_limit("username", identifier, limit=2)
+
+        asyncio.run(attempt("Username"))
+        asyncio.run(attempt("username"))
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(attempt("username"))
+        assert error.value.status_code == 429
+        assert error.value.headers["Retry-After"] == str(settings.AUTH_RATE_LIMIT_WINDOW)
+        asyncio.run(attempt("other"))
+
+        now[0] += settings.AUTH_RATE_LIMIT_WINDOW + 1
+        asyncio.run(attempt("username"))
+
+
+class TestHashingSlots:
+    def test_slots_are_shared_and_released(self, monkeypatch, redis_client):
+        monkeypatch.setattr(settings, "PASSWORD_HASH_CONCURRENCY", 1)
+
+        async def hold_two():
+            async with hold_hashing_slot():
+                async with hold_hashing_slot():
+                    pass
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(hold_two())
+        assert error.value.status_code == 503
+        assert redis_client.sets[HASHING_SLOTS] == {}
+
+    def test_slots_of_crashed_processes_are_reclaimed(self, monkeypatch, redis_client):
+        monkeypatch.setattr(settings, "PASSWORD_HASH_CONCURRENCY", 1)
+        redis_client.zadd(HASHING_SLOTS, {"crashed": 0.0})
+
+        async def hold():
+            async with hold_hashing_slot():
+                return len(redis_client.sets[HASHING_SLOTS])
+
+        assert asyncio.run(hold()) == 1
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+from server.config.factory import settings
+from server.database.cache import live
+from server.database.cache.live import LiveSubscriber, dispatch_live_events, stream_live_events
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from tests.database.conftest import FakeRequest
+
+
+def make_event(category: str = "http_events", status: str = "success"):
+    return {
+        "category": category,
+        "tags": {"application": "api", "environment": "staging"},
+        "method": "GET",
+        "status": status,
+        "actor": {"origin": "127.0.0.1"},
+        "resource": {"id": "42", "type": "order"},
+    }
+
+
+class TestLiveEvents:
+    def test_filters_and_backpressure(self, monkeypatch):
+        monkeypatch.setattr(settings, "LIVE_QUEUE_SIZE", 2)
+
+        async def dispatch():
+            subscriber = LiveSubscriber(
+                AuditRetrievalRequestSchema(category=["http_events"], app=[], status="error", resource_id="42")
+            )
+            monkeypatch.setitem(live.live_subscribers, "user", {subscriber})
+            events = [make_event(status="error"), make_event(), make_event("cache_events", "error")]
+            dispatch_live_events("user", events * 3)
+            return subscriber
+
+        subscriber = asyncio.run(dispatch())
+        assert subscriber.queue.qsize() == 2
+        assert subscriber.dropped == 1
+
+    def test_stream_reports_dropped_events(self, monkeypatch):
+        subscriber = LiveSubscriber(AuditRetrievalRequestSchema(category=[], app=[]))
+
+        async def subscribe(bucket, parameters):
+            subscriber.offer(make_event())
+            subscriber.dropped = 3
+            return subscriber
+
+        async def unsubscribe(bucket, subscriber):
+            pass
+
+        monkeypatch.setattr(live, "subscribe_to_bucket", subscribe)
+        monkeypatch.setattr(live, "unsubscribe_from_bucket", unsubscribe)
+
+        async def collect():
+            stream = stream_live_events(FakeRequest(polls=1), "user", subscriber.parameters)
+            return [message async for message in stream]
+
+        messages = asyncio.run(collect())
+        assert messages[0] == "event: dropped\ndata: 3\n\n"
+        assert messages[1] == f"event: audit\ndata: {json.dumps(make_event())}\n\n"
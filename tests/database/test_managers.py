@@ -1,12 +1,25 @@
+import asyncio
 import json
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
+from fastapi import HTTPException
 from redis import Redis
 
 from server.config.factory import settings
 from server.database.cache.ops import activate_from_cache, cache_data, is_in_cache
-from server.database.managers import create_db_and_tables, get_redis_client, ping_redis_server
+from server.database.managers import (
+    close_async_engine,
+    close_async_redis_client,
+    close_influxdb_clients,
+    create_db_and_tables,
+    get_async_engine,
+    get_async_redis_client,
+    get_async_session_factory,
+    get_redis_client,
+    get_shared_influxdb_client,
+    ping_redis_server,
+)
 
 
 class TestCreateDbAndTables:
@@ -14,13 +27,23 @@ class TestCreateDbAndTables:
     @patch("server.database.managers.UserTables.metadata.create_all")
     def test_create_db_and_tables_success(self, mock_create_all, mock_create_engine):
         """Mock the create_engine function and its return value."""
-        mock_engine = Mock()
+        mock_engine = MagicMock()
         mock_create_engine.return_value = mock_engine
 
         create_db_and_tables()
         mock_create_engine.assert_called_once_with(settings.RDS_URI, echo=True)
         mock_create_all.assert_called_once_with(mock_engine)
 
+    @patch("server.database.managers.create_engine")
+    @patch("server.database.managers.UserTables.metadata.create_all")
+    def test_create_db_and_tables_adds_new_columns(self, mock_create_all, mock_create_engine):
+        connection = mock_create_engine.return_value.begin.return_value.__enter__.return_value
+
+        create_db_and_tables()
+        (statement,), _ = connection.execute.call_args
+        plan = settings.DEFAULT_RETENTION_PLAN
+        assert str(statement) == f"ALTER TABLE accounts ADD COLUMN IF NOT EXISTS plan VARCHAR NOT NULL DEFAULT '{plan}'"
+
     @patch("server.database.managers.create_engine", side_effect=Exception("Invalid URI"))
     def test_create_db_and_tables_invalid_uri(self, mock_create_engine):
         """Call the function under test and assert that it raises an
@@ -65,80 +88,120 @@ class TestRedisFunctions:
         mock_client.ping.assert_called_once()
         assert result is True
 
-    @patch("server.database.managers.get_redis_client")
+    @patch("server.database.cache.ops.get_async_redis_client")
     def test_cache_data(self, mock_get_redis_client):
         # Mock the Redis client
-        mock_client = Mock(spec=Redis)
+        mock_client = AsyncMock()
         mock_get_redis_client.return_value = mock_client
 
         # Call the function under test
-        cache_data(key="test_key", data="test_data", ttl=3600)
+        asyncio.run(cache_data(key="test_key", data="test_data", ttl=3600))
         mock_get_redis_client.assert_called_once()
-        mock_client.set.assert_called_once_with("test_key", "test_data", ex=3600)
+        mock_client.set.assert_awaited_once_with("test_key", "test_data", ex=3600)
 
-    @patch("server.database.managers.get_redis_client")
+    @patch("server.database.cache.ops.get_async_redis_client")
     def test_is_in_cache_key_exists(self, mock_get_redis_client):
         # Mock the Redis client
-        mock_client = Mock(spec=Redis)
+        mock_client = AsyncMock()
         mock_get_redis_client.return_value = mock_client
-        mock_client.exists.return_value = True
+        mock_client.exists.return_value = 1
 
         # Call the function under test
-        result, _ = is_in_cache(key="test_key")
+        result, _ = asyncio.run(is_in_cache(key="test_key"))
         mock_get_redis_client.assert_called_once()
-        mock_client.exists.assert_called_once_with("test_key")
+        mock_client.exists.assert_awaited_once_with("test_key")
         assert result is True
 
-    @patch("server.database.managers.get_redis_client")
+    @patch("server.database.cache.ops.get_async_redis_client")
     def test_is_in_cache_key_does_not_exist(self, mock_get_redis_client):
         # Mock the Redis client
-        mock_client = Mock(spec=Redis)
+        mock_client = AsyncMock()
         mock_get_redis_client.return_value = mock_client
-        mock_client.exists.return_value = False
+        mock_client.exists.return_value = 0
 
         # Call the function under test
-        result, _ = is_in_cache(key="test_key")
+        result, event = asyncio.run(is_in_cache(key="test_key"))
         mock_get_redis_client.assert_called_once()
-        mock_client.exists.assert_called_once_with("test_key")
-        assert result is None
+        mock_client.exists.assert_awaited_once_with("test_key")
+        assert result is False and event is None
 
-    @patch("server.database.managers.get_redis_client", side_effect=Exception("Token expired or invalid."))
+    @patch("server.database.cache.ops.get_async_redis_client", side_effect=Exception("Token expired or invalid."))
     def test_is_in_cache_exception(self, mock_get_redis_client):
-        # Mock the Redis client
-        mock_client = Mock(spec=Redis)
-        mock_get_redis_client.return_value = mock_client
-
-        with pytest.raises(Exception):
-            is_in_cache(key="test_key")
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(is_in_cache(key="test_key"))
 
+        assert error.value.status_code == 410
         mock_get_redis_client.assert_called_once()
 
-    @patch("server.database.managers.get_redis_client")
+    @patch("server.database.cache.ops.get_async_redis_client")
     def test_activate_from_cache_success(self, mock_get_redis_client):
-        # Mock the Redis client
-        mock_client = Mock(spec=Redis)
-        mock_get_redis_client.return_value = mock_client
-
-        # Mock the Redis client's get method to return JSON data
+        # Mock the Redis client and the pipeline reading and deleting the key
         mock_data = {"key": "value"}
-        mock_client.get.return_value = json.dumps(mock_data).encode("utf-8")
+        mock_pipeline = MagicMock()
+        mock_pipeline.__aenter__.return_value = mock_pipeline
+        mock_pipeline.execute = AsyncMock(return_value=[json.dumps(mock_data).encode("utf-8"), 1])
+        mock_client = Mock()
+        mock_client.pipeline.return_value = mock_pipeline
+        mock_get_redis_client.return_value = mock_client
 
         # Call the function under test
-        result, _ = activate_from_cache(key="test_key")
+        result, events = asyncio.run(activate_from_cache(key="test_key"))
 
         # Assertions
-        mock_get_redis_client.assert_called_once()
-        mock_client.get.assert_called_once_with("test_key")
-        mock_client.delete.assert_called_once_with("test_key")
+        mock_client.pipeline.assert_called_once_with(transaction=True)
+        mock_pipeline.get.assert_called_once_with("test_key")
+        mock_pipeline.delete.assert_called_once_with("test_key")
+        mock_pipeline.execute.assert_awaited_once()
         assert result == mock_data
+        assert len(events) == 2
 
-    @patch("server.database.managers.get_redis_client", side_effect=Exception("Token expired or invalid."))
+    @patch("server.database.cache.ops.get_async_redis_client", side_effect=Exception("Token expired or invalid."))
     def test_activate_from_cache_exception(self, mock_get_redis_client):
-        # Mock the Redis client
-        mock_client = Mock(spec=Redis)
-        mock_get_redis_client.return_value = mock_client
-
-        with pytest.raises(Exception):
-            activate_from_cache(key="test_key")
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(activate_from_cache(key="test_key"))
 
+        assert error.value.status_code == 410
         mock_get_redis_client.assert_called_once()
+
+    def test_async_redis_client_is_pooled(self):
+        client = get_async_redis_client()
+        assert get_async_redis_client() is client
+        pool = client.connection_pool
+        assert pool.max_connections == settings.REDIS_POOL_SIZE
+        assert pool.timeout == settings.REDIS_POOL_TIMEOUT
+        assert pool.connection_kwargs["socket_timeout"] == settings.REDIS_SOCKET_TIMEOUT
+        asyncio.run(close_async_redis_client())
+        assert get_async_redis_client() is not client
+        asyncio.run(close_async_redis_client())
+
+
+class TestSharedInfluxDBClient:
+    def test_client_is_reused_for_the_same_token(self):
+        client = get_shared_influxdb_client(token="token")
+        assert get_shared_influxdb_client(token="token") is client
+        assert client.api_client.rest_client.pool_manager.connection_pool_kw["maxsize"] == settings.INFLUXDB_POOL_SIZE
+        close_influxdb_clients()
+
+    def test_client_is_refreshed_when_token_changes(self):
+        client = get_shared_influxdb_client(token="token")
+        with patch.object(client, "close") as mock_close:
+            refreshed = get_shared_influxdb_client(token="rotated-token")
+            mock_close.assert_called_once()
+        assert refreshed is not client
+        close_influxdb_clients()
+
+
+class TestSharedAsyncEngine:
+    def test_engine_is_shared_and_pooled(self):
+        engine = get_async_engine()
+        assert get_async_engine() is engine
+        assert engine.pool.size() == settings.POSTGRES_POOL_SIZE
+        assert engine.pool._pre_ping is settings.POSTGRES_POOL_PRE_PING
+        assert get_async_session_factory()().bind is engine
+        asyncio.run(close_async_engine())
+
+    def test_engine_is_recreated_after_close(self):
+        engine = get_async_engine()
+        asyncio.run(close_async_engine())
+        assert get_async_engine() is not engine
+        asyncio.run(close_async_engine())
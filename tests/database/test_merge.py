@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from server.database.audit.archive import read_bucket_retention
+from server.database.audit.merge import build_stream_parameters, decode_cursor, encode_cursor, read_points_from_streams
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+pytestmark = pytest.mark.parameters(category=["http_events", "cache_events"])
+
+
+def make_item(seconds_ago: int, category: str, app: str = "api", env: str = "staging"):
+    return {
+        "category": category,
+        "tags": {"application": app, "environment": env},
+        "timestamp": NOW - timedelta(seconds=seconds_ago),
+    }
+
+
+class TestCursor:
+    def test_cursor_round_trip(self):
+        item = make_item(5, "http_events")
+        assert decode_cursor(encode_cursor(item)) == (item["timestamp"], "http_events", "api", "staging")
+
+    def test_invalid_cursor(self):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor("not-a-cursor")
+        assert error.value.status_code == 400
+
+    def test_stream_parameters_resume_after_cursor(self, parameters):
+        cursor = (NOW - timedelta(seconds=10), "http_events", "api", "staging")
+
+        stream, cursor_filter = build_stream_parameters(parameters, "cache_events", "api", cursor)
+        assert stream.category == ["cache_events"]
+        assert stream.stop.startswith((NOW - timedelta(seconds=10)).strftime("%Y-%m-%dT%H:%M:%S.000001"))
+        assert cursor_filter is None
+
+        stream, cursor_filter = build_stream_parameters(parameters, "http_events", "api", cursor)
+        assert 'r["environment"] < "staging"' in cursor_filter
+
+        stream, cursor_filter = build_stream_parameters(parameters, "metrics", "api", cursor)
+        assert stream.stop.endswith(".000000Z")
+
+
+class TestReadPointsFromStreams:
+    def test_streams_are_merged_with_a_global_limit(self, parameters):
+        rows = {
+            "http_events": [make_item(1, "http_events"), make_item(4, "http_events")],
+            "cache_events": [make_item(2, "cache_events"), make_item(3, "cache_events")],
+        }
+
+        async def fake_run_query(request, func, **kwargs):
+            if func is read_bucket_retention:
+                return None
+            return rows[kwargs["parameters"].category[0]][: kwargs["limit"]]
+
+        with patch("server.database.audit.points.run_query", side_effect=fake_run_query), patch(
+            "server.database.audit.archive.run_query", side_effect=fake_run_query
+        ):
+            page, cursor = asyncio.run(
+                read_points_from_streams(None, None, "org", "bucket", parameters, offset=0, limit=3),
+            )
+
+        assert [item["timestamp"] for item in page] == [NOW - timedelta(seconds=s) for s in (1, 2, 3)]
+        assert decode_cursor(cursor)[0] == NOW - timedelta(seconds=3)
@@ -0,0 +1,224 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import List
+from unittest.mock import Mock
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+
+from server.database.audit import rollups
+from server.database.audit.points import (
+    build_combined_reducer,
+    calculate_metrics_count_from_bucket,
+    calculate_metrics_from_shards,
+    parse_metric_pairs,
+    proccess_points,
+    process_combined_metric_result,
+    process_metric_count,
+    process_metric_result,
+)
+from server.schemas.out.audit import AuditResponseSchema
+from server.utils.responses import TrustedJSONResponse
+from tests.database.conftest import FakeRequest, make_table
+
+
+class TestCombinedMetrics:
+    def test_parse_metric_pairs(self):
+        assert parse_metric_pairs(["latency", "latency:mean", "cpu_usage:max"]) == [
+            ("latency", "mean"),
+            ("cpu_usage", "max"),
+        ]
+
+        with pytest.raises(HTTPException) as error:
+            parse_metric_pairs(["latency:median"])
+        assert error.value.status_code == 400
+
+    def test_single_reduce(self):
+        reducer = build_combined_reducer([("latency", "mean"), ("latency", "max"), ("cpu_usage", "min")])
+        assert reducer.count("reduce(") == 1
+        assert reducer.count("latency_count:") == 2
+        assert "latency_sum" in reducer and "latency_max" in reducer and "cpu_usage_min" in reducer
+
+    def test_columnar_result(self):
+        pairs = [("latency", "mean"), ("cpu_usage", "max"), ("cpu_usage", "count")]
+        tables = [
+            make_table(
+                {
+                    "_start": "t0",
+                    "_stop": "t1",
+                    "latency_count": 2.0,
+                    "latency_sum": 3.0,
+                    "cpu_usage_count": 1.0,
+                    "cpu_usage_max": 0.5,
+                },
+                {
+                    "_start": "t1",
+                    "_stop": "t2",
+                    "latency_count": 1.0,
+                    "latency_sum": 1.0,
+                    "cpu_usage_count": 0.0,
+                    "cpu_usage_max": 0.0,
+                },
+            )
+        ]
+
+        assert process_combined_metric_result(tables, pairs) == [
+            {
+                "group_key": "all",
+                "range": ["t0 - t1", "t1 - t2"],
+                "data": {"latency:mean": [1.5, 1.0], "cpu_usage:max": [0.5, None], "cpu_usage:count": [1.0, 0.0]},
+            }
+        ]
+
+
+class FakeInfluxDBClient:
+    def __init__(self, ranking, series):
+        self.ranking = ranking
+        self.series = series
+        self.queries = []
+
+    def query_api(self):
+        return self
+
+    def query(self, query, org):
+        self.queries.append(query)
+        return self.ranking if "top(n:" in query else self.series
+
+
+class TestTopGroups:
+    def test_multi_column_group_keys(self):
+        tables = [
+            make_table({"_start": "t0", "_stop": "t1", "status": "failed", "method": "GET", "latency": 2.0}),
+            make_table({"_start": "t0", "_stop": "t1", "status": "success", "method": "GET", "latency": 1.0}),
+        ]
+        result = process_metric_result(tables, "latency", ["status", "method"])
+        assert [group["group_key"] for group in result] == ["failed, GET", "success, GET"]
+
+    @pytest.mark.parameters(
+        start=datetime(2023, 6, 1, tzinfo=timezone.utc), stop=datetime(2023, 6, 1, 6, tzinfo=timezone.utc)
+    )
+    def test_heaviest_groups_are_kept_and_the_rest_folded(self, parameters):
+        client = FakeInfluxDBClient(
+            ranking=[make_table({"_group": "b", "latency": 9.0}, {"_group": "a", "latency": 5.0})],
+            series=[
+                make_table({"_start": "t0", "_stop": "t1", "_group": "a", "latency": 1.0}),
+                make_table({"_start": "t0", "_stop": "t1", "_group": "other", "latency": 0.5}),
+                make_table({"_start": "t0", "_stop": "t1", "_group": "b", "latency": 3.0}),
+            ],
+        )
+
+        result = asyncio.run(
+            calculate_metrics_from_shards(
+                FakeRequest(),
+                client=client,
+                organization="org",
+                bucket="user",
+                parameters=parameters,
+                interval="1h",
+                metric_name="latency",
+                agg="mean",
+                group_by=["resource_id", "environment"],
+                top_k=2,
+            )
+        )
+
+        assert [group["group_key"] for group in result] == ["b", "a", "other"]
+        ranking, series = client.queries
+        assert '|> sum(column: "latency")' in ranking and "top(n: 2" in ranking
+        assert 'contains(value: r._group, set: ["b", "a"])' in series and '"other"' in series
+        assert 'set: ["latency", "resource_id"]' in series
+
+
+class TestMetricCount:
+    def test_values_are_counted_by_influxdb(self, parameters):
+        client = FakeInfluxDBClient(ranking=[], series=[])
+        calculate_metrics_count_from_bucket(client, "org", "user", parameters, "1h", "status")
+
+        (query,) = client.queries
+        assert query.endswith(
+            ' |> keep(columns: ["_time", "status"]) |> group(columns: ["status"]) |> window(every: 1h)'
+            ' |> duplicate(column: "status", as: "_value") |> count()'
+        )
+
+    def test_counts_are_grouped_by_window(self):
+        tables = [
+            make_table(
+                {"_start": "t1", "_stop": "t2", "status": "success", "_value": 4},
+                {"_start": "t0", "_stop": "t1", "status": "success", "_value": 2},
+            ),
+            make_table({"_start": "t0", "_stop": "t1", "status": "failed", "_value": 1}),
+        ]
+
+        assert process_metric_count(tables, "status") == [
+            {"range": "t0 - t1", "data": {"success": 2, "failed": 1}},
+            {"range": "t1 - t2", "data": {"success": 4}},
+        ]
+
+    def test_empty_window(self, parameters):
+        client = FakeInfluxDBClient(ranking=[], series=[])
+        assert calculate_metrics_count_from_bucket(client, "org", "user", parameters, "1h", "status") == []
+        assert process_metric_count([make_table()], "status") == []
+
+
+class TestRollupRouting:
+    @pytest.mark.parameters(
+        start=datetime(2023, 6, 1, tzinfo=timezone.utc), stop=datetime(2023, 6, 2, tzinfo=timezone.utc)
+    )
+    def test_planned_rollup_is_used_without_another_lookup(self, monkeypatch, parameters):
+        client = FakeInfluxDBClient(ranking=[], series=[])
+        monkeypatch.setattr(rollups, "read_rollup_resolutions", Mock(side_effect=AssertionError))
+
+        asyncio.run(
+            calculate_metrics_from_shards(
+                FakeRequest(),
+                client=client,
+                organization="org",
+                bucket="user",
+                parameters=parameters,
+                interval="1h",
+                metric_name="latency",
+                agg="mean",
+                resolution="1h",
+            )
+        )
+        (query,) = client.queries
+        assert query.startswith('from(bucket: "user_rollup_1h")')
+
+
+class TestProcessPoints:
+    def test_matches_response_model(self):
+        row = {
+            "_measurement": "http_events",
+            "_time": datetime(2023, 6, 11, 12, 30, 15, 123456, tzinfo=timezone.utc),
+            "application": "spectratrace_api",
+            "environment": "staging",
+            "method": "GET",
+            "status": "success",
+            "level": "info",
+            "event_id": "1",
+            "event_name": "Login",
+            "event_type": "Authentication",
+            "event_stage": 1,
+            "event_duration": 0.1,
+            "affected_resources": 1,
+            "latency": 0.05,
+            "cpu_usage": None,
+            "memory_usage": 0.2,
+            "event_description": "User logged in",
+            "actor_origin": "127.0.0.1",
+            "actor_detail": json.dumps({"username": "johndoe"}),
+            "resource_id": None,
+            "resource_name": None,
+            "resource_type": None,
+            "metadata": json.dumps({"key": "value"}),
+        }
+        data = proccess_points([make_table(row)])
+
+        expected = jsonable_encoder(parse_obj_as(List[AuditResponseSchema], data), by_alias=True)
+        response = TrustedJSONResponse(data)
+        assert orjson.loads(response.body) == expected
+        assert response.headers["server-timing"].startswith("serialize;dur=")
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from server.database.audit.points import build_influxdb_query
+from server.database.cache.postings import narrow_indexed_parameters
+
+HOUR = int(datetime(2023, 6, 11, 10, tzinfo=timezone.utc).timestamp())
+JUNE_1 = datetime(2023, 6, 1, tzinfo=timezone.utc)
+JUNE_30 = datetime(2023, 6, 30, tzinfo=timezone.utc)
+
+
+def mock_postings(*members, coverage=0.0):
+    client = Mock()
+    client.pipeline.return_value.execute.return_value = [coverage, [member.encode("utf-8") for member in members]]
+    return patch("server.database.cache.postings.get_redis_client", return_value=client)
+
+
+class TestNarrowIndexedParameters:
+    @pytest.mark.parameters(category=[], resource_id="42", start=JUNE_1, stop=JUNE_30)
+    def test_measurements_and_range_are_narrowed(self, parameters):
+        with mock_postings(f"http_events:{HOUR}", f"cache_events:{HOUR + 7200}"):
+            narrowed = narrow_indexed_parameters("user", parameters)
+
+        assert narrowed.category == ["cache_events", "http_events"]
+        assert narrowed.start == "2023-06-11T10:00:00.000000Z"
+        assert narrowed.stop == "2023-06-11T13:00:00.000000Z"
+
+    @pytest.mark.parameters(origin="10.0.0.1")
+    def test_no_postings_match_nothing(self, parameters):
+        with mock_postings(f"cache_events:{HOUR}"):
+            narrowed = narrow_indexed_parameters("user", parameters)
+
+        assert narrowed.category == []
+        assert "filter(fn: (r) => false)" in build_influxdb_query("user", narrowed)
+
+    def test_unindexed_requests_are_unchanged(self, parameters):
+        assert narrow_indexed_parameters("user", parameters) is parameters
+
+    @pytest.mark.parameters(origin="10.0.0.1", start=JUNE_1, stop=JUNE_30)
+    def test_ranges_before_the_coverage_keep_their_measurements(self, parameters):
+        with mock_postings(f"http_events:{HOUR}", coverage=HOUR - 86400):
+            narrowed = narrow_indexed_parameters("user", parameters)
+        assert narrowed.category == ["http_events"]
+        assert narrowed.start == parameters.start
+        assert narrowed.stop == "2023-06-11T11:00:00.000000Z"
+
+        with mock_postings(coverage=None):
+            assert narrow_indexed_parameters("user", parameters) is parameters
+
+    @pytest.mark.parameters(category=[], resource_id="42")
+    def test_uncovered_ranges_require_a_category(self, parameters):
+        with mock_postings(f"http_events:{HOUR}", coverage=None):
+            with pytest.raises(HTTPException) as error:
+                narrow_indexed_parameters("user", parameters)
+        assert error.value.status_code == 400
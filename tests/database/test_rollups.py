@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from server.database.audit import rollups
+from server.database.audit.rollups import (
+    build_rollup_query,
+    build_rollup_task,
+    find_rollup,
+    select_rollup,
+    split_rollup_range,
+)
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from server.utils.formatters import parse_flux_duration
+
+pytestmark = pytest.mark.parameters(app=["spectratrace_api"], start="30d")
+
+
+class TestParseFluxDuration:
+    def test_simple_and_compound_durations(self):
+        assert parse_flux_duration("1m") == 60
+        assert parse_flux_duration("1h30m") == 5400
+        assert parse_flux_duration("2d") == 172800
+
+    def test_invalid_duration(self):
+        with pytest.raises(ValueError):
+            parse_flux_duration("1x")
+        with pytest.raises(ValueError):
+            parse_flux_duration("now()")
+
+
+class TestSelectRollup:
+    def test_coarsest_compatible_rollup(self, parameters):
+        assert select_rollup(parameters, "1h", "latency", "mean") == "1h"
+        assert select_rollup(parameters, "2d", "latency", "max") == "1d"
+        assert select_rollup(parameters, "5m", "cpu_usage", "sum", ["environment"]) == "1m"
+
+    def test_incompatible_queries_use_raw_bucket(self, parameters):
+        assert select_rollup(parameters, "30s", "latency", "mean") is None
+        assert select_rollup(parameters, "1h", "login_time", "mean") is None
+        assert select_rollup(parameters, "1h", "latency", "median") is None
+        assert select_rollup(parameters, "1h", "latency", "mean", ["status"]) is None
+
+        assert select_rollup(parameters, "1mo", "latency", "mean") is None
+
+        parameters.status = "success"
+        assert select_rollup(parameters, "1h", "latency", "mean") is None
+
+    def test_buckets_without_rollups_use_raw_bucket(self, monkeypatch, parameters):
+        monkeypatch.setattr(rollups, "read_rollup_resolutions", lambda client, bucket: ["1h", "1m"])
+        assert find_rollup(None, "user", parameters, "2d", "latency", "max") == "1h"
+
+        monkeypatch.setattr(rollups, "read_rollup_resolutions", lambda client, bucket: [])
+        assert find_rollup(None, "admin", parameters, "1h", "latency", "mean") is None
+
+
+class TestSplitRollupRange:
+    now = datetime(2024, 5, 10, 15, 30, tzinfo=timezone.utc)
+
+    def test_open_windows_are_read_from_raw_bucket(self):
+        parameters = AuditRetrievalRequestSchema(category=["http_events"], app=["spectratrace_api"], start="7d")
+        rollup, raw = split_rollup_range(parameters, "1d", "1d", self.now)
+        assert (rollup.start, rollup.stop) == ("2024-05-03T15:30:00.000000Z", "2024-05-10T00:00:00.000000Z")
+        assert (raw.start, raw.stop) == ("2024-05-10T00:00:00.000000Z", "2024-05-10T15:30:00.000000Z")
+
+        rollup, raw = split_rollup_range(parameters, "1h", "1d", self.now)
+        assert rollup.stop == raw.start == "2024-05-10T00:00:00.000000Z"
+
+    def test_closed_ranges_only_use_the_rollup(self):
+        parameters = AuditRetrievalRequestSchema(
+            category=["http_events"],
+            app=["spectratrace_api"],
+            start="2024-05-01T00:00:00Z",
+            stop="2024-05-02T00:00:00Z",
+        )
+        rollup, raw = split_rollup_range(parameters, "1h", "1h", self.now)
+        assert rollup.stop == "2024-05-02T00:00:00.000000Z" and raw is None
+
+        parameters = AuditRetrievalRequestSchema(category=["http_events"], app=["spectratrace_api"], start="10m")
+        rollup, raw = split_rollup_range(parameters, "1h", "1h", self.now)
+        assert rollup is None and raw.start == "2024-05-10T15:20:00.000000Z"
+
+
+class TestRollupQueries:
+    def test_task_writes_every_aggregate(self):
+        task = build_rollup_task("user", "1h")
+        assert 'to(bucket: "user_rollup_1h"' in task
+        for agg in ("count", "sum", "min", "max", "mean"):
+            assert f'"_{agg}"' in task
+
+    def test_mean_is_recomputed_from_sum_and_count(self, parameters):
+        query = build_rollup_query("user", "1h", parameters, "1d", "latency", "mean")
+        assert 'from(bucket: "user_rollup_1h")' in query
+        assert "latency_sum" in query and "latency_count" in query
+        assert "r.sum / r.count" in query
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from server.config.factory import settings
+from server.database.audit.search import build_search_batches, build_search_query, prune_search_index
+from tests.database.conftest import FakeResult, FakeSession
+
+
+def make_posting(minutes: int, event_id: str = "1"):
+    return datetime(2023, 6, 11, tzinfo=timezone.utc) + timedelta(minutes=minutes), "http_events", "api", event_id
+
+
+class TestSearchBatches:
+    def test_batches_are_narrow_and_bounded(self, monkeypatch):
+        monkeypatch.setattr(settings, "SEARCH_BATCH_SIZE", 2)
+        monkeypatch.setattr(settings, "SEARCH_BATCH_SPAN", 3600)
+        postings = [make_posting(0), make_posting(10), make_posting(20), make_posting(200)]
+
+        batches = build_search_batches(postings)
+        assert [[posting[0].minute for posting in batch] for batch in batches] == [[20], [20, 10], [0]]
+        assert batches[0][0][0].hour == 3
+
+    def test_query_covers_only_the_batch(self):
+        query = build_search_query("user", [make_posting(20, "b"), make_posting(10, "a")])
+        assert "range(start: 2023-06-11T00:10:00.000000Z, stop: 2023-06-11T00:20:00.000001Z)" in query
+        assert 'contains(value: r.event_id, set: ["a", "b"])' in query
+
+
+class TestPruneSearchIndex:
+    def test_postings_past_retention_are_deleted(self):
+        session = FakeSession(FakeResult(rowcount=2), FakeResult(rowcount=2))
+        assert asyncio.run(prune_search_index(session, [("user", 86400), ("other", 3600)])) == 4
+
+        user, other = session.statements
+        assert str(user).startswith("DELETE FROM event_search WHERE event_search.bucket = %(bucket_1)s")
+        assert "event_search.event_time < %(event_time_1)s" in str(user)
+        expired = datetime.now(timezone.utc) - timedelta(days=1)
+        assert abs((user.params["event_time_1"] - expired).total_seconds()) < 60
+        assert other.params["bucket_1"] == "other" and session.commits == 1
@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+from server.config.factory import settings
+from server.database.audit.points import (
+    calculate_metric_partials_from_bucket,
+    calculate_metrics_from_bucket,
+    combine_grouped_shards,
+    combine_metric_partials,
+    plan_time_shards,
+    read_points_from_shards,
+)
+from tests.database.conftest import make_table
+
+pytestmark = pytest.mark.parameters(
+    start=datetime(2023, 6, 1, 12, tzinfo=timezone.utc), stop=datetime(2023, 6, 4, 6, tzinfo=timezone.utc)
+)
+
+
+def make_partial(day: int, hour: int, count: float, total: float, low: float, high: float):
+    return {
+        "group_key": "all",
+        "start": datetime(2023, 6, day, hour, tzinfo=timezone.utc),
+        "count": count,
+        "sum": total,
+        "min": low,
+        "max": high,
+    }
+
+
+class FakeFluxClient:
+    # windows one hour long over series kept apart unless the query regroups them
+    def __init__(self, points):
+        self.points = points
+        self.queries = []
+
+    def query_api(self):
+        return self
+
+    def query(self, query, org):
+        self.queries.append(query)
+        tables = {}
+        for series, time, value in self.points:
+            tables.setdefault("all" if " |> group()" in query else series, []).append((time, value))
+
+        result = []
+        for points in tables.values():
+            windows = {}
+            for time, value in points:
+                windows.setdefault(time.replace(minute=0), []).append(value)
+
+            rows = []
+            for start, values in sorted(windows.items()):
+                row = {"_start": start, "_stop": start.replace(hour=start.hour + 1)}
+                if "reduce(" in query:
+                    row.update(
+                        latency_count=len(values),
+                        latency_sum=sum(values),
+                        latency_min=min(values),
+                        latency_max=max(values),
+                    )
+                else:
+                    row["latency"] = sum(values) / len(values)
+                rows.append(row)
+            result.append(make_table(*rows))
+        return result
+
+
+class TestPlanTimeShards:
+    def test_short_ranges_are_not_sharded(self, parameters):
+        parameters.start = "2023-06-01T12:00:00Z"
+        parameters.stop = "2023-06-02T00:00:00Z"
+        assert plan_time_shards(parameters, 86400) == [parameters]
+
+    def test_shards_are_aligned_to_the_step(self, parameters):
+        shards = plan_time_shards(parameters, 86400)
+        assert [(shard.start, shard.stop) for shard in shards] == [
+            ("2023-06-01T12:00:00.000000Z", "2023-06-02T00:00:00.000000Z"),
+            ("2023-06-02T00:00:00.000000Z", "2023-06-03T00:00:00.000000Z"),
+            ("2023-06-03T00:00:00.000000Z", "2023-06-04T00:00:00.000000Z"),
+            ("2023-06-04T00:00:00.000000Z", "2023-06-04T06:00:00.000000Z"),
+        ]
+
+
+class TestCombineShards:
+    def test_windows_are_concatenated_per_group(self):
+        results = [
+            [{"group_key": "prod", "data": [{"value": 1}]}],
+            [{"group_key": "prod", "data": [{"value": 2}]}, {"group_key": "dev", "data": [{"value": 3}]}],
+        ]
+        combined = combine_grouped_shards(results, ["data"])
+        assert combined == [
+            {"group_key": "prod", "data": [{"value": 1}, {"value": 2}]},
+            {"group_key": "dev", "data": [{"value": 3}]},
+        ]
+
+    def test_partials_of_split_windows_are_merged(self, parameters):
+        results = [
+            [make_partial(1, 12, 2.0, 10.0, 4.0, 6.0)],
+            [make_partial(2, 0, 0.0, 0.0, 0.0, 0.0)],
+            [make_partial(3, 0, 3.0, 30.0, 2.0, 20.0)],
+        ]
+        window = 7 * 86400
+
+        mean = combine_metric_partials(results, parameters, window, "mean")
+        assert mean[0]["data"][0]["value"] == 8.0
+        assert mean[0]["data"][0]["range"].startswith("2023-06-01 12:00:00+00:00")
+        assert combine_metric_partials(results, parameters, window, "count")[0]["data"][0]["value"] == 5
+        assert combine_metric_partials(results, parameters, window, "min")[0]["data"][0]["value"] == 2.0
+        assert combine_metric_partials(results, parameters, window, "max")[0]["data"][0]["value"] == 20.0
+
+    def test_sharded_and_unsharded_windows_match(self, parameters):
+        parameters.start = "2023-06-01T12:00:00Z"
+        parameters.stop = "2023-06-01T14:00:00Z"
+        points = [
+            ("api", datetime(2023, 6, 1, 12, 10, tzinfo=timezone.utc), 1.0),
+            ("web", datetime(2023, 6, 1, 12, 20, tzinfo=timezone.utc), 5.0),
+            ("web", datetime(2023, 6, 1, 13, 30, tzinfo=timezone.utc), 3.0),
+        ]
+        client = FakeFluxClient(points)
+
+        unsharded = calculate_metrics_from_bucket(client, "org", "bucket", parameters, "1h", "latency", "mean")
+        shards = [[point for point in points if point[1].hour == hour] for hour in (12, 13)]
+        partials = [
+            calculate_metric_partials_from_bucket(FakeFluxClient(shard), "org", "bucket", parameters, "1h", "latency")
+            for shard in shards
+        ]
+
+        assert " |> group()" in client.queries[0]
+        assert unsharded == combine_metric_partials(partials, parameters, 3600, "mean")
+        assert unsharded == [
+            {
+                "group_key": "all",
+                "data": [
+                    {"range": "2023-06-01 12:00:00+00:00 - 2023-06-01 13:00:00+00:00", "value": 3.0},
+                    {"range": "2023-06-01 13:00:00+00:00 - 2023-06-01 14:00:00+00:00", "value": 3.0},
+                ],
+            }
+        ]
+
+
+class TestReadPointsFromShards:
+    def test_older_shards_are_skipped_once_the_page_is_full(self, parameters, monkeypatch):
+        monkeypatch.setattr(settings, "QUERY_SHARD_PARALLELISM", 1)
+        queried = []
+
+        async def fake_run_query(request, func, **kwargs):
+            queried.append(kwargs["parameters"].start)
+            return [kwargs["parameters"].start] * kwargs["limit"]
+
+        with patch("server.database.audit.points.run_query", side_effect=fake_run_query):
+            events = asyncio.run(read_points_from_shards(None, None, "org", "bucket", parameters, limit=3))
+
+        assert queried == ["2023-06-04T00:00:00.000000Z"]
+        assert events == ["2023-06-04T00:00:00.000000Z"] * 3
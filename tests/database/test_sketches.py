@@ -0,0 +1,78 @@
+import asyncio
+import math
+import random
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from server.database.cache import sketches
+from server.database.cache.sketches import (
+    calculate_percentiles_from_sketches,
+    estimate_quantiles,
+    get_sketch_gamma,
+    get_sketch_key,
+    plan_sketch_windows,
+)
+from server.schemas.inc.audit import AuditRetrievalRequestSchema
+from tests.database.conftest import FakeRedis
+
+
+def build_sketch(values):
+    sketch = {}
+    for value in values:
+        index = str(math.ceil(math.log(value, get_sketch_gamma())))
+        sketch[index] = sketch.get(index, 0) + 1
+    return sketch
+
+
+class TestPlanSketchWindows:
+    def test_whole_days_use_daily_sketches(self):
+        start = datetime(2023, 6, 10, 22, 30, tzinfo=timezone.utc)
+        stop = datetime(2023, 6, 12, 0, 15, tzinfo=timezone.utc)
+        windows = plan_sketch_windows(start, stop)
+
+        assert [resolution for resolution, _ in windows] == ["1h", "1h", "1d", "1h"]
+        assert windows[0][1] == int(datetime(2023, 6, 10, 22, tzinfo=timezone.utc).timestamp())
+        assert windows[2][1] == int(datetime(2023, 6, 11, tzinfo=timezone.utc).timestamp())
+
+
+class TestEstimateQuantiles:
+    def test_relative_accuracy(self):
+        values = sorted(random.Random(42).lognormvariate(0, 1) for _ in range(10000))
+        estimates = estimate_quantiles(build_sketch(values), [0.5, 0.95, 0.99])
+
+        for quantile, estimate in estimates.items():
+            exact = values[int(quantile * (len(values) - 1))]
+            assert abs(estimate - exact) / exact <= 0.01 + 1e-9
+
+    def test_empty_sketch(self):
+        assert estimate_quantiles({}, [0.5]) == {0.5: None}
+
+
+class TestCalculatePercentiles:
+    def test_field_filters_are_rejected(self):
+        parameters = AuditRetrievalRequestSchema(
+            category=["http_events"], app=["spectratrace_api"], start="1d", stop="now()", status="success"
+        )
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(calculate_percentiles_from_sketches("user", parameters, "latency", [0.5]))
+        assert error.value.status_code == 400
+
+    def test_window_sketches_are_merged_in_one_round_trip(self, monkeypatch):
+        client = FakeRedis()
+        monkeypatch.setattr(sketches, "get_async_redis_client", lambda: client)
+        parameters = AuditRetrievalRequestSchema(
+            category=["http_events"],
+            app=["api"],
+            start=datetime(2023, 6, 10, 22, tzinfo=timezone.utc),
+            stop=datetime(2023, 6, 11, tzinfo=timezone.utc),
+        )
+        for hour in (22, 23):
+            window_start = int(datetime(2023, 6, 10, hour, tzinfo=timezone.utc).timestamp())
+            key = get_sketch_key("user", "http_events", "api", "latency", "1h", window_start)
+            client.hashes[key] = {b"zero": b"1", b"3": b"2"}
+
+        result = asyncio.run(calculate_percentiles_from_sketches("user", parameters, "latency", [0.5]))
+        assert result["count"] == 6 and result["data"]["0.5"] > 0
+        assert client.executions == 1 and len(client.calls) == 2
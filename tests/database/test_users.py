@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from server.database.users import auth
+from server.database.users.auth import (
+    build_account_insert,
+    build_account_update,
+    create_user_account,
+    rotate_access_key,
+)
+from server.models.users import UserAccount
+from server.schemas.inc.auth import SignupRequestSchema
+from tests.database.conftest import FakeSession
+
+
+def compile_statement(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+async def hash_password(func, password):
+    return f"hashed-{password}"
+
+
+@pytest.fixture
+def payload():
+    return SignupRequestSchema(username="username", email="user@email.com", password="Password@12345")
+
+
+class TestAccountStatements:
+    def test_insert_skips_conflicts_and_returns_the_account(self):
+        user = UserAccount(username="username", email="user@email.com", hashed_password="hash", access_key="k" * 36)
+        statement = compile_statement(build_account_insert(user))
+        assert statement.startswith("INSERT INTO accounts")
+        assert "ON CONFLICT DO NOTHING RETURNING accounts.id" in statement
+
+    def test_update_returns_the_account(self):
+        statement = compile_statement(build_account_update(1, is_active=True))
+        assert statement.startswith("UPDATE accounts SET")
+        assert "WHERE accounts.id = %(id_1)s RETURNING accounts.id" in statement
+
+
+class TestCreateUserAccount:
+    def test_account_is_created_in_one_statement(self, monkeypatch, payload):
+        monkeypatch.setattr(auth, "run_password_job", hash_password)
+        created = UserAccount(id=1, username="username", email="user@email.com", hashed_password="hash")
+        session = FakeSession(created)
+
+        user, _ = asyncio.run(create_user_account(session, payload))
+        assert user is created
+        assert len(session.statements) == 1 and session.commits == 1
+
+    def test_conflicts_report_the_taken_field(self, monkeypatch, payload):
+        monkeypatch.setattr(auth, "run_password_job", hash_password)
+        taken = UserAccount(id=1, username="other", email="user@email.com", hashed_password="hash")
+        session = FakeSession(None, taken)
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(create_user_account(session, payload))
+        assert error.value.status_code == 400
+        assert error.value.detail == {"msg": "The email user@email.com is already registered."}
+        assert session.commits == 0
+
+
+class TestRotateAccessKey:
+    def test_previous_key_is_revoked(self, monkeypatch):
+        revoked = []
+
+        async def revoke_access_key(api_key):
+            revoked.append(api_key)
+
+        monkeypatch.setattr(auth, "revoke_access_key", revoke_access_key)
+        rotated = UserAccount(
+            id=1, username="username", email="user@email.com", hashed_password="hash", access_key="new"
+        )
+        session = FakeSession("old", rotated)
+
+        user, _ = asyncio.run(rotate_access_key(session, 1))
+        assert user is rotated
+        assert revoked == ["old"]
+        statement = str(session.statements[1])
+        assert statement.startswith("UPDATE accounts SET") and "access_key=" in statement
@@ -0,0 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+
+from server.config.factory import settings
+from server.security.auth import authentication
+from server.security.auth.authentication import (
+    PasswordContext,
+    hash_plain_password,
+    run_password_job,
+    verify_and_update_password,
+)
+
+
+async def free_slot():
+    yield
+
+
+class TestPasswordContext:
+    def test_outdated_hashes_are_upgraded(self, monkeypatch):
+        monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 4)
+        outdated = PasswordContext().hash_plain_password("secret")
+        monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 5)
+        context = PasswordContext()
+
+        is_valid, new_hash = context.verify_and_update("secret", outdated)
+        assert is_valid and new_hash.startswith("$2b$05$")
+        assert context.verify_and_update("secret", new_hash) == (True, None)
+        assert context.verify_and_update("wrong", outdated) == (False, None)
+
+
+class TestPasswordJobs:
+    def test_jobs_run_on_the_process_pool(self, monkeypatch):
+        monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 4)
+        monkeypatch.setattr(authentication, "pwd_context", PasswordContext())
+        monkeypatch.setattr(authentication, "hold_hashing_slot", asynccontextmanager(free_slot))
+
+        async def hash_and_verify():
+            hashed_password = await run_password_job(hash_plain_password, "secret")
+            return await run_password_job(verify_and_update_password, "secret", hashed_password)
+
+        assert asyncio.run(hash_and_verify())[0] is True
+        authentication.get_password_executor().shutdown()
+        authentication.get_password_executor.cache_clear()
+
+    def test_jobs_past_the_queue_depth_are_rejected(self, monkeypatch):
+        monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE_DEPTH", 1)
+        monkeypatch.setitem(authentication.password_jobs, "pending", 1)
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(run_password_job(hash_plain_password, "secret"))
+        assert error.value.status_code == 503